@@ -0,0 +1,113 @@
+using System;
+using System.Collections.Generic;
+using System.Diagnostics;
+
+namespace Comfizen.Benchmarks
+{
+    /// <summary>
+    /// The measurement of one benchmark at one library scale.
+    /// </summary>
+    public sealed class BenchmarkResult
+    {
+        public string Benchmark { get; init; }
+        public string Scale { get; init; }
+        public long Operations { get; init; }
+        public double ElapsedMilliseconds { get; init; }
+        public double NanosecondsPerOperation { get; init; }
+        public double OperationsPerSecond { get; init; }
+        public double AllocatedBytesPerOperation { get; init; }
+        public int Gen0Collections { get; init; }
+        public int Gen1Collections { get; init; }
+        public int Gen2Collections { get; init; }
+    }
+
+    /// <summary>
+    /// Runs a benchmark repeatedly for a minimum time and measures time and allocations per operation.
+    /// Allocations are counted process-wide, so that operations that run in parallel are measured too.
+    /// </summary>
+    public sealed class BenchmarkRunner
+    {
+        private readonly TimeSpan _minimumTime;
+        private readonly int _minimumIterations;
+        private readonly Func<string, bool> _filter;
+
+        public List<BenchmarkResult> Results { get; } = new List<BenchmarkResult>();
+
+        /// <param name="minimumTime">How long every benchmark is repeated for, after a warm-up iteration.</param>
+        /// <param name="minimumIterations">How often every benchmark is repeated at least.</param>
+        /// <param name="filter">Selects the benchmarks to run by name.</param>
+        public BenchmarkRunner(TimeSpan minimumTime, int minimumIterations, Func<string, bool> filter)
+        {
+            _minimumTime = minimumTime;
+            _minimumIterations = minimumIterations;
+            _filter = filter;
+        }
+
+        /// <summary>
+        /// Measures a benchmark.
+        /// </summary>
+        /// <param name="name">The benchmark name, e.g. "GetLines.File.Cold".</param>
+        /// <param name="scale">The name of the library scale it runs against.</param>
+        /// <param name="operation">Runs one iteration and returns how many operations it performed.</param>
+        /// <param name="setup">Runs before every iteration and is not measured, e.g. to clear caches.</param>
+        public void Run(string name, string scale, Func<long> operation, Action setup = null)
+        {
+            if (!_filter(name)) return;
+
+            // Warm-up: JIT compilation and first-use costs are not part of the measurement.
+            setup?.Invoke();
+            operation();
+
+            long operations = 0;
+            int iterations = 0;
+            var elapsed = TimeSpan.Zero;
+            long allocated = 0;
+            int gen0 = GC.CollectionCount(0), gen1 = GC.CollectionCount(1), gen2 = GC.CollectionCount(2);
+            var stopwatch = new Stopwatch();
+            while (iterations < _minimumIterations || elapsed < _minimumTime)
+            {
+                setup?.Invoke();
+
+                long allocatedBefore = GC.GetTotalAllocatedBytes(true);
+                stopwatch.Restart();
+                operations += operation();
+                stopwatch.Stop();
+                allocated += GC.GetTotalAllocatedBytes(true) - allocatedBefore;
+
+                elapsed += stopwatch.Elapsed;
+                iterations++;
+            }
+
+            var result = new BenchmarkResult
+            {
+                Benchmark = name,
+                Scale = scale,
+                Operations = operations,
+                ElapsedMilliseconds = elapsed.TotalMilliseconds,
+                NanosecondsPerOperation = elapsed.TotalMilliseconds * 1_000_000 / Math.Max(operations, 1),
+                OperationsPerSecond = operations / Math.Max(elapsed.TotalSeconds, double.Epsilon),
+                AllocatedBytesPerOperation = (double)allocated / Math.Max(operations, 1),
+                // Setup runs between the iterations, so its collections are included.
+                Gen0Collections = GC.CollectionCount(0) - gen0,
+                Gen1Collections = GC.CollectionCount(1) - gen1,
+                Gen2Collections = GC.CollectionCount(2) - gen2
+            };
+            Results.Add(result);
+            Console.WriteLine($"{scale,-8} {name,-36} {FormatTime(result.NanosecondsPerOperation),12}/op {result.OperationsPerSecond,14:N0} op/s {FormatBytes(result.AllocatedBytesPerOperation),12}/op");
+        }
+
+        private static string FormatTime(double nanoseconds)
+        {
+            if (nanoseconds >= 1_000_000) return $"{nanoseconds / 1_000_000:N2} ms";
+            if (nanoseconds >= 1_000) return $"{nanoseconds / 1_000:N2} us";
+            return $"{nanoseconds:N0} ns";
+        }
+
+        private static string FormatBytes(double bytes)
+        {
+            if (bytes >= 1024 * 1024) return $"{bytes / (1024 * 1024):N2} MB";
+            if (bytes >= 1024) return $"{bytes / 1024:N2} KB";
+            return $"{bytes:N0} B";
+        }
+    }
+}
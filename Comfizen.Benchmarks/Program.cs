@@ -0,0 +1,205 @@
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Runtime.InteropServices;
+using System.Text.Json;
+
+namespace Comfizen.Benchmarks
+{
+    /// <summary>
+    /// Benchmarks of wildcard expansion, wildcard file and glob lookups, YAML loading and prompt tokenization
+    /// against generated wildcard libraries, without the UI. Results are printed and written as JSON, one entry
+    /// per benchmark and scale, so that runs of different releases can be compared.
+    ///
+    /// Usage: dotnet run -c Release --project Comfizen.Benchmarks -- [options]
+    ///   --scales small,medium,large   Library scales to run (default: small,medium)
+    ///   --filter text                 Only run benchmarks whose name contains the text
+    ///   --time seconds                Minimum measuring time per benchmark (default: 1)
+    ///   --output file                 The JSON results file (default: benchmark-results.json)
+    ///   --label text                  Stored with the results, e.g. the release or commit
+    ///   --work directory              Where the libraries are generated (default: a temporary directory)
+    /// </summary>
+    public static class Program
+    {
+        private const string Template =
+            "portrait, __set00/w0000__, {__set01/w0001__|__set02/w0002__}, {2$$__set03/w0003__|__set04/w0004__|__set05/w0005__}, " +
+            "__set06/*__, __yaml/group01/y0001__, {detailed|sharp focus}, masterpiece";
+
+        public static int Main(string[] args)
+        {
+            var options = ParseArguments(args);
+            if (options == null)
+            {
+                Console.Error.WriteLine("Usage: Comfizen.Benchmarks [--scales small,medium,large] [--filter text] [--time seconds] [--output file] [--label text] [--work directory]");
+                return 1;
+            }
+
+            var outputPath = Path.GetFullPath(options.Output);
+            Directory.CreateDirectory(options.WorkDirectory);
+            // The wildcard code keeps its caches (wildcard_index) in the working directory.
+            Directory.SetCurrentDirectory(options.WorkDirectory);
+
+            var runner = new BenchmarkRunner(TimeSpan.FromSeconds(options.Seconds), 3, name => options.Filter == null || name.Contains(options.Filter, StringComparison.OrdinalIgnoreCase));
+
+            RunPromptBenchmarks(runner);
+            foreach (var scale in options.Scales)
+            {
+                var directory = Path.Combine(options.WorkDirectory, scale.Name);
+                Console.WriteLine($"Generating the {scale.Name} library...");
+                WildcardLibraryGenerator.Generate(directory, scale);
+                RunWildcardBenchmarks(runner, scale, directory);
+            }
+            WildcardFileHandler.ResetDirectory();
+
+            var report = new
+            {
+                SchemaVersion = 1,
+                Label = options.Label,
+                Timestamp = DateTimeOffset.UtcNow,
+                Runtime = RuntimeInformation.FrameworkDescription,
+                OperatingSystem = RuntimeInformation.OSDescription,
+                Architecture = RuntimeInformation.ProcessArchitecture.ToString(),
+                Environment.ProcessorCount,
+                Scales = options.Scales,
+                Results = runner.Results
+            };
+            File.WriteAllText(outputPath, JsonSerializer.Serialize(report, new JsonSerializerOptions { WriteIndented = true, PropertyNamingPolicy = JsonNamingPolicy.CamelCase }));
+            Console.WriteLine($"Results written to {outputPath}");
+            return 0;
+        }
+
+        private static void RunPromptBenchmarks(BenchmarkRunner runner)
+        {
+            foreach (var (label, tokens) in new[] { ("Short", 20), ("Long", 400) })
+            {
+                var prompt = WildcardLibraryGenerator.CreatePrompt(tokens);
+                // Different prompts with the token caches emptied before every iteration, so that each call tokenizes.
+                var prompts = Enumerable.Range(0, 100).Select(i => WildcardLibraryGenerator.CreatePrompt(tokens, i)).ToList();
+                runner.Run($"PromptUtils.TokenizeRanges.{label}", "-", () =>
+                {
+                    for (int i = 0; i < 100; i++) PromptUtils.TokenizeRanges(prompt);
+                    return 100;
+                });
+                runner.Run($"PromptUtils.Tokenize.{label}", "-", () =>
+                {
+                    foreach (var p in prompts) PromptUtils.Tokenize(p);
+                    return prompts.Count;
+                }, PromptUtils.ClearCaches);
+                runner.Run($"PromptTokenFiltering.{label}", "-", () =>
+                {
+                    foreach (var p in prompts) PromptUtils.RemoveDisabledTokens(p);
+                    return prompts.Count;
+                }, PromptUtils.ClearCaches);
+
+                // The same prompt again, served from the token caches, as for the tasks of a batch.
+                runner.Run($"PromptUtils.Tokenize.Cached.{label}", "-", () =>
+                {
+                    for (int i = 0; i < 100; i++) PromptUtils.Tokenize(prompt);
+                    return 100;
+                });
+                runner.Run($"PromptTokenFiltering.Cached.{label}", "-", () =>
+                {
+                    for (int i = 0; i < 100; i++) PromptUtils.RemoveDisabledTokens(prompt);
+                    return 100;
+                });
+            }
+        }
+
+        private static void RunWildcardBenchmarks(BenchmarkRunner runner, LibraryScale scale, string directory)
+        {
+            var fileNames = Enumerable.Range(0, scale.Files).Select(WildcardLibraryGenerator.FileWildcardName).ToList();
+            var yamlName = WildcardLibraryGenerator.YamlWildcardName(1);
+            var yamlPath = Path.Combine(directory, WildcardLibraryGenerator.YamlFileName);
+
+            // Empty caches, with the YAML wildcards and the name list already loaded.
+            void ColdCaches()
+            {
+                WildcardFileHandler.SetTestDirectory(directory);
+                WildcardFileHandler.GetLines(yamlName);
+                WildcardFileHandler.GetAllWildcardNames();
+            }
+
+            // Per wildcard flattened
+            runner.Run("Yaml.Flatten", scale.Name, () => WildcardConverter.ReadYamlWildcards(yamlPath).Count);
+            runner.Run("Yaml.LoadAndCompilePack", scale.Name, () => WildcardFileHandler.GetLines(yamlName).Count > 0 ? 1 : 0, () =>
+            {
+                // Clearing the caches closes the pack, so that it can be deleted.
+                WildcardFileHandler.SetTestDirectory(directory);
+                WildcardPack.DeleteUnusedPacks(directory, null);
+            });
+            runner.Run("Yaml.LoadFromPack", scale.Name, () => WildcardFileHandler.GetLines(yamlName).Count > 0 ? 1 : 0,
+                () => WildcardFileHandler.SetTestDirectory(directory));
+
+            runner.Run("GetLines.File.Cold", scale.Name, () =>
+            {
+                foreach (var name in fileNames) WildcardFileHandler.GetLines(name);
+                return fileNames.Count;
+            }, ColdCaches);
+            runner.Run("GetLines.File.Warm", scale.Name, () =>
+            {
+                foreach (var name in fileNames) WildcardFileHandler.GetLines(name);
+                return fileNames.Count;
+            });
+            runner.Run("GetLines.Glob.Cold", scale.Name, () => WildcardFileHandler.GetLines("set01/*").Count > 0 ? 1 : 0, ColdCaches);
+            runner.Run("GetLines.GlobAll.Cold", scale.Name, () => WildcardFileHandler.GetLines("set*/*").Count > 0 ? 1 : 0, ColdCaches);
+            runner.Run("GetLines.Glob.Warm", scale.Name, () =>
+            {
+                for (int i = 0; i < 1000; i++) WildcardFileHandler.GetLines("set01/*");
+                return 1000;
+            });
+            if (scale.LargeFileMegabytes > 0)
+            {
+                runner.Run("GetLines.LargeFile.Open", scale.Name, () => WildcardFileHandler.GetLines(WildcardLibraryGenerator.LargeWildcardName).Count > 0 ? 1 : 0, ColdCaches);
+            }
+
+            WildcardFileHandler.SetTestDirectory(directory);
+            runner.Run("WildcardProcessor.Process", scale.Name, () =>
+            {
+                for (int seed = 0; seed < 1000; seed++) new WildcardProcessor(seed).Process(Template);
+                return 1000;
+            });
+            var seeds = Enumerable.Range(0, 1000).Select(seed => (long)seed).ToArray();
+            runner.Run("WildcardExpansion.ExpandMany", scale.Name, () => WildcardExpansion.ExpandMany(Template, seeds).Length);
+        }
+
+        private sealed class Options
+        {
+            public List<LibraryScale> Scales = new List<LibraryScale> { LibraryScale.Small, LibraryScale.Medium };
+            public string Filter;
+            public double Seconds = 1;
+            public string Output = "benchmark-results.json";
+            public string Label;
+            public string WorkDirectory = Path.Combine(Path.GetTempPath(), "comfizen-benchmarks");
+        }
+
+        private static Options ParseArguments(string[] args)
+        {
+            var options = new Options();
+            for (int i = 0; i < args.Length; i++)
+            {
+                if (i + 1 >= args.Length) return null;
+                var value = args[++i];
+                switch (args[i - 1])
+                {
+                    case "--scales":
+                        var scales = value.Split(',', StringSplitOptions.RemoveEmptyEntries | StringSplitOptions.TrimEntries)
+                            .Select(name => LibraryScale.All.FirstOrDefault(s => s.Name.Equals(name, StringComparison.OrdinalIgnoreCase)))
+                            .ToList();
+                        if (scales.Count == 0 || scales.Contains(null)) return null;
+                        options.Scales = scales;
+                        break;
+                    case "--filter": options.Filter = value; break;
+                    case "--time":
+                        if (!double.TryParse(value, System.Globalization.NumberStyles.Float, System.Globalization.CultureInfo.InvariantCulture, out options.Seconds)) return null;
+                        break;
+                    case "--output": options.Output = value; break;
+                    case "--label": options.Label = value; break;
+                    case "--work": options.WorkDirectory = Path.GetFullPath(value); break;
+                    default: return null;
+                }
+            }
+            return options;
+        }
+    }
+}
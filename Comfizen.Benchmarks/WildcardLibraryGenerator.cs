@@ -0,0 +1,135 @@
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Text;
+
+namespace Comfizen.Benchmarks
+{
+    /// <summary>
+    /// The size of a generated wildcard library.
+    /// </summary>
+    /// <param name="Files">Number of .txt wildcards, spread over <see cref="WildcardLibraryGenerator.FolderCount"/> folders.</param>
+    /// <param name="LinesPerFile">Lines of every .txt wildcard.</param>
+    /// <param name="YamlWildcards">Number of wildcards in the YAML file.</param>
+    /// <param name="YamlLinesPerWildcard">Lines of every YAML wildcard.</param>
+    /// <param name="LargeFileMegabytes">Size of one extra wildcard that is large enough to be indexed rather than read into memory; 0 for none.</param>
+    public sealed record LibraryScale(string Name, int Files, int LinesPerFile, int YamlWildcards, int YamlLinesPerWildcard, int LargeFileMegabytes)
+    {
+        public static readonly LibraryScale Small = new LibraryScale("small", 50, 100, 20, 50, 0);
+        public static readonly LibraryScale Medium = new LibraryScale("medium", 500, 1000, 500, 200, 0);
+        public static readonly LibraryScale Large = new LibraryScale("large", 2000, 2000, 2000, 500, 32);
+
+        public static IReadOnlyList<LibraryScale> All { get; } = new[] { Small, Medium, Large };
+    }
+
+    /// <summary>
+    /// Writes a synthetic wildcard library: folders of .txt wildcards whose lines mix plain text, weights, {..} choices
+    /// and references to other wildcards, one YAML file, and optionally one large file. The content depends only on the scale.
+    /// </summary>
+    public static class WildcardLibraryGenerator
+    {
+        public const int FolderCount = 10;
+        public const string YamlFileName = "library.yaml";
+        public const string LargeWildcardName = "large/huge";
+
+        private static readonly string[] Words =
+        {
+            "red", "blue", "silk", "velvet", "portrait", "landscape", "golden hour", "cinematic", "soft light", "dramatic",
+            "forest", "city street", "ocean", "mountain", "neon", "vintage", "minimalist", "detailed", "sketch", "oil painting"
+        };
+
+        /// <summary>
+        /// The name of the i-th .txt wildcard, e.g. "set03/w0013".
+        /// </summary>
+        public static string FileWildcardName(int index) => $"set{index % FolderCount:D2}/w{index:D4}";
+
+        public static string YamlWildcardName(int index) => $"yaml/group{index % FolderCount:D2}/y{index:D4}";
+
+        public static void Generate(string directory, LibraryScale scale)
+        {
+            if (Directory.Exists(directory)) Directory.Delete(directory, true);
+            Directory.CreateDirectory(directory);
+            var random = new Random(42);
+
+            for (int i = 0; i < scale.Files; i++)
+            {
+                var path = Path.Combine(directory, FileWildcardName(i).Replace('/', Path.DirectorySeparatorChar) + ".txt");
+                Directory.CreateDirectory(Path.GetDirectoryName(path));
+                // Every fifth wildcard is weighted, which the file turns on with the weights marker.
+                bool weighted = i % 5 == 0;
+                var lines = Enumerable.Range(0, scale.LinesPerFile).Select(_ => CreateLine(random, scale, weighted));
+                File.WriteAllLines(path, weighted ? lines.Prepend("#!weights") : lines);
+            }
+
+            var yaml = new StringBuilder();
+            yaml.AppendLine("yaml:");
+            for (int group = 0; group < FolderCount; group++)
+            {
+                yaml.AppendLine($"  group{group:D2}:");
+                for (int i = group; i < scale.YamlWildcards; i += FolderCount)
+                {
+                    yaml.AppendLine($"    y{i:D4}:");
+                    for (int line = 0; line < scale.YamlLinesPerWildcard; line++)
+                    {
+                        yaml.AppendLine($"      - \"{CreateLine(random, scale, false)}\"");
+                    }
+                }
+            }
+            File.WriteAllText(Path.Combine(directory, YamlFileName), yaml.ToString());
+
+            if (scale.LargeFileMegabytes > 0)
+            {
+                var path = Path.Combine(directory, LargeWildcardName.Replace('/', Path.DirectorySeparatorChar) + ".txt");
+                Directory.CreateDirectory(Path.GetDirectoryName(path));
+                using var writer = new StreamWriter(path);
+                long targetBytes = scale.LargeFileMegabytes * 1024L * 1024L;
+                for (long written = 0; written < targetBytes;)
+                {
+                    var line = CreatePlainLine(random);
+                    writer.WriteLine(line);
+                    written += line.Length + 1;
+                }
+            }
+        }
+
+        private static string CreateLine(Random random, LibraryScale scale, bool weighted)
+        {
+            var line = (random.Next(10)) switch
+            {
+                // A reference to another wildcard
+                0 => $"{Word(random)} __{FileWildcardName(random.Next(scale.Files))}__",
+                // A choice
+                1 => $"{{{Word(random)}|{Word(random)}|{Word(random)}}} {Word(random)}",
+                _ => CreatePlainLine(random)
+            };
+            return weighted ? $"{random.Next(1, 10)}::{line}" : line;
+        }
+
+        private static string CreatePlainLine(Random random) => $"{Word(random)} {Word(random)}, {Word(random)}";
+
+        private static string Word(Random random) => Words[random.Next(Words.Length)];
+
+        /// <summary>
+        /// A comma-separated prompt with weights in parentheses, choices, line breaks and disabled tokens,
+        /// like one written in the advanced prompt editor. Each variant is a different prompt of the same shape.
+        /// </summary>
+        public static string CreatePrompt(int tokens, int variant = 0)
+        {
+            var random = new Random(unchecked(tokens + variant * 100_003));
+            var prompt = new StringBuilder();
+            for (int i = 0; i < tokens; i++)
+            {
+                if (i > 0) prompt.Append(i % 12 == 0 ? ",\n" : ", ");
+                switch (random.Next(8))
+                {
+                    case 0: prompt.Append($"({Word(random)}:1.{random.Next(10)})"); break;
+                    case 1: prompt.Append($"{{{Word(random)}|{Word(random)}, {Word(random)}}}"); break;
+                    case 2: prompt.Append(PromptUtils.DISABLED_TOKEN_PREFIX).Append(Word(random)); break;
+                    default: prompt.Append(Word(random)).Append(' ').Append(Word(random)); break;
+                }
+            }
+            return prompt.ToString();
+        }
+    }
+}
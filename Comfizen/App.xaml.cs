@@ -200,7 +200,7 @@ namespace Comfizen
             byte[] legacyImageBytes = null;
             if (e.Data.GetData(typeof(ImageOutput)) is ImageOutput imageOutput)
             {
-                legacyImageBytes = imageOutput.ImageBytes;
+                legacyImageBytes = imageOutput.ReadContent();
             }
             else if (e.Data.GetData(DataFormats.FileDrop) is string[] files && files.Length > 0)
             {
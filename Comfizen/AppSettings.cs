@@ -41,6 +41,35 @@ namespace Comfizen
         public List<string> RecentWorkflows { get; set; } = new List<string>();
         
         public int MaxQueueSize { get; set; } = 100;
+        
+        /// <summary>
+        /// Gets or sets how many prompts are kept queued on the server at once.
+        /// With 1, the next prompt is sent only after the outputs of the previous one have been processed.
+        /// </summary>
+        public int MaxInFlightPrompts { get; set; } = 1;
+        
+        /// <summary>
+        /// Gets or sets whether the tasks of a batch (e.g. the cells of an XY grid) are reordered so that
+        /// consecutive prompts invalidate as little of ComfyUI's node cache as possible.
+        /// </summary>
+        public bool OptimizeBatchOrderForCache { get; set; } = false;
+        
+        /// <summary>
+        /// Gets or sets how many output files of a prompt are downloaded from the server at the same time.
+        /// </summary>
+        public int MaxParallelDownloads { get; set; } = 4;
+        
+        /// <summary>
+        /// Gets or sets whether video outputs are downloaded to a temporary file instead of being kept in memory.
+        /// The file is read back only when the video is saved or processed.
+        /// </summary>
+        public bool DownloadVideosToTempFile { get; set; } = false;
+        
+        /// <summary>
+        /// Gets or sets whether inpaint images and masks are uploaded to the server once, under their content hash,
+        /// instead of being embedded as base64 into every queued prompt.
+        /// </summary>
+        public bool UploadInpaintImages { get; set; } = false;
         public bool ShowDeleteConfirmation { get; set; } = true;
         [DefaultValue(true)]
         [JsonProperty(DefaultValueHandling = DefaultValueHandling.Populate)]
@@ -64,6 +93,12 @@ namespace Comfizen
         public List<string> LastOpenWorkflows { get; set; } = new List<string>();
         public string LastActiveWorkflow { get; set; }
         public string ServerAddress { get; set; } = "127.0.0.1:8188";
+        
+        /// <summary>
+        /// Gets or sets the addresses of further ComfyUI servers. Queued prompts are spread over
+        /// <see cref="ServerAddress"/> and these servers; everything else uses <see cref="ServerAddress"/> only.
+        /// </summary>
+        public List<string> AdditionalServerAddresses { get; set; } = new List<string>();
         public List<string> SpecialModelValues { get; set; } = new List<string>();
         
         /// <summary>
@@ -175,6 +210,11 @@ namespace Comfizen
                     MaxRecentWorkflows = 10,
                     RecentWorkflows = new List<string>(),
                     MaxQueueSize = 100,
+                    MaxInFlightPrompts = 1,
+                    OptimizeBatchOrderForCache = false,
+                    MaxParallelDownloads = 4,
+                    DownloadVideosToTempFile = false,
+                    UploadInpaintImages = false,
                     ShowDeleteConfirmation = true,
                     ShowPresetDeleteConfirmation = true,
                     LastSeedControlState = SeedControl.Fixed,
@@ -184,6 +224,7 @@ namespace Comfizen
                     LastOpenWorkflows = new List<string>(),
                     LastActiveWorkflow = null,
                     ServerAddress = "127.0.0.1:8188",
+                    AdditionalServerAddresses = new List<string>(),
                     SpecialModelValues = new List<string> { "None" },
                     Language = initialLanguage,
                     SliderDefaults = sliderDefaults,
@@ -226,6 +267,7 @@ namespace Comfizen
             if (!jsonRead.Contains("\"ShowTabDeleteConfirmation\"")) { settings.ShowTabDeleteConfirmation = true; needsResave = true; }
             if (settings.LastOpenWorkflows == null) { settings.LastOpenWorkflows = new List<string>(); needsResave = true; }
             if (string.IsNullOrEmpty(settings.ServerAddress)) { settings.ServerAddress = "127.0.0.1:8188"; needsResave = true; }
+            if (settings.AdditionalServerAddresses == null) { settings.AdditionalServerAddresses = new List<string>(); needsResave = true; }
             if (string.IsNullOrEmpty(settings.Language)) { settings.Language = InitialLanguage(); needsResave = true; }
             if (settings.GalleryThumbnailSize == 0.0) { settings.GalleryThumbnailSize = 128.0; needsResave = true; }
             if (settings.SliderDefaults == null || settings.SliderDefaults.Count == 0) { settings.SliderDefaults = sliderDefaults; needsResave = true; }
@@ -239,6 +281,8 @@ namespace Comfizen
             if (settings.DesignerWindowTop <= 0) { settings.DesignerWindowTop = 150; needsResave = true; }
             if (!jsonRead.Contains("\"CompressAnyFieldImagesToJpg\"")) { settings.CompressAnyFieldImagesToJpg = false; needsResave = true; }
             if (!jsonRead.Contains("\"AnyFieldJpgCompressionQuality\"")) { settings.AnyFieldJpgCompressionQuality = 95; needsResave = true; }
+            if (settings.MaxInFlightPrompts <= 0) { settings.MaxInFlightPrompts = 1; needsResave = true; }
+            if (settings.MaxParallelDownloads <= 0) { settings.MaxParallelDownloads = 4; needsResave = true; }
 
             if (needsResave)
             {
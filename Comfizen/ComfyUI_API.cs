@@ -1,12 +1,18 @@
 ﻿using System;
+using System.Buffers;
 using System.Collections.Generic;
 using System.Collections.Specialized;
 using System.Diagnostics;
 using System.IO;
+using System.Linq;
+using System.Net;
 using System.Net.Http;
-using System.Net.WebSockets;
+using System.Net.Http.Headers;
+using System.Runtime.CompilerServices;
+using System.Security.Cryptography;
 using System.Text;
 using System.Threading;
+using System.Threading.Channels;
 using System.Threading.Tasks;
 using Newtonsoft.Json;
 using Newtonsoft.Json.Linq;
@@ -18,44 +24,70 @@ namespace Comfizen
         public byte[] Data { get; set; }
         public string FileName { get; set; }
         public string FilePath { get; set; }
+        public string NodeId { get; set; }
+        
+        /// <summary>
+        /// Local file holding the content when it was downloaded to disk instead of <see cref="Data"/>.
+        /// </summary>
+        public string TempFilePath { get; set; }
+        
+        /// <summary>
+        /// MD5 of the content, computed while it was written to <see cref="TempFilePath"/>.
+        /// </summary>
+        public string ContentHash { get; set; }
     }
     
+    /// <summary>
+    /// A thin wrapper over the shared <see cref="ComfyuiSession"/> of a server.
+    /// Instances are cheap; the HTTP connections and the WebSocket are owned by the session.
+    /// </summary>
     public class ComfyUI_API
     {
-        private string _clientId, _serverAddress;
-        private ClientWebSocket _ws = new();
+        private readonly ComfyuiSession _session;
+        
+        /// <summary>
+        /// Directory that receives video outputs when <see cref="DownloadVideosToTempFile"/> is set.
+        /// </summary>
+        public static string TempOutputDirectory { get; } = Path.Combine(Path.GetTempPath(), "Comfizen", "outputs");
 
-        public ComfyUI_API(string serverAddress = "127.0.0.1:8188", string? clientId = null)
-        {
-            _clientId = clientId ?? Guid.NewGuid().ToString();
-            _serverAddress = serverAddress;
-        }
+        /// <summary>
+        /// How many output files of a prompt are downloaded at the same time.
+        /// </summary>
+        public int MaxParallelDownloads { get; set; } = 4;
+        
+        /// <summary>
+        /// When set, video outputs are streamed to a file in <see cref="TempOutputDirectory"/> instead of being read into memory.
+        /// </summary>
+        public bool DownloadVideosToTempFile { get; set; }
 
-        public async Task Connect()
+        public ComfyUI_API(string serverAddress = "127.0.0.1:8188")
         {
-            if (_ws.State == WebSocketState.Open) return;
-            _ws = new ClientWebSocket(); // Recreate the instance if it's closed or aborted
-            await _ws.ConnectAsync(new Uri($"ws://{_serverAddress}/ws?clientId={_clientId}"), CancellationToken.None);
+            _session = ComfyuiSession.For(serverAddress);
         }
 
-        public async Task<Dictionary<string, object>?> QueuePromptAsync(string prompt)
+        public Task Connect() => _session.EnsureConnectedAsync();
+
+        /// <summary>
+        /// The response body of the last prompt the server rejected (its validation errors), or null.
+        /// </summary>
+        public string? LastPromptError { get; private set; }
+
+        public async Task<Dictionary<string, object>?> QueuePromptAsync(string prompt, string? promptId = null)
         {
+            LastPromptError = null;
             try
             {
-                var promptObj = JObject.Parse(prompt);
-                var requestData = new { prompt = promptObj, client_id = _clientId };
-                var jsonRequest = JsonConvert.SerializeObject(requestData);
-
-                using (var httpClient = new HttpClient())
+                // The prompt is already JSON: it is written into the request envelope as is, without being parsed again.
+                using var content = new PromptRequestContent(prompt, _session.ClientId, promptId);
+                using (var response = await _session.Http.PostAsync("prompt", content))
                 {
-                    var requestUri = $"http://{_serverAddress}/prompt";
-                    var content = new StringContent(jsonRequest, Encoding.UTF8, "application/json");
-                    using (var response = await httpClient.PostAsync(requestUri, content))
+                    if (!response.IsSuccessStatusCode)
                     {
-                        response.EnsureSuccessStatusCode();
-                        var responseString = await response.Content.ReadAsStringAsync();
-                        return JsonConvert.DeserializeObject<Dictionary<string, object>>(responseString);
+                        LastPromptError = await response.Content.ReadAsStringAsync();
                     }
+                    response.EnsureSuccessStatusCode();
+                    var responseString = await response.Content.ReadAsStringAsync();
+                    return JsonConvert.DeserializeObject<Dictionary<string, object>>(responseString);
                 }
             }
             catch (Exception ex)
@@ -65,23 +97,66 @@ namespace Comfizen
             }
         }
 
-        public async Task<byte[]?> GetImageAsync(string filename, string subfolder, string folderType)
+        /// <summary>
+        /// Queues a prompt and subscribes to its WebSocket events. The prompt id is generated client-side
+        /// so the subscription exists before the server can start executing; if the server assigns its own id,
+        /// the subscription is re-keyed and any events already received for it are replayed.
+        /// </summary>
+        /// <returns>The subscription, or null if the prompt could not be queued.</returns>
+        public async Task<PromptSubscription?> SubmitPromptAsync(string prompt)
+        {
+            var subscription = _session.Subscribe(Guid.NewGuid().ToString());
+            var response = await QueuePromptAsync(prompt, subscription.PromptId);
+            var promptId = response != null && response.TryGetValue("prompt_id", out var id) ? id?.ToString() : null;
+            if (string.IsNullOrEmpty(promptId))
+            {
+                subscription.Dispose();
+                return null;
+            }
+
+            if (promptId != subscription.PromptId)
+            {
+                subscription.Rebind(promptId);
+            }
+            return subscription;
+        }
+
+        /// <summary>
+        /// Uploads a file to the server's input folder through /upload/image, replacing a file of the same name.
+        /// </summary>
+        /// <returns>The name to reference the file by in a LoadImage node (including its subfolder), or null if the upload failed.</returns>
+        public async Task<string?> UploadImageAsync(byte[] data, string fileName)
         {
             try
             {
-                var queryString = new NameValueCollection
-                {
-                    ["filename"] = filename,
-                    ["subfolder"] = subfolder,
-                    ["type"] = folderType
-                }.ToQueryString();
+                using var content = new MultipartFormDataContent();
+                content.Add(new ByteArrayContent(data), "image", fileName);
+                content.Add(new StringContent("input"), "type");
+                content.Add(new StringContent("true"), "overwrite");
 
-                var url = $"http://{_serverAddress}/view?{queryString}";
+                using (var response = await _session.Http.PostAsync("upload/image", content))
+                {
+                    response.EnsureSuccessStatusCode();
+                    var result = JObject.Parse(await response.Content.ReadAsStringAsync());
+                    var name = result["name"]?.ToString();
+                    var subfolder = result["subfolder"]?.ToString();
+                    return string.IsNullOrEmpty(subfolder) ? name : $"{subfolder}/{name}";
+                }
+            }
+            catch (Exception ex)
+            {
+                Console.WriteLine($"An error occurred in UploadImageAsync: {ex.Message}");
+                return null;
+            }
+        }
 
-                using (var httpClient = new HttpClient())
+        public async Task<byte[]?> GetImageAsync(string filename, string subfolder, string folderType)
+        {
+            try
+            {
+                using (var response = await GetViewResponseAsync(filename, subfolder, folderType))
                 {
-                    var responseStream = await httpClient.GetStreamAsync(url);
-                    return await ReadFullyAsync(responseStream);
+                    return await ReadContentAsync(response.Content);
                 }
             }
             catch (Exception ex)
@@ -91,21 +166,97 @@ namespace Comfizen
             }
         }
         
-        public async Task<bool> InterruptAsync()
+        /// <summary>
+        /// Streams an output file straight to a new file in <see cref="TempOutputDirectory"/>, hashing it on the way.
+        /// </summary>
+        /// <returns>The path of the written file and the MD5 of its content, or null if the download failed.</returns>
+        public async Task<(string Path, string Md5)?> DownloadToTempFileAsync(string filename, string subfolder, string folderType)
         {
+            Directory.CreateDirectory(TempOutputDirectory);
+            var tempPath = Path.Combine(TempOutputDirectory, $"{Guid.NewGuid():N}{Path.GetExtension(filename)}");
             try
             {
-                using (var httpClient = new HttpClient())
+                using var response = await GetViewResponseAsync(filename, subfolder, folderType);
+                await using var input = await response.Content.ReadAsStreamAsync();
+                await using var output = new FileStream(tempPath, FileMode.CreateNew, FileAccess.Write, FileShare.Read, 1, FileOptions.Asynchronous);
+                using var md5 = IncrementalHash.CreateHash(HashAlgorithmName.MD5);
+
+                var buffer = ArrayPool<byte>.Shared.Rent(81920);
+                try
                 {
-                    var requestUri = $"http://{_serverAddress}/interrupt";
-                    // Отправляем пустой POST-запрос
-                    using (var response = await httpClient.PostAsync(requestUri, null))
+                    int read;
+                    while ((read = await input.ReadAsync(buffer.AsMemory())) > 0)
                     {
-                        response.EnsureSuccessStatusCode();
-                        Debug.WriteLine("Interrupt request sent successfully.");
-                        return true;
+                        md5.AppendData(buffer, 0, read);
+                        await output.WriteAsync(buffer.AsMemory(0, read));
                     }
                 }
+                finally
+                {
+                    ArrayPool<byte>.Shared.Return(buffer);
+                }
+                return (tempPath, Convert.ToHexString(md5.GetHashAndReset()));
+            }
+            catch (Exception ex)
+            {
+                Console.WriteLine($"An error occurred in DownloadToTempFileAsync: {ex.Message}");
+                try { File.Delete(tempPath); } catch { /* Best effort */ }
+                return null;
+            }
+        }
+        
+        /// <summary>
+        /// Deletes the files written by <see cref="DownloadToTempFileAsync"/>.
+        /// </summary>
+        public static void DeleteTempOutputs()
+        {
+            try
+            {
+                if (Directory.Exists(TempOutputDirectory))
+                {
+                    Directory.Delete(TempOutputDirectory, true);
+                }
+            }
+            catch (Exception ex)
+            {
+                Debug.WriteLine($"Failed to delete temporary outputs: {ex.Message}");
+            }
+        }
+        
+        private async Task<HttpResponseMessage> GetViewResponseAsync(string filename, string subfolder, string folderType)
+        {
+            var queryString = new NameValueCollection
+            {
+                ["filename"] = filename,
+                ["subfolder"] = subfolder,
+                ["type"] = folderType
+            }.ToQueryString();
+
+            // Only the headers are buffered; the body is read by the caller straight from the connection.
+            var response = await _session.Http.GetAsync($"view?{queryString}", HttpCompletionOption.ResponseHeadersRead);
+            try
+            {
+                response.EnsureSuccessStatusCode();
+                return response;
+            }
+            catch
+            {
+                response.Dispose();
+                throw;
+            }
+        }
+        
+        public async Task<bool> InterruptAsync()
+        {
+            try
+            {
+                // Отправляем пустой POST-запрос
+                using (var response = await _session.Http.PostAsync("interrupt", null))
+                {
+                    response.EnsureSuccessStatusCode();
+                    Debug.WriteLine("Interrupt request sent successfully.");
+                    return true;
+                }
             }
             catch (Exception ex)
             {
@@ -114,19 +265,93 @@ namespace Comfizen
             }
         }
 
-        public async Task<Dictionary<string, object>?> GetHistoryAsync(string promptId)
+        /// <summary>
+        /// Removes prompts from the server's pending queue. Prompts that are already running or finished are unaffected.
+        /// </summary>
+        public async Task<bool> DeleteQueuedPromptsAsync(IEnumerable<string> promptIds)
         {
             try
             {
-                using (var httpClient = new HttpClient())
+                var requestData = new JObject { ["delete"] = new JArray(promptIds) };
+                var content = new StringContent(requestData.ToString(Formatting.None), Encoding.UTF8, "application/json");
+                using (var response = await _session.Http.PostAsync("queue", content))
                 {
-                    var url = $"http://{_serverAddress}/history/{promptId}";
-                    using (var response = await httpClient.GetAsync(url))
+                    response.EnsureSuccessStatusCode();
+                    return true;
+                }
+            }
+            catch (Exception ex)
+            {
+                Console.WriteLine($"An error occurred in DeleteQueuedPromptsAsync: {ex.Message}");
+                return false;
+            }
+        }
+
+        /// <summary>
+        /// Returns the ids of all prompts that are currently running or pending on the server,
+        /// or null if the queue could not be read.
+        /// </summary>
+        public async Task<HashSet<string>?> GetQueuedPromptIdsAsync()
+        {
+            try
+            {
+                using (var response = await _session.Http.GetAsync("queue"))
+                {
+                    response.EnsureSuccessStatusCode();
+                    var queue = JObject.Parse(await response.Content.ReadAsStringAsync());
+                    var ids = new HashSet<string>();
+                    foreach (var key in new[] { "queue_running", "queue_pending" })
                     {
-                        response.EnsureSuccessStatusCode();
-                        var responseString = await response.Content.ReadAsStringAsync();
-                        return JsonConvert.DeserializeObject<Dictionary<string, object>>(responseString);
+                        if (queue[key] is not JArray items) continue;
+                        foreach (var item in items)
+                        {
+                            // Each entry is [number, prompt_id, prompt, extra_data, outputs_to_execute]
+                            if (item is JArray entry && entry.Count > 1)
+                            {
+                                ids.Add(entry[1].ToString());
+                            }
+                        }
                     }
+                    return ids;
+                }
+            }
+            catch (Exception ex)
+            {
+                Console.WriteLine($"An error occurred in GetQueuedPromptIdsAsync: {ex.Message}");
+                return null;
+            }
+        }
+
+        /// <summary>
+        /// Returns the number of prompts running or waiting on the server, from all clients (null if the server could not be reached).
+        /// </summary>
+        public async Task<int?> GetQueueRemainingAsync()
+        {
+            try
+            {
+                using (var response = await _session.Http.GetAsync("prompt"))
+                {
+                    response.EnsureSuccessStatusCode();
+                    var status = JObject.Parse(await response.Content.ReadAsStringAsync());
+                    return status["exec_info"]?["queue_remaining"]?.Value<int>() ?? 0;
+                }
+            }
+            catch (Exception ex)
+            {
+                Console.WriteLine($"An error occurred in GetQueueRemainingAsync: {ex.Message}");
+                return null;
+            }
+        }
+
+        public async Task<Dictionary<string, object>?> GetHistoryAsync(string promptId)
+        {
+            try
+            {
+                using (var response = await _session.Http.GetAsync($"history/{promptId}"))
+                {
+                    response.EnsureSuccessStatusCode();
+                    var responseString = await response.Content.ReadAsStringAsync();
+                    return JsonConvert.DeserializeObject<Dictionary<string, object>>(responseString);
                 }
             }
             catch (Exception ex)
@@ -136,8 +361,20 @@ namespace Comfizen
             }
         }
 
-        private async Task<byte[]> ReadFullyAsync(Stream input)
+        private static async Task<byte[]> ReadContentAsync(HttpContent content)
         {
+            await using var input = await content.ReadAsStreamAsync();
+            
+            // When the server reports the size, read straight into the final array instead of
+            // growing a MemoryStream and copying it once more with ToArray().
+            var length = content.Headers.ContentLength;
+            if (length is > 0 && length <= Array.MaxLength)
+            {
+                var data = GC.AllocateUninitializedArray<byte>((int)length.Value);
+                await input.ReadExactlyAsync(data);
+                return data;
+            }
+
             using (var ms = new MemoryStream())
             {
                 await input.CopyToAsync(ms);
@@ -145,154 +382,230 @@ namespace Comfizen
             }
         }
 
-        public async Task<Dictionary<string, List<FileOutput>>> GetImagesAsync(string prompt)
+        /// <summary>
+        /// Yields the output files of a submitted prompt as soon as each node reports them in its "executed" event.
+        /// Downloads start immediately, while the rest of the graph is still running; files are yielded in event order.
+        /// /history is queried only to fill gaps: when the connection was lost, no node reported outputs,
+        /// or a cached node was not reported (older servers do not send "executed" for cached nodes).
+        /// </summary>
+        /// <param name="onEvent">Optionally observes every event of the prompt, e.g. for timing.</param>
+        public async IAsyncEnumerable<FileOutput> StreamOutputsAsync(PromptSubscription subscription, Action<JObject>? onEvent = null, [EnumeratorCancellation] CancellationToken token = default)
         {
-            var promptId = await GetPromptIdAsync(prompt);
-            if (string.IsNullOrEmpty(promptId)) return new Dictionary<string, List<FileOutput>>();
+            var downloads = Channel.CreateUnbounded<Task<FileOutput?>>(new UnboundedChannelOptions { SingleReader = true, SingleWriter = true });
+            var downloadSlots = new SemaphoreSlim(Math.Max(1, MaxParallelDownloads));
+            var producer = Task.Run(() => ProduceDownloadsAsync(subscription, onEvent, downloads.Writer, downloadSlots, token), token);
 
-            await Connect(); // Убедимся, что сокет подключен
-            await ReceiveExecutingStatusAsync(_ws, promptId);
-            var outputImages = await ExtractImagesFromHistoryAsync(promptId);
-            return outputImages;
-        }
+            await foreach (var download in downloads.Reader.ReadAllAsync(token))
+            {
+                var file = await download;
+                if (file != null)
+                {
+                    yield return file;
+                }
+            }
 
-        private async Task<string> GetPromptIdAsync(string prompt)
-        {
-            var response = await QueuePromptAsync(prompt);
-            return response?["prompt_id"]?.ToString();
+            await producer;
         }
 
-        // ====================================================================
-        // ИЗМЕНЕННЫЙ МЕТОД
-        // ====================================================================
-        private async Task ReceiveExecutingStatusAsync(ClientWebSocket ws, string promptId)
+        private async Task ProduceDownloadsAsync(PromptSubscription subscription, Action<JObject>? onEvent, ChannelWriter<Task<FileOutput?>> downloads, SemaphoreSlim downloadSlots, CancellationToken token)
         {
-            var buffer = new byte[1024 * 4]; // Буфер для чтения
-
-            while (ws.State == WebSocketState.Open)
+            try
             {
-                using (var ms = new MemoryStream())
+                var requestedFiles = new HashSet<string>();
+                var executedNodes = new HashSet<string>();
+                var cachedNodes = new HashSet<string>();
+
+                void StartDownloads(string nodeId, JObject nodeOutput)
                 {
-                    WebSocketReceiveResult result;
-                    do
+                    foreach (var fileDict in GetOutputFileEntries(nodeOutput))
                     {
-                        // Читаем фрагмент в буфер
-                        result = await ws.ReceiveAsync(new ArraySegment<byte>(buffer), CancellationToken.None);
-
-                        if (result.MessageType == WebSocketMessageType.Close)
+                        var key = $"{nodeId}|{fileDict["type"]}|{fileDict["subfolder"]}|{fileDict["filename"]}";
+                        if (requestedFiles.Add(key))
                         {
-                            await ws.CloseAsync(WebSocketCloseStatus.NormalClosure, string.Empty, CancellationToken.None);
-                            return; // Выходим, если сервер закрыл соединение
+                            downloads.TryWrite(DownloadOutputFileAsync(nodeId, fileDict, downloadSlots));
                         }
+                    }
+                }
 
-                        // Записываем полученный фрагмент в MemoryStream
-                        ms.Write(buffer, 0, result.Count);
-
-                    } while (!result.EndOfMessage); // Повторяем, пока не получим флаг конца сообщения
-
-                    // Теперь, когда все фрагменты собраны, преобразуем их в строку
-                    var message = Encoding.UTF8.GetString(ms.ToArray());
+                await foreach (var message in subscription.Events.ReadAllAsync(token))
+                {
+                    onEvent?.Invoke(message);
+                    if (message["data"] is not JObject data) continue;
 
-                    try
+                    switch (message["type"]?.ToString())
                     {
-                        var msgData = JsonConvert.DeserializeObject<Dictionary<string, object>>(message);
-                        if (msgData == null) continue;
-
-                        var type = msgData["type"]?.ToString();
-                        if (type == "executing")
-                        {
-                            // Проверяем, не является ли это сообщением о завершении всего промпта
-                            if (IsExecutionComplete(msgData, promptId))
+                        case "executed":
+                            var nodeId = data["node"]?.ToString();
+                            if (string.IsNullOrEmpty(nodeId)) break;
+                            executedNodes.Add(nodeId);
+                            if (data["output"] is JObject output)
                             {
-                                return; // Выполнение завершено, выходим из метода
+                                StartDownloads(nodeId, output);
                             }
-                        }
-                        // Можно добавить обработку других типов сообщений, например, прогресса
+                            break;
+                        case "execution_cached":
+                            if (data["nodes"] is JArray nodes)
+                            {
+                                foreach (var node in nodes)
+                                {
+                                    cachedNodes.Add(node.ToString());
+                                }
+                            }
+                            break;
                     }
-                    catch (Exception e)
+                }
+
+                bool hasGaps = subscription.ConnectionLost
+                               || executedNodes.Count == 0
+                               || cachedNodes.Any(n => !executedNodes.Contains(n));
+                if (hasGaps)
+                {
+                    foreach (var (nodeId, nodeOutput) in await GetHistoryOutputsAsync(subscription.PromptId))
                     {
-                        Debug.WriteLine($"Error deserializing WebSocket message: {e.Message}");
+                        StartDownloads(nodeId, nodeOutput);
                     }
                 }
+
+                downloads.TryComplete();
+            }
+            catch (Exception ex)
+            {
+                downloads.TryComplete(ex);
             }
         }
 
-        private bool IsExecutionComplete(Dictionary<string, object> msgData, string promptId)
+        private async Task<FileOutput?> DownloadOutputFileAsync(string nodeId, Dictionary<string, string> fileDict, SemaphoreSlim downloadSlots)
         {
-            if (msgData.TryGetValue("data", out var dataObj) && dataObj is JObject dataJObject)
+            await downloadSlots.WaitAsync();
+            try
             {
-                var data = dataJObject.ToObject<Dictionary<string, object>>();
-                // Сообщение о завершении выглядит так: 'node' is null, 'prompt_id' совпадает
-                if (data.TryGetValue("node", out var node) && node == null)
+                var fileName = fileDict["filename"];
+                var output = new FileOutput
                 {
-                    if (data.TryGetValue("prompt_id", out var promptIdObj) && promptIdObj.ToString() == promptId)
-                    {
-                        return true;
-                    }
+                    FileName = fileName,
+                    FilePath = Path.Combine(fileDict["type"], fileDict["subfolder"], fileName),
+                    NodeId = nodeId
+                };
+
+                if (DownloadVideosToTempFile && ImageOutput.GetFileTypeFromExtension(fileName) == FileType.Video)
+                {
+                    var tempFile = await DownloadToTempFileAsync(fileName, fileDict["subfolder"], fileDict["type"]);
+                    if (tempFile == null) return null;
+                    
+                    output.TempFilePath = tempFile.Value.Path;
+                    output.ContentHash = tempFile.Value.Md5;
+                    return output;
                 }
+
+                output.Data = await GetImageAsync(fileName, fileDict["subfolder"], fileDict["type"]);
+                return output.Data == null ? null : output;
+            }
+            finally
+            {
+                downloadSlots.Release();
             }
-            return false;
         }
 
-        private async Task<Dictionary<string, List<FileOutput>>> ExtractImagesFromHistoryAsync(string promptId)
+        /// <summary>
+        /// Returns the file entries of a node's output: "images" and "gifs" (usually video and animations).
+        /// </summary>
+        private static IEnumerable<Dictionary<string, string>> GetOutputFileEntries(JObject nodeOutput)
         {
-            var response = await GetHistoryAsync(promptId);
-            if (response == null || !response.ContainsKey(promptId)) return new Dictionary<string, List<FileOutput>>();
-
-            var history = ((JObject)response[promptId]).ToObject<Dictionary<string, object>>();
-            var outputs = ((JObject)history["outputs"]).ToObject<Dictionary<string, object>>();
-
-            var outputFiles = new Dictionary<string, List<FileOutput>>();
-
-            foreach (var nodeId in outputs)
+            foreach (var key in new[] { "images", "gifs" })
             {
-                if (nodeId.Value is JObject nodeOutput)
+                if (nodeOutput.TryGetValue(key, out var filesToken) && filesToken is JArray files)
                 {
-                    var filesOutput = new List<FileOutput>();
-                    
-                    // ====================================================================
-                    // ИЗМЕНЕНИЕ ЗДЕСЬ: Функция для обработки любого списка файлов
-                    // ====================================================================
-                    async Task ProcessFiles(JToken filesToken)
+                    foreach (var file in files)
                     {
-                        if (filesToken is JArray files)
+                        var fileDict = file.ToObject<Dictionary<string, string>>();
+                        if (fileDict != null && fileDict.ContainsKey("filename"))
                         {
-                            foreach (var file in files)
-                            {
-                                var fileDict = file.ToObject<Dictionary<string, string>>();
-                                if (fileDict != null)
-                                {
-                                    var fileData = await GetImageAsync(fileDict["filename"], fileDict["subfolder"], fileDict["type"]);
-                                    if (fileData != null)
-                                    {
-                                        var filePath = Path.Combine(fileDict["type"], fileDict["subfolder"], fileDict["filename"]);
-                                        filesOutput.Add(new FileOutput { Data = fileData, FileName = fileDict["filename"], FilePath = filePath });
-                                    }
-                                }
-                            }
+                            fileDict.TryAdd("subfolder", string.Empty);
+                            fileDict.TryAdd("type", "output");
+                            yield return fileDict;
                         }
                     }
+                }
+            }
+        }
 
-                    // Проверяем ключ "images"
-                    if (nodeOutput.TryGetValue("images", out var imagesToken))
-                    {
-                        await ProcessFiles(imagesToken);
-                    }
+        private async Task<List<(string NodeId, JObject Output)>> GetHistoryOutputsAsync(string promptId)
+        {
+            var result = new List<(string NodeId, JObject Output)>();
+            var response = await GetHistoryAsync(promptId);
+            if (response == null || !response.TryGetValue(promptId, out var historyObj) || historyObj is not JObject history) return result;
 
-                    // Проверяем ключ "gifs" (обычно для видео и анимации)
-                    if (nodeOutput.TryGetValue("gifs", out var gifsToken))
+            if (history["outputs"] is JObject outputs)
+            {
+                foreach (var nodeOutput in outputs.Properties())
+                {
+                    if (nodeOutput.Value is JObject output)
                     {
-                        await ProcessFiles(gifsToken);
+                        result.Add((nodeOutput.Name, output));
                     }
+                }
+            }
+            return result;
+        }
+    }
 
-                    if (filesOutput.Count > 0)
-                    {
-                        outputFiles[nodeId.Key] = filesOutput;
-                    }
+    /// <summary>
+    /// The body of a POST /prompt request: <c>{"prompt": ..., "client_id": ..., "prompt_id": ...}</c>.
+    /// The prompt JSON text is transcoded to UTF-8 straight into the request stream through a pooled buffer,
+    /// so no DOM and no second copy of a large prompt (e.g. with embedded base64 images) are created.
+    /// </summary>
+    internal sealed class PromptRequestContent : HttpContent
+    {
+        private const int CharChunkSize = 16 * 1024;
+
+        private readonly string _prompt;
+        private readonly byte[] _prefix;
+        private readonly byte[] _suffix;
+
+        public PromptRequestContent(string prompt, string clientId, string? promptId)
+        {
+            _prompt = prompt;
+            _prefix = Encoding.UTF8.GetBytes("{\"prompt\":");
+            var suffix = new StringBuilder();
+            suffix.Append(",\"client_id\":").Append(JsonConvert.ToString(clientId));
+            if (promptId != null)
+            {
+                suffix.Append(",\"prompt_id\":").Append(JsonConvert.ToString(promptId));
+            }
+            suffix.Append('}');
+            _suffix = Encoding.UTF8.GetBytes(suffix.ToString());
+            Headers.ContentType = new MediaTypeHeaderValue("application/json") { CharSet = "utf-8" };
+        }
+
+        protected override async Task SerializeToStreamAsync(Stream stream, TransportContext? context)
+        {
+            await stream.WriteAsync(_prefix);
+
+            var encoder = Encoding.UTF8.GetEncoder();
+            var buffer = ArrayPool<byte>.Shared.Rent(Encoding.UTF8.GetMaxByteCount(CharChunkSize));
+            try
+            {
+                for (int offset = 0; offset < _prompt.Length; offset += CharChunkSize)
+                {
+                    var count = Math.Min(CharChunkSize, _prompt.Length - offset);
+                    var flush = offset + count == _prompt.Length;
+                    // The encoder keeps a surrogate pair that is split between two chunks until the next call.
+                    var written = encoder.GetBytes(_prompt.AsSpan(offset, count), buffer, flush);
+                    await stream.WriteAsync(buffer.AsMemory(0, written));
                 }
             }
+            finally
+            {
+                ArrayPool<byte>.Shared.Return(buffer);
+            }
 
-            return outputFiles;
+            await stream.WriteAsync(_suffix);
+        }
+
+        protected override bool TryComputeLength(out long length)
+        {
+            length = _prefix.Length + Encoding.UTF8.GetByteCount(_prompt) + _suffix.Length;
+            return true;
         }
     }
-}
\ No newline at end of file
+}
@@ -0,0 +1,70 @@
+using System.Collections.Generic;
+using System.Windows.Media.Imaging;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// The most recently used decoded gallery images, bounded by their decoded size. Images that fall out of the
+    /// cache are decoded again from the blob store when they are next needed; the views that still show them keep
+    /// their own reference until they let go.
+    /// </summary>
+    public sealed class DecodedImageCache
+    {
+        private const long DefaultCapacityBytes = 512L * 1024 * 1024;
+
+        public static DecodedImageCache Shared { get; } = new DecodedImageCache(DefaultCapacityBytes);
+
+        private readonly long _capacityBytes;
+        private readonly Dictionary<string, LinkedListNode<(string Key, BitmapSource Image, long Size)>> _nodes = new();
+        // Most recently used first
+        private readonly LinkedList<(string Key, BitmapSource Image, long Size)> _order = new();
+        private readonly object _lock = new();
+        private long _sizeBytes;
+
+        public DecodedImageCache(long capacityBytes)
+        {
+            _capacityBytes = capacityBytes;
+        }
+
+        public bool TryGet(string key, out BitmapSource image)
+        {
+            lock (_lock)
+            {
+                if (key != null && _nodes.TryGetValue(key, out var node))
+                {
+                    _order.Remove(node);
+                    _order.AddFirst(node);
+                    image = node.Value.Image;
+                    return true;
+                }
+            }
+            image = null;
+            return false;
+        }
+
+        public void Add(string key, BitmapSource image)
+        {
+            if (key == null || image == null) return;
+            long size = (long)image.PixelWidth * image.PixelHeight * 4;
+            lock (_lock)
+            {
+                if (_nodes.Remove(key, out var existing))
+                {
+                    _order.Remove(existing);
+                    _sizeBytes -= existing.Value.Size;
+                }
+                _nodes[key] = _order.AddFirst((key, image, size));
+                _sizeBytes += size;
+
+                // The newest image is kept even if it alone exceeds the capacity.
+                while (_sizeBytes > _capacityBytes && _order.Count > 1)
+                {
+                    var last = _order.Last;
+                    _order.RemoveLast();
+                    _nodes.Remove(last.Value.Key);
+                    _sizeBytes -= last.Value.Size;
+                }
+            }
+        }
+    }
+}
@@ -0,0 +1,102 @@
+using System;
+using System.Collections.Generic;
+using System.Collections.ObjectModel;
+using System.Collections.Specialized;
+using System.ComponentModel;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// The outputs in the gallery, indexed by <see cref="ImageOutput.VisualHash"/> so that checking whether an output
+    /// is already there takes O(1) however many outputs the session has collected. The index is updated by every
+    /// change to the collection; an output's VisualHash must not change while it is in the collection.
+    /// </summary>
+    public sealed class GalleryCollection : ObservableCollection<ImageOutput>
+    {
+        private readonly Dictionary<string, List<ImageOutput>> _byVisualHash = new(StringComparer.Ordinal);
+
+        public bool ContainsVisualHash(string visualHash)
+        {
+            return visualHash != null && _byVisualHash.ContainsKey(visualHash);
+        }
+
+        /// <summary>
+        /// The first added output with the given visual hash, or null.
+        /// </summary>
+        public ImageOutput FindByVisualHash(string visualHash)
+        {
+            return visualHash != null && _byVisualHash.TryGetValue(visualHash, out var outputs) ? outputs[0] : null;
+        }
+
+        /// <summary>
+        /// Removes several outputs with a single Reset notification, instead of one notification (and one gallery refresh) per output.
+        /// </summary>
+        public void RemoveRange(IEnumerable<ImageOutput> outputs)
+        {
+            CheckReentrancy();
+            var toRemove = new HashSet<ImageOutput>(outputs);
+            if (toRemove.Count == 0) return;
+
+            var kept = new List<ImageOutput>(Items.Count);
+            foreach (var output in Items)
+            {
+                if (toRemove.Contains(output)) RemoveFromIndex(output);
+                else kept.Add(output);
+            }
+            if (kept.Count == Items.Count) return;
+
+            Items.Clear();
+            foreach (var output in kept)
+            {
+                Items.Add(output);
+            }
+            OnPropertyChanged(new PropertyChangedEventArgs(nameof(Count)));
+            OnPropertyChanged(new PropertyChangedEventArgs("Item[]"));
+            OnCollectionChanged(new NotifyCollectionChangedEventArgs(NotifyCollectionChangedAction.Reset));
+        }
+
+        // The index is updated before the change is announced, so that handlers already see it.
+        protected override void InsertItem(int index, ImageOutput item)
+        {
+            AddToIndex(item);
+            base.InsertItem(index, item);
+        }
+
+        protected override void RemoveItem(int index)
+        {
+            RemoveFromIndex(this[index]);
+            base.RemoveItem(index);
+        }
+
+        protected override void SetItem(int index, ImageOutput item)
+        {
+            RemoveFromIndex(this[index]);
+            AddToIndex(item);
+            base.SetItem(index, item);
+        }
+
+        protected override void ClearItems()
+        {
+            _byVisualHash.Clear();
+            base.ClearItems();
+        }
+
+        private void AddToIndex(ImageOutput output)
+        {
+            if (output?.VisualHash == null) return;
+            if (!_byVisualHash.TryGetValue(output.VisualHash, out var outputs))
+            {
+                outputs = new List<ImageOutput>(1);
+                _byVisualHash.Add(output.VisualHash, outputs);
+            }
+            outputs.Add(output);
+        }
+
+        private void RemoveFromIndex(ImageOutput output)
+        {
+            if (output?.VisualHash == null || !_byVisualHash.TryGetValue(output.VisualHash, out var outputs)) return;
+            outputs.Remove(output);
+            if (outputs.Count == 0) _byVisualHash.Remove(output.VisualHash);
+        }
+    }
+}
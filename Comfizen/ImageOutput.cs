@@ -25,26 +25,82 @@ namespace Comfizen
         }
 
         /// <summary>
-        /// ADDED: New constructor to create an ImageOutput directly from a file path.
+        /// Creates an ImageOutput directly from a file path. The file is read and hashed off the UI thread.
         /// </summary>
         /// <param name="filePath">The full path to the image or video file.</param>
-        public ImageOutput(string filePath) : this() // Chain to the default constructor
+        public static async Task<ImageOutput> FromFileAsync(string filePath)
         {
             if (!File.Exists(filePath))
             {
                 throw new FileNotFoundException("The specified file does not exist.", filePath);
             }
 
-            ImageBytes = File.ReadAllBytes(filePath);
-            FileName = Path.GetFileName(filePath);
-            FilePath = filePath;
-            // The prompt is unknown when loading from a random file.
-            Prompt = null; 
-            // Compute a hash for identification, especially useful for drag-and-drop.
-            VisualHash = Utils.ComputePixelHash(ImageBytes);
+            var bytes = await File.ReadAllBytesAsync(filePath);
+            var output = new ImageOutput
+            {
+                FileName = Path.GetFileName(filePath),
+                FilePath = filePath,
+                // The prompt is unknown when loading from a random file.
+                Prompt = null,
+                // Compute a hash for identification, especially useful for drag-and-drop.
+                VisualHash = await Utils.ComputePixelHashAsync(bytes)
+            };
+            output.SetContent(bytes);
+            return output;
+        }
+        
+        // Only set when the content could not be written to the blob store.
+        private byte[] _imageBytes;
+        
+        /// <summary>
+        /// Sets the file content. It is moved to the <see cref="OutputBlobStore"/> and only kept in memory if it
+        /// cannot be written there.
+        /// </summary>
+        public void SetContent(byte[] content)
+        {
+            BlobId = content != null ? OutputBlobStore.Instance.TryPut(content) : null;
+            _imageBytes = BlobId == null ? content : null;
+        }
+        
+        /// <summary>
+        /// Reads the whole file content, or returns null if there is none. It is read from disk on every call, so
+        /// callers read it once and hold on to the array while they need it; <see cref="OpenRead"/> avoids loading
+        /// it when a stream will do, and <see cref="BlobId"/> can be copied when the content is only copied.
+        /// </summary>
+        public byte[] ReadContent()
+        {
+            if (_imageBytes != null) return _imageBytes;
+            if (BlobId != null) return OutputBlobStore.Instance.Read(BlobId);
+            return BackingFilePath != null && File.Exists(BackingFilePath) ? File.ReadAllBytes(BackingFilePath) : null;
         }
         
-        public byte[] ImageBytes { get; set; }
+        /// <summary>
+        /// The id of the content in the <see cref="OutputBlobStore"/>. Outputs with the same content share it, so it
+        /// can be copied from one output to another without reading the content.
+        /// </summary>
+        [JsonIgnore]
+        public string BlobId { get; set; }
+        
+        /// <summary>
+        /// A local file holding the content when the output was downloaded to disk instead of memory (large videos).
+        /// </summary>
+        [JsonIgnore]
+        public string BackingFilePath { get; set; }
+        
+        [JsonIgnore]
+        public bool HasContent => _imageBytes != null || BlobId != null || BackingFilePath != null;
+        
+        /// <summary>
+        /// Opens the content for reading without loading all of it into memory, or returns null if there is none.
+        /// </summary>
+        public Stream OpenRead()
+        {
+            if (_imageBytes != null) return new MemoryStream(_imageBytes, false);
+            if (BlobId != null) return OutputBlobStore.Instance.OpenRead(BlobId);
+            return BackingFilePath != null && File.Exists(BackingFilePath)
+                ? new FileStream(BackingFilePath, FileMode.Open, FileAccess.Read, FileShare.ReadWrite | FileShare.Delete, 81920, FileOptions.SequentialScan)
+                : null;
+        }
         public string FileName { get; set; }
         public string Prompt { get; set; }
         public DateTime CreatedAt { get; set; } = DateTime.Now;
@@ -124,11 +180,11 @@ namespace Comfizen
 
             if (Type == FileType.Video)
             {
-                PerceptualHash = await Utils.ComputeVideoPerceptualHashAsync(ImageBytes);
+                PerceptualHash = await Utils.ComputeVideoPerceptualHashAsync(ReadContent());
             }
             else
             {
-                PerceptualHash = Utils.ComputeAverageHash(ImageBytes);
+                PerceptualHash = Utils.ComputeAverageHash(ReadContent());
             }
         }
         
@@ -139,11 +195,12 @@ namespace Comfizen
             {
                 if (_resolution == null)
                 {
-                    if (Type == FileType.Image && ImageBytes != null)
+                    if (Type == FileType.Image && HasContent)
                     {
                         try
                         {
-                            using var ms = new MemoryStream(ImageBytes);
+                            // Only the header is decoded.
+                            using var ms = OpenRead();
                             var frame = BitmapFrame.Create(ms, BitmapCreateOptions.DelayCreation, BitmapCacheOption.None);
                             _resolution = $"{frame.PixelWidth}x{frame.PixelHeight}";
                         }
@@ -165,11 +222,16 @@ namespace Comfizen
         
         public FileType Type => GetFileTypeFromExtension(FileName);
         
-        private BitmapImage _image;
+        // Only used for content that is not in the blob store; other decoded images live in the DecodedImageCache.
+        private BitmapSource _image;
         private bool _isImageLoading = false;
         
+        /// <summary>
+        /// The decoded image. Decoded in the background on first access (null until then) and kept in
+        /// <see cref="DecodedImageCache.Shared"/>, from which it may be evicted and decoded again later.
+        /// </summary>
         [JsonIgnore]
-        public BitmapImage Image
+        public BitmapSource Image
         {
             get
             {
@@ -177,20 +239,25 @@ namespace Comfizen
                 {
                     return _image;
                 }
+                if (DecodedImageCache.Shared.TryGet(BlobId, out var cached))
+                {
+                    return cached;
+                }
 
-                if (!_isImageLoading && Type == FileType.Image && ImageBytes != null)
+                if (!_isImageLoading && Type == FileType.Image && HasContent)
                 {
                     _isImageLoading = true;
                     Task.Run(() =>
                     {
                         try
                         {
-                            var image = ByteArrayToImage(ImageBytes);
+                            var image = LoadImage();
                             image.Freeze(); // Make it thread-safe before passing to UI thread
                         
                             Application.Current.Dispatcher.Invoke(() =>
                             {
-                                _image = image;
+                                if (BlobId != null) DecodedImageCache.Shared.Add(BlobId, image);
+                                else _image = image;
                                 PropertyChanged?.Invoke(this, new PropertyChangedEventArgs(nameof(Image)));
                                 _isImageLoading = false;
                             });
@@ -207,17 +274,43 @@ namespace Comfizen
             }
         }
         
+        /// <summary>
+        /// The image decoded at the size of the gallery tiles, from <see cref="ThumbnailService"/>.
+        /// Null (or a smaller thumbnail) until it has been loaded.
+        /// </summary>
+        [JsonIgnore]
+        public BitmapSource Thumbnail
+        {
+            get
+            {
+                if (Type != FileType.Image || !HasContent) return null;
+                // Without a content key the thumbnail cannot be cached.
+                if (BlobId == null && VisualHash == null) return Image;
+                return ThumbnailService.Instance.GetOrRequest(this);
+            }
+        }
+        
+        /// <summary>
+        /// Makes the gallery tile ask for <see cref="Thumbnail"/> again, e.g. when it has been loaded or the tiles grew.
+        /// </summary>
+        public void RefreshThumbnail()
+        {
+            PropertyChanged?.Invoke(this, new PropertyChangedEventArgs(nameof(Thumbnail)));
+        }
+        
         /// <summary>
         /// Registers the video with the in-memory server and returns a unique local URL for playback.
         /// </summary>
         public Uri GetHttpUri()
         {
-            if (Type != FileType.Video || ImageBytes == null)
+            if (Type != FileType.Video || !HasContent)
                 return null;
 
             try
             {
-                return InMemoryHttpServer.Instance.RegisterMedia(ImageBytes, FileName);
+                // Content on disk is streamed from the file in the requested ranges.
+                if (_imageBytes != null) return InMemoryHttpServer.Instance.RegisterMedia(_imageBytes, FileName);
+                return InMemoryHttpServer.Instance.RegisterMediaFile(BlobId != null ? OutputBlobStore.Instance.GetPath(BlobId) : BackingFilePath, FileName);
             }
             catch (Exception ex)
             {
@@ -226,13 +319,14 @@ namespace Comfizen
             }
         }
 
-        private BitmapImage ByteArrayToImage(byte[] byteArrayIn)
+        private BitmapImage LoadImage()
         {
-            var ms = new MemoryStream(byteArrayIn);
+            // Decoded straight from the store; OnLoad reads everything before the stream is closed.
+            using var stream = OpenRead();
             var image = new BitmapImage();
             image.BeginInit();
             image.CacheOption = BitmapCacheOption.OnLoad;
-            image.StreamSource = ms;
+            image.StreamSource = stream;
             image.EndInit();
             return image;
         }
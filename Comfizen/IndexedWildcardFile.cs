@@ -0,0 +1,357 @@
+using System;
+using System.Buffers;
+using System.Collections;
+using System.Collections.Generic;
+using System.Globalization;
+using System.IO;
+using System.Runtime.InteropServices;
+using System.Security.Cryptography;
+using System.Text;
+using System.Threading;
+using Microsoft.Win32.SafeHandles;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// The lines of a large wildcard file, read on demand: only the lines that are accessed are read and decoded.
+    /// Where each line starts is kept in an index that is built once and persisted next to the application, so that
+    /// the next start only has to check the file's size and modification time.
+    /// The file is opened only for the duration of a read, so it can still be edited and saved while it is in use.
+    /// In files that opt in to weights (see <see cref="WeightedWildcardLines"/>), the weights of "weight::text" lines
+    /// are taken while the index is built and kept with it, so that weighted picks never have to read the whole file.
+    /// </summary>
+    public sealed class IndexedWildcardFile : IReadOnlyList<string>
+    {
+        private const int IndexMagic = 0x49575A43; // "CZWI"
+        private const int IndexVersion = 3;
+        private const int ReadBufferSize = 1 << 20;
+
+        private static readonly string _indexDirectory = Path.Combine(Directory.GetCurrentDirectory(), "wildcard_index");
+
+        private readonly string _path;
+        // Byte offset and length of every line that is not blank or a comment
+        private readonly long[] _starts;
+        private readonly int[] _lengths;
+        // The file the index was built for; a read from a file that no longer matches would use stale offsets.
+        private readonly long _fileLength;
+        private readonly long _fileWriteTicks;
+        // Set once a read failed, so that a file that changed under its readers is reported once.
+        private int _readFailed;
+
+        public int Count => _starts.Length;
+
+        /// <summary>
+        /// The weight of every line, or null if the file does not opt in to weights or no line has a "weight::" prefix.
+        /// </summary>
+        public double[] Weights { get; }
+
+        private IndexedWildcardFile(string path, FileInfo info, long[] starts, int[] lengths, double[] weights)
+        {
+            _path = path;
+            _fileLength = info.Length;
+            _fileWriteTicks = info.LastWriteTimeUtc.Ticks;
+            _starts = starts;
+            _lengths = lengths;
+            Weights = weights;
+        }
+
+        /// <summary>
+        /// Opens a wildcard file, using its persisted index if it is still current and building it otherwise.
+        /// </summary>
+        public static IndexedWildcardFile Open(string path)
+        {
+            var info = new FileInfo(path);
+            var indexPath = GetIndexPath(path);
+            if (!TryLoadIndex(indexPath, info, out var starts, out var lengths, out var weights))
+            {
+                BuildIndex(path, out starts, out lengths, out weights);
+                SaveIndex(indexPath, info, starts, lengths, weights);
+            }
+            return new IndexedWildcardFile(path, info, starts, lengths, weights);
+        }
+
+        /// <summary>
+        /// A line of the file. If the file changed since it was indexed (it is invalidated once the change is seen),
+        /// the line is empty, as for any other wildcard file that cannot be read.
+        /// </summary>
+        public string this[int index]
+        {
+            get
+            {
+                if ((uint)index >= (uint)_starts.Length) throw new ArgumentOutOfRangeException(nameof(index));
+
+                try
+                {
+                    using var handle = OpenCurrent();
+                    return ReadLine(handle, index);
+                }
+                catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+                {
+                    ReportReadFailure(ex);
+                    return string.Empty;
+                }
+            }
+        }
+
+        public IEnumerator<string> GetEnumerator()
+        {
+            // One handle for the whole enumeration.
+            SafeFileHandle handle;
+            try
+            {
+                handle = OpenCurrent();
+            }
+            catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+            {
+                ReportReadFailure(ex);
+                yield break;
+            }
+
+            using (handle)
+            {
+                for (int i = 0; i < Count; i++)
+                {
+                    string line;
+                    try
+                    {
+                        line = ReadLine(handle, i);
+                    }
+                    catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+                    {
+                        ReportReadFailure(ex);
+                        yield break;
+                    }
+                    yield return line;
+                }
+            }
+        }
+
+        IEnumerator IEnumerable.GetEnumerator() => GetEnumerator();
+
+        /// <summary>
+        /// Opens the file for reading, shared for writing and deletion so that editors can still save it.
+        /// Throws if the file is no longer the one the index was built for.
+        /// </summary>
+        private SafeFileHandle OpenCurrent()
+        {
+            var handle = File.OpenHandle(_path, FileMode.Open, FileAccess.Read, FileShare.ReadWrite | FileShare.Delete);
+            if (RandomAccess.GetLength(handle) != _fileLength || File.GetLastWriteTimeUtc(_path).Ticks != _fileWriteTicks)
+            {
+                handle.Dispose();
+                throw new IOException($"The wildcard file {_path} changed since it was indexed.");
+            }
+            return handle;
+        }
+
+        private void ReportReadFailure(Exception ex)
+        {
+            if (Interlocked.Exchange(ref _readFailed, 1) == 0)
+            {
+                Logger.Log(ex, $"Failed to read wildcard file: {_path}. Its lines will be empty until it is reloaded.");
+            }
+        }
+
+        private string ReadLine(SafeFileHandle handle, int index)
+        {
+            int length = _lengths[index];
+            var buffer = ArrayPool<byte>.Shared.Rent(length);
+            try
+            {
+                int read = 0;
+                while (read < length)
+                {
+                    int n = RandomAccess.Read(handle, buffer.AsSpan(read, length - read), _starts[index] + read);
+                    if (n == 0) throw new IOException($"The wildcard file {_path} changed since it was indexed.");
+                    read += n;
+                }
+                return Encoding.UTF8.GetString(buffer, 0, length);
+            }
+            finally
+            {
+                ArrayPool<byte>.Shared.Return(buffer);
+            }
+        }
+
+        /// <summary>
+        /// Counts the lines of a wildcard file of any size without decoding or keeping them.
+        /// </summary>
+        public static int CountLines(string path)
+        {
+            int count = 0;
+            ScanLines(path, false, (_, _, _) => count++);
+            return count;
+        }
+
+        private static void BuildIndex(string path, out long[] starts, out int[] lengths, out double[] weights)
+        {
+            var startList = new List<long>();
+            var lengthList = new List<int>();
+            List<double> weightList = null;
+            ScanLines(path, LineWeights.FileHasMarker(path), (start, length, weight) =>
+            {
+                if (weight > 0 && weightList == null)
+                {
+                    // Lines before the first weighted one weigh 1.
+                    weightList = new List<double>(startList.Count + 1);
+                    for (int i = 0; i < startList.Count; i++) weightList.Add(1);
+                }
+                weightList?.Add(weight > 0 ? weight : 1);
+                startList.Add(start);
+                lengthList.Add(length);
+            });
+            starts = startList.ToArray();
+            lengths = lengthList.ToArray();
+            weights = weightList?.ToArray();
+        }
+
+        /// <summary>
+        /// Scans the file once and reports the byte range of every line that File.ReadAllLines plus the usual filter
+        /// would keep: not blank and not starting with '#'. Line breaks (\n or \r\n) are not part of a line.
+        /// With <paramref name="parseWeights"/>, the weight of a line with a "weight::" prefix (as LineWeights parses it)
+        /// is reported with it; otherwise 0.
+        /// </summary>
+        private static void ScanLines(string path, bool parseWeights, Action<long, int, double> onLine)
+        {
+            // The characters of a possible weight at the start of the current line
+            var number = new StringBuilder();
+
+            using var stream = new FileStream(path, FileMode.Open, FileAccess.Read, FileShare.ReadWrite | FileShare.Delete, ReadBufferSize, FileOptions.SequentialScan);
+            var buffer = new byte[ReadBufferSize];
+            // Skip a UTF-8 byte order mark.
+            long position = stream.Read(buffer, 0, 3) == 3 && buffer[0] == 0xEF && buffer[1] == 0xBB && buffer[2] == 0xBF ? 3 : 0;
+            stream.Position = position;
+            long lineStart = position;
+            // State of the current line
+            bool blank = true, comment = false, weightCandidate = parseWeights;
+            int colons = 0;
+            double weight = 0;
+            byte previous = 0;
+            bool firstByte = true;
+
+            int read;
+            while ((read = stream.Read(buffer, 0, buffer.Length)) > 0)
+            {
+                for (int i = 0; i < read; i++, position++)
+                {
+                    byte b = buffer[i];
+                    if (b == '\n')
+                    {
+                        long end = position > lineStart && previous == '\r' ? position - 1 : position;
+                        AddLine(lineStart, end);
+                        lineStart = position + 1;
+                        blank = true;
+                        comment = false;
+                        weightCandidate = parseWeights;
+                        colons = 0;
+                        weight = 0;
+                        number.Clear();
+                        firstByte = true;
+                        previous = b;
+                        continue;
+                    }
+
+                    if (firstByte) comment = b == '#';
+                    firstByte = false;
+                    if (b != ' ' && b != '\t' && b != '\r' && b != '\v' && b != '\f') blank = false;
+
+                    // "<number>::" at the start of a line (leading spaces allowed) is a weight.
+                    if (weightCandidate)
+                    {
+                        if (b == ':' && number.Length > 0)
+                        {
+                            if (++colons == 2)
+                            {
+                                weightCandidate = false;
+                                if (double.TryParse(number.ToString(), NumberStyles.AllowDecimalPoint, CultureInfo.InvariantCulture, out var parsed) && parsed > 0)
+                                {
+                                    weight = parsed;
+                                }
+                            }
+                        }
+                        else if (colons == 0 && ((b >= '0' && b <= '9') || b == '.')) number.Append((char)b);
+                        else if (b != ' ' || number.Length > 0) weightCandidate = false;
+                    }
+                    previous = b;
+                }
+            }
+            if (position > lineStart)
+            {
+                AddLine(lineStart, previous == '\r' ? position - 1 : position);
+            }
+
+            void AddLine(long start, long end)
+            {
+                if (blank || comment || end <= start) return;
+                onLine(start, (int)(end - start), weight);
+            }
+        }
+
+        private static string GetIndexPath(string path)
+        {
+            var key = SHA256.HashData(Encoding.UTF8.GetBytes(Path.GetFullPath(path).ToLowerInvariant()));
+            return Path.Combine(_indexDirectory, Convert.ToHexString(key, 0, 16).ToLowerInvariant() + ".idx");
+        }
+
+        private static bool TryLoadIndex(string indexPath, FileInfo source, out long[] starts, out int[] lengths, out double[] weights)
+        {
+            starts = null;
+            lengths = null;
+            weights = null;
+            if (!File.Exists(indexPath)) return false;
+
+            try
+            {
+                using var reader = new BinaryReader(File.OpenRead(indexPath));
+                if (reader.ReadInt32() != IndexMagic || reader.ReadInt32() != IndexVersion) return false;
+                // Stale if the file was modified since the index was built.
+                if (reader.ReadInt64() != source.Length || reader.ReadInt64() != source.LastWriteTimeUtc.Ticks) return false;
+
+                bool hasWeights = reader.ReadBoolean();
+                int count = reader.ReadInt32();
+                starts = new long[count];
+                lengths = new int[count];
+                if (reader.Read(MemoryMarshal.AsBytes(starts.AsSpan())) != count * sizeof(long)) return false;
+                if (reader.Read(MemoryMarshal.AsBytes(lengths.AsSpan())) != count * sizeof(int)) return false;
+                if (hasWeights)
+                {
+                    weights = new double[count];
+                    if (reader.Read(MemoryMarshal.AsBytes(weights.AsSpan())) != count * sizeof(double)) return false;
+                }
+                return true;
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, $"Failed to read the wildcard index {indexPath}. It will be rebuilt.");
+                return false;
+            }
+        }
+
+        private static void SaveIndex(string indexPath, FileInfo source, long[] starts, int[] lengths, double[] weights)
+        {
+            try
+            {
+                Directory.CreateDirectory(_indexDirectory);
+                // Written under a temporary name so that a crash never leaves a truncated index behind.
+                var tempPath = $"{indexPath}.{Guid.NewGuid():N}.tmp";
+                using (var writer = new BinaryWriter(File.Create(tempPath)))
+                {
+                    writer.Write(IndexMagic);
+                    writer.Write(IndexVersion);
+                    writer.Write(source.Length);
+                    writer.Write(source.LastWriteTimeUtc.Ticks);
+                    writer.Write(weights != null);
+                    writer.Write(starts.Length);
+                    writer.Write(MemoryMarshal.AsBytes(starts.AsSpan()));
+                    writer.Write(MemoryMarshal.AsBytes(lengths.AsSpan()));
+                    if (weights != null) writer.Write(MemoryMarshal.AsBytes(weights.AsSpan()));
+                }
+                File.Move(tempPath, indexPath, true);
+            }
+            catch (Exception ex)
+            {
+                // Only costs a rebuild on the next start.
+                Logger.Log(ex, $"Failed to save the wildcard index {indexPath}.");
+            }
+        }
+    }
+}
@@ -8,7 +8,6 @@ using System.Windows.Media;
 namespace Comfizen
 {
     public enum LogSource { Application, ComfyUI, Python }
-    public enum LogLevel { Info, Warning, Error, Critical, Debug }
 
     /// <summary>
     /// Represents a single text segment in a log message with its own color.
@@ -6,6 +6,8 @@ using _Log = Serilog.Log;
 
 namespace Comfizen
 {
+    public enum LogLevel { Info, Warning, Error, Critical, Debug }
+
     public static class Logger
     {
         public static event Action OnErrorLogged;
@@ -153,6 +153,8 @@ namespace Comfizen
                 vm.FullScreen.PropertyChanged += FullScreen_PropertyChanged;
                 vm.ImageProcessing.PropertyChanged += ImageProcessing_PropertyChanged;
                 vm.PropertyChanged += MainViewModel_PropertyChanged;
+                // The thumbnail size depends on the DPI of the window, which is only known now.
+                ThumbnailService.Instance.SetTileSize(vm.ImageProcessing.GalleryThumbnailSize);
                 
                 var settings = vm.Settings;
 
@@ -267,7 +269,7 @@ namespace Comfizen
             e.Handled = true;
         }
 
-        private void Window_Drop(object sender, DragEventArgs e)
+        private async void Window_Drop(object sender, DragEventArgs e)
         {
             // ADDED: If the slider compare view is open, prevent the main window from handling the drop.
             if (DataContext is MainViewModel mainVm && mainVm.SliderCompare.IsViewOpen)
@@ -320,7 +322,7 @@ namespace Comfizen
                         if (tempJObject["prompt"] != null && tempJObject["promptTemplate"] != null)
                         {
                             // It's a Comfizen workflow, use the standard import.
-                            viewModel.ImportStateFromFile(filePath);
+                            await viewModel.ImportStateFromFileAsync(filePath);
                         }
                         else
                         {
@@ -337,7 +339,7 @@ namespace Comfizen
                 else
                 {
                     // It's an image or other file, use the standard state import.
-                    viewModel.ImportStateFromFile(filePath);
+                    await viewModel.ImportStateFromFileAsync(filePath);
                 }
             }
         }
@@ -420,6 +422,24 @@ namespace Comfizen
         }
         
 
+        /// <summary>
+        /// Moves the thumbnails of the tiles on screen to the front of the thumbnail queue.
+        /// </summary>
+        private void LvOutputs_ScrollChanged(object sender, ScrollChangedEventArgs e)
+        {
+            if (!ThumbnailService.Instance.HasPending) return;
+
+            var viewport = new Rect(lvOutputs.RenderSize);
+            var visible = new HashSet<ImageOutput>();
+            foreach (var item in lvOutputs.Items)
+            {
+                if (item is not ImageOutput output || lvOutputs.ItemContainerGenerator.ContainerFromItem(item) is not FrameworkElement container || !container.IsVisible) continue;
+                var bounds = container.TransformToAncestor(lvOutputs).TransformBounds(new Rect(container.RenderSize));
+                if (bounds.IntersectsWith(viewport)) visible.Add(output);
+            }
+            ThumbnailService.Instance.Prioritize(visible);
+        }
+        
         private void LvOutputs_PreviewKeyDown(object sender, KeyEventArgs e)
         {
             if (e.Key == Key.A && (Keyboard.Modifiers & ModifierKeys.Control) == ModifierKeys.Control)
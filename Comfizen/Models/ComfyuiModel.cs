@@ -4,6 +4,7 @@ using System.IO;
 using System.Linq;
 using System.Text;
 using System.Threading.Tasks;
+using Newtonsoft.Json.Linq;
 using SixLabors.ImageSharp.Formats.Jpeg;
 using SixLabors.ImageSharp.Formats.Png;
 using SixLabors.ImageSharp.Formats.Webp;
@@ -20,9 +21,9 @@ namespace Comfizen
             _settings = settings;
         }
 
-        public async Task Interrupt()
+        public async Task Interrupt(string serverAddress = null)
         {
-            var api = new ComfyUI_API(_settings.ServerAddress);
+            var api = new ComfyUI_API(serverAddress ?? _settings.ServerAddress);
             await api.InterruptAsync();
         }
         
@@ -46,6 +47,8 @@ namespace Comfizen
                     case ImageSaveFormat.Png:
                         var pngEncoder = new PngEncoder { CompressionLevel = (PngCompressionLevel)settings.PngCompressionLevel };
                         bytes = Utils.ProcessImageAndAppendWorkflow(sourcePngBytes, promptToEmbed, pngEncoder);
+                        // Lossless, so the saved file is identified like its source when it is opened again.
+                        PixelHash.RememberSamePixels(sourcePngBytes, bytes);
                         ext = ".png";
                         break;
                 
@@ -151,35 +154,80 @@ namespace Comfizen
             }
         }
 
-
-        public async IAsyncEnumerable<ImageOutput> QueuePrompt(string json)
+        /// <summary>
+        /// Queues a prompt on the server without waiting for it to execute.
+        /// </summary>
+        /// <param name="serverAddress">The server to run the prompt on; the main server if null.</param>
+        /// <returns>A subscription to the prompt's events, or null if the server rejected the prompt.</returns>
+        public async Task<PromptSubscription> SubmitPromptAsync(string json, string serverAddress = null)
         {
-            var api = new ComfyUI_API(_settings.ServerAddress);
+            serverAddress ??= _settings.ServerAddress;
+            var api = new ComfyUI_API(serverAddress);
             await api.Connect();
+            // Inpaint images stored for upload are sent to this server (once) and referenced by file name.
+            var subscription = await api.SubmitPromptAsync(await ImageUploadService.Instance.ResolveAsync(json, serverAddress));
+            if (subscription == null && ImageUploadService.Instance.ForgetMissingUploads(api.LastPromptError, serverAddress))
+            {
+                // The server no longer has an uploaded image (e.g. its input folder was cleaned): upload it again.
+                subscription = await api.SubmitPromptAsync(await ImageUploadService.Instance.ResolveAsync(json, serverAddress));
+            }
+            return subscription;
+        }
 
-            var result = await api.GetImagesAsync(json);
-
-            foreach (var kv in result)
+        /// <summary>
+        /// Yields the outputs of a previously submitted prompt as soon as each node reports them.
+        /// </summary>
+        /// <param name="onEvent">Optionally observes every WebSocket event of the prompt.</param>
+        public async IAsyncEnumerable<ImageOutput> ReceiveOutputsAsync(PromptSubscription subscription, string json, Action<JObject> onEvent = null)
+        {
+            var api = new ComfyUI_API(subscription.ServerAddress)
             {
-                foreach (var fileOutput in kv.Value)
+                MaxParallelDownloads = _settings.MaxParallelDownloads,
+                DownloadVideosToTempFile = _settings.DownloadVideosToTempFile
+            };
+            await foreach (var fileOutput in api.StreamOutputsAsync(subscription, onEvent))
+            {
+                // Outputs downloaded to a temp file stay on disk; they never carry an appended workflow anyway.
+                string prompt = (fileOutput.Data != null ? Utils.ReadStateFromImage(fileOutput.Data) : null) ?? json;
+                
+                var isVideo = new[] { ".mp4", ".mov", ".avi", ".mkv", ".webm", ".gif" }
+                    .Any(ext => fileOutput.FileName.EndsWith(ext, StringComparison.OrdinalIgnoreCase));
+                // Images are decoded and hashed on the thread pool, not on the thread that reads the prompt's events.
+                var visualHash = fileOutput.ContentHash ?? (isVideo ? Utils.ComputeMd5Hash(fileOutput.Data) : await Utils.ComputePixelHashAsync(fileOutput.Data));
+                
+                var output = new ImageOutput
                 {
-                    string prompt = Utils.ReadStateFromImage(fileOutput.Data) ?? json;
-                    
-                    var isVideo = new[] { ".mp4", ".mov", ".avi", ".mkv", ".webm", ".gif" }
-                        .Any(ext => fileOutput.FileName.EndsWith(ext, StringComparison.OrdinalIgnoreCase));
-                    
-                    yield return new ImageOutput
-                    {
-                        ImageBytes = fileOutput.Data,
-                        FileName = fileOutput.FileName,
-                        Prompt = prompt,
-                        VisualHash = isVideo ? Utils.ComputeMd5Hash(fileOutput.Data) : Utils.ComputePixelHash(fileOutput.Data),
-                        PerceptualHash = 0,
-                        FilePath = fileOutput.FilePath,
-                        NodeId = kv.Key
-                    };
-                }
+                    BackingFilePath = fileOutput.TempFilePath,
+                    FileName = fileOutput.FileName,
+                    Prompt = prompt,
+                    VisualHash = visualHash,
+                    PerceptualHash = 0,
+                    FilePath = fileOutput.FilePath,
+                    NodeId = fileOutput.NodeId
+                };
+                output.SetContent(fileOutput.Data);
+                yield return output;
+            }
+        }
+
+        /// <summary>
+        /// Removes the given prompts from the pending queues of their servers and returns the ids
+        /// that are still running or pending afterwards. Prompts on a server whose queue could not be read
+        /// are reported as still queued.
+        /// </summary>
+        public async Task<HashSet<string>> CancelQueuedPromptsAsync(IReadOnlyCollection<PromptSubscription> prompts)
+        {
+            var stillQueued = new HashSet<string>();
+            foreach (var serverPrompts in prompts.GroupBy(p => p.ServerAddress))
+            {
+                var api = new ComfyUI_API(serverPrompts.Key);
+                var promptIds = serverPrompts.Select(p => p.PromptId).ToList();
+                await api.DeleteQueuedPromptsAsync(promptIds);
+                
+                var queued = await api.GetQueuedPromptIdsAsync();
+                stillQueued.UnionWith(queued ?? (IEnumerable<string>)promptIds);
             }
+            return stillQueued;
         }
     }
 }
@@ -0,0 +1,163 @@
+using System;
+using System.Collections.Generic;
+using System.Numerics;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// Multi-index hashing over 64-bit perceptual hashes: finds all items within a Hamming distance of a hash without
+    /// comparing it to every item. The hash is split into four 16-bit chunks with one table per chunk. Two hashes at most
+    /// d bits apart differ in at most d / 4 bits of at least one chunk, so a query only looks up the buckets of the chunk
+    /// values that close to its own and checks the full distance of the items found there.
+    /// Items are added and removed in O(1) per chunk bucket; queries are sub-linear for the small distances similarity
+    /// grouping uses, and check every item instead when that is cheaper.
+    /// Not thread-safe.
+    /// </summary>
+    public sealed class PerceptualHashIndex<T>
+    {
+        private const int ChunkCount = 4;
+        private const int ChunkBits = 16;
+        // Probing a bucket costs about as much as checking this many items directly.
+        private const int ProbeCost = 16;
+        // Up to this many differing bits per chunk are probed; more than that is never cheaper than checking every item.
+        private const int MaxChunkDistance = 3;
+
+        // For each distance, the XOR masks of all 16-bit values that differ in at most that many bits.
+        private static readonly ushort[][] _chunkMasks = CreateChunkMasks();
+
+        private readonly Dictionary<ushort, List<(ulong Hash, T Item)>>[] _tables = new Dictionary<ushort, List<(ulong Hash, T Item)>>[ChunkCount];
+        private readonly EqualityComparer<T> _comparer = EqualityComparer<T>.Default;
+        // All entries in one list, for queries that check every item; removal swaps the last entry into the gap.
+        private readonly List<(ulong Hash, T Item)> _entries = new List<(ulong Hash, T Item)>();
+        private readonly Dictionary<(ulong Hash, T Item), int> _entryPositions = new Dictionary<(ulong Hash, T Item), int>();
+
+        public int Count => _entries.Count;
+
+        public PerceptualHashIndex()
+        {
+            for (int i = 0; i < ChunkCount; i++)
+            {
+                _tables[i] = new Dictionary<ushort, List<(ulong Hash, T Item)>>();
+            }
+        }
+
+        public static int Distance(ulong a, ulong b) => BitOperations.PopCount(a ^ b);
+
+        public void Add(ulong hash, T item)
+        {
+            for (int i = 0; i < ChunkCount; i++)
+            {
+                var key = Chunk(hash, i);
+                if (!_tables[i].TryGetValue(key, out var bucket))
+                {
+                    bucket = new List<(ulong Hash, T Item)>(1);
+                    _tables[i].Add(key, bucket);
+                }
+                bucket.Add((hash, item));
+            }
+            _entryPositions[(hash, item)] = _entries.Count;
+            _entries.Add((hash, item));
+        }
+
+        /// <summary>
+        /// Removes the item added with the given hash. Returns false if it is not there.
+        /// </summary>
+        public bool Remove(ulong hash, T item)
+        {
+            if (!_entryPositions.Remove((hash, item), out var position)) return false;
+
+            var last = _entries[^1];
+            _entries.RemoveAt(_entries.Count - 1);
+            if (position < _entries.Count)
+            {
+                _entries[position] = last;
+                _entryPositions[last] = position;
+            }
+
+            for (int i = 0; i < ChunkCount; i++)
+            {
+                var key = Chunk(hash, i);
+                var bucket = _tables[i][key];
+                bucket.RemoveAt(bucket.FindIndex(entry => entry.Hash == hash && _comparer.Equals(entry.Item, item)));
+                if (bucket.Count == 0) _tables[i].Remove(key);
+            }
+            return true;
+        }
+
+        public void Clear()
+        {
+            foreach (var table in _tables)
+            {
+                table.Clear();
+            }
+            _entries.Clear();
+            _entryPositions.Clear();
+        }
+
+        /// <summary>
+        /// All items whose hash is at most <paramref name="maxDistance"/> bits away from the given hash, in no particular order.
+        /// </summary>
+        public List<T> FindWithin(ulong hash, int maxDistance)
+        {
+            var results = new List<T>();
+            if (Count == 0 || maxDistance < 0) return results;
+
+            int chunkDistance = maxDistance / ChunkCount;
+            // For large distances or few items, checking every item is cheaper than probing the buckets.
+            if (chunkDistance > MaxChunkDistance || (long)_chunkMasks[chunkDistance].Length * ChunkCount * ProbeCost >= Count)
+            {
+                foreach (var entry in _entries)
+                {
+                    if (Distance(hash, entry.Hash) <= maxDistance) results.Add(entry.Item);
+                }
+                return results;
+            }
+
+            var masks = _chunkMasks[chunkDistance];
+            for (int i = 0; i < ChunkCount; i++)
+            {
+                var table = _tables[i];
+                var chunk = Chunk(hash, i);
+                foreach (var mask in masks)
+                {
+                    if (!table.TryGetValue((ushort)(chunk ^ mask), out var bucket)) continue;
+                    foreach (var entry in bucket)
+                    {
+                        // An item close enough in several chunks is reported from the first one only.
+                        if (Distance(hash, entry.Hash) <= maxDistance && FirstCloseChunk(hash, entry.Hash, chunkDistance) == i)
+                        {
+                            results.Add(entry.Item);
+                        }
+                    }
+                }
+            }
+            return results;
+        }
+
+        private static ushort Chunk(ulong hash, int index) => (ushort)(hash >> (index * ChunkBits));
+
+        private static int FirstCloseChunk(ulong a, ulong b, int chunkDistance)
+        {
+            for (int i = 0; i < ChunkCount; i++)
+            {
+                if (BitOperations.PopCount((uint)(Chunk(a, i) ^ Chunk(b, i))) <= chunkDistance) return i;
+            }
+            return -1;
+        }
+
+        private static ushort[][] CreateChunkMasks()
+        {
+            var masks = new ushort[MaxChunkDistance + 1][];
+            var withinDistance = new List<ushort>();
+            for (int distance = 0; distance <= MaxChunkDistance; distance++)
+            {
+                for (int mask = 0; mask < 1 << ChunkBits; mask++)
+                {
+                    if (BitOperations.PopCount((uint)mask) == distance) withinDistance.Add((ushort)mask);
+                }
+                masks[distance] = withinDistance.ToArray();
+            }
+            return masks;
+        }
+    }
+}
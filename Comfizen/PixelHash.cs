@@ -0,0 +1,91 @@
+using System;
+using System.Collections.Concurrent;
+using System.IO.Hashing;
+using System.Runtime.InteropServices;
+using System.Threading;
+using System.Threading.Tasks;
+using SixLabors.ImageSharp;
+using SixLabors.ImageSharp.PixelFormats;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// The visual identity of an image: a 128-bit XXH3 hash of its size and decoded RGBA pixel rows, so that files
+    /// with the same pixels but different encodings or metadata get the same hash. Results are cached by a hash of
+    /// the file bytes, so an image that is imported or hashed again is not decoded again.
+    /// </summary>
+    public static class PixelHash
+    {
+        private const int MaxCachedHashes = 4096;
+
+        // XXH3-128 of the file bytes (hex) -> pixel hash
+        private static readonly ConcurrentDictionary<string, string> _cache = new(StringComparer.Ordinal);
+        // Decoding holds the whole image in memory; this bounds how many images are decoded at once.
+        private static readonly SemaphoreSlim _workers = new(Math.Max(1, Environment.ProcessorCount / 2));
+
+        /// <summary>
+        /// Computes the pixel hash on the thread pool, with at most half of the processors decoding at a time.
+        /// Files that cannot be decoded as an image are identified by their bytes.
+        /// </summary>
+        public static async Task<string> ComputeAsync(byte[] imageBytes)
+        {
+            var key = Convert.ToHexString(XxHash128.Hash(imageBytes));
+            if (_cache.TryGetValue(key, out var cached)) return cached;
+
+            await _workers.WaitAsync().ConfigureAwait(false);
+            try
+            {
+                var hash = await Task.Run(() => ComputeUncached(imageBytes)).ConfigureAwait(false) ?? key;
+                Remember(key, hash);
+                return hash;
+            }
+            finally
+            {
+                _workers.Release();
+            }
+        }
+
+        /// <summary>
+        /// Records that a re-encoded file has the same pixels as the source it was made from (e.g. a PNG saved with
+        /// the workflow embedded), so that hashing it later does not decode it.
+        /// </summary>
+        public static void RememberSamePixels(byte[] sourceBytes, byte[] reencodedBytes)
+        {
+            var sourceKey = Convert.ToHexString(XxHash128.Hash(sourceBytes));
+            if (_cache.TryGetValue(sourceKey, out var hash))
+            {
+                Remember(Convert.ToHexString(XxHash128.Hash(reencodedBytes)), hash);
+            }
+        }
+
+        private static void Remember(string key, string hash)
+        {
+            if (_cache.Count >= MaxCachedHashes) _cache.Clear();
+            _cache[key] = hash;
+        }
+
+        private static string ComputeUncached(byte[] imageBytes)
+        {
+            try
+            {
+                using var image = Image.Load<Rgba32>(imageBytes);
+                var hasher = new XxHash128();
+                Span<int> size = stackalloc int[] { image.Width, image.Height };
+                hasher.Append(MemoryMarshal.AsBytes(size));
+                // The rows are hashed where the decoder put them; nothing is copied or encoded.
+                image.ProcessPixelRows(accessor =>
+                {
+                    for (int y = 0; y < accessor.Height; y++)
+                    {
+                        hasher.Append(MemoryMarshal.AsBytes(accessor.GetRowSpan(y)));
+                    }
+                });
+                return Convert.ToHexString(hasher.GetCurrentHash());
+            }
+            catch (Exception)
+            {
+                return null;
+            }
+        }
+    }
+}
@@ -1,6 +1,8 @@
 ﻿// PromptUtils.cs
+using System;
+using System.Collections.Concurrent;
 using System.Collections.Generic;
-using System.Linq;
+using System.Text;
 
 namespace Comfizen
 {
@@ -15,6 +17,23 @@ namespace Comfizen
         /// </summary>
         public const string DISABLED_TOKEN_PREFIX = "\uD83D\uDD12";
 
+        // Prompts are tokenized on every task and on every edit; the same texts come back, so the results are cached.
+        private const int MaxCachedPrompts = 128;
+        private static readonly ConcurrentDictionary<string, string[]> _tokenCache = new ConcurrentDictionary<string, string[]>();
+        private static readonly ConcurrentDictionary<string, string> _filteredCache = new ConcurrentDictionary<string, string>();
+
+#if DEBUG || BENCHMARK
+        /// <summary>
+        /// Empties the token caches, so that the next calls measure the tokenization itself.
+        /// This method is only available in DEBUG builds.
+        /// </summary>
+        public static void ClearCaches()
+        {
+            _tokenCache.Clear();
+            _filteredCache.Clear();
+        }
+#endif
+
         /// <summary>
         /// Splits a prompt string into a list of tokens, respecting brackets and parentheses.
         /// This is the primary tokenization logic used throughout the application.
@@ -23,43 +42,126 @@ namespace Comfizen
         /// <returns>A list of individual tokens.</returns>
         public static List<string> Tokenize(string str)
         {
-            var tokens = new List<string>();
-            if (string.IsNullOrEmpty(str)) return tokens;
+            if (string.IsNullOrEmpty(str)) return new List<string>();
 
-            // Replace newlines with commas to treat them as delimiters.
-            var processedStr = str.Replace('\r', ',').Replace('\n', ',');
-            var currentToken = "";
-            int insideBrackets = 0;
-            int insideParentheses = 0;
-
-            foreach (char c in processedStr)
+            if (!_tokenCache.TryGetValue(str, out var tokens))
             {
-                if (c == '{') { insideBrackets++; currentToken += c; }
-                else if (c == '}') { insideBrackets--; currentToken += c; }
-                else if (c == '(') { insideParentheses++; currentToken += c; }
-                else if (c == ')') { insideParentheses--; currentToken += c; }
-                else if (c == ',' && insideBrackets == 0 && insideParentheses == 0)
+                var ranges = TokenizeRanges(str);
+                tokens = new string[ranges.Count];
+                for (int i = 0; i < ranges.Count; i++)
                 {
-                    var trimmedToken = currentToken.Trim();
-                    if (!string.IsNullOrEmpty(trimmedToken))
-                    {
-                        tokens.Add(trimmedToken);
-                    }
-                    currentToken = "";
+                    tokens[i] = GetToken(str, ranges[i]);
                 }
-                else
+                AddToCache(_tokenCache, str, tokens);
+            }
+            // A copy, since callers may change the list.
+            return new List<string>(tokens);
+        }
+
+        /// <summary>
+        /// Finds the tokens of a prompt string as ranges of it, without creating the token strings.
+        /// Tokens are separated by commas and line breaks outside of {..} and (..), and trimmed; empty tokens are skipped.
+        /// A line break inside brackets belongs to the token and reads as a comma (see <see cref="GetToken"/>).
+        /// </summary>
+        /// <param name="str">The prompt string to tokenize.</param>
+        /// <returns>The range of every token, in order.</returns>
+        public static List<Range> TokenizeRanges(string str)
+        {
+            var ranges = new List<Range>();
+            if (string.IsNullOrEmpty(str)) return ranges;
+
+            int tokenStart = 0;
+            int insideBrackets = 0;
+            int insideParentheses = 0;
+            for (int i = 0; i < str.Length; i++)
+            {
+                switch (str[i])
                 {
-                    currentToken += c;
+                    case '{': insideBrackets++; break;
+                    case '}': insideBrackets--; break;
+                    case '(': insideParentheses++; break;
+                    case ')': insideParentheses--; break;
+                    case ',':
+                    case '\r':
+                    case '\n':
+                        // Unbalanced closing brackets make the depth negative, which also keeps the token together.
+                        if (insideBrackets == 0 && insideParentheses == 0)
+                        {
+                            AddTrimmedRange(str, tokenStart, i, ranges);
+                            tokenStart = i + 1;
+                        }
+                        break;
                 }
             }
-            
-            var finalTrimmedToken = currentToken.Trim();
-            if (!string.IsNullOrEmpty(finalTrimmedToken))
+            AddTrimmedRange(str, tokenStart, str.Length, ranges);
+            return ranges;
+        }
+
+        /// <summary>
+        /// The text of a token found by <see cref="TokenizeRanges"/>. Line breaks inside it read as commas.
+        /// </summary>
+        public static string GetToken(string str, Range range)
+        {
+            var token = str.AsSpan(range);
+            if (token.IndexOfAny('\r', '\n') < 0) return new string(token);
+
+            return string.Create(token.Length, (str, range), static (chars, state) =>
+            {
+                state.str.AsSpan(state.range).CopyTo(chars);
+                chars.Replace('\r', ',');
+                chars.Replace('\n', ',');
+            });
+        }
+
+        /// <summary>
+        /// Removes the disabled tokens from a prompt and joins the remaining ones with ", ".
+        /// This is what is sent to the server for a prompt edited with the advanced prompt editor.
+        /// </summary>
+        /// <param name="str">The prompt string to filter.</param>
+        /// <returns>The prompt without its disabled tokens.</returns>
+        public static string RemoveDisabledTokens(string str)
+        {
+            if (string.IsNullOrEmpty(str)) return string.Empty;
+            if (_filteredCache.TryGetValue(str, out var filtered)) return filtered;
+
+            // Without a marker no token is disabled, so the tokens are only checked if there is one.
+            bool mayHaveDisabledTokens = str.Contains(DISABLED_TOKEN_PREFIX, StringComparison.Ordinal);
+            var result = new StringBuilder(str.Length);
+            foreach (var range in TokenizeRanges(str))
+            {
+                var token = str.AsSpan(range);
+                if (mayHaveDisabledTokens && token.StartsWith(DISABLED_TOKEN_PREFIX, StringComparison.Ordinal)) continue;
+
+                if (result.Length > 0) result.Append(", ");
+                if (token.IndexOfAny('\r', '\n') < 0) result.Append(token);
+                else result.Append(GetToken(str, range));
+            }
+
+            filtered = result.ToString();
+            AddToCache(_filteredCache, str, filtered);
+            return filtered;
+        }
+
+        /// <summary>
+        /// Adds the range of the text between start and end without its surrounding whitespace, unless that leaves nothing.
+        /// Line breaks are not trimmed: inside brackets they stand for commas.
+        /// </summary>
+        private static void AddTrimmedRange(string str, int start, int end, List<Range> ranges)
+        {
+            while (start < end && IsTrimmable(str[start])) start++;
+            while (end > start && IsTrimmable(str[end - 1])) end--;
+            if (end > start) ranges.Add(new Range(start, end));
+        }
+
+        private static bool IsTrimmable(char c) => c != '\r' && c != '\n' && char.IsWhiteSpace(c);
+
+        private static void AddToCache<T>(ConcurrentDictionary<string, T> cache, string key, T value)
+        {
+            if (cache.Count >= MaxCachedPrompts)
             {
-                tokens.Add(finalTrimmedToken);
+                cache.Clear();
             }
-            
-            return tokens;
+            cache.TryAdd(key, value);
         }
     }
 }
\ No newline at end of file
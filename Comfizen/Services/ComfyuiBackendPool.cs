@@ -0,0 +1,230 @@
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Threading;
+using System.Threading.Tasks;
+using Newtonsoft.Json.Linq;
+
+namespace Comfizen;
+
+/// <summary>
+/// A ComfyUI server in the <see cref="ComfyuiBackendPool"/> and what the pool knows about its load.
+/// </summary>
+public sealed class ComfyuiBackend
+{
+    private int _inFlight;
+
+    internal ComfyuiBackend(string address)
+    {
+        Address = address;
+        // Keeps the server's connection open while the backend is in the pool.
+        Session = ComfyuiSession.Acquire(address);
+    }
+
+    public string Address { get; }
+
+    internal ComfyuiSession Session { get; private set; }
+
+    /// <summary>
+    /// Prompts sent to this server by this client whose outputs have not been received yet.
+    /// </summary>
+    public int InFlight => Volatile.Read(ref _inFlight);
+
+    /// <summary>
+    /// The server's own queue length (all clients), as of <see cref="QueueCheckedAt"/>,
+    /// and how many of our prompts were in flight at that moment.
+    /// </summary>
+    internal int QueueRemaining { get; set; }
+    internal int InFlightAtQueueCheck { get; set; }
+    internal DateTime QueueCheckedAt { get; set; }
+
+    /// <summary>
+    /// The node class types the server has installed, from its object_info. Null until loaded.
+    /// </summary>
+    internal HashSet<string> NodeTypes { get; set; }
+
+    /// <summary>
+    /// The server is skipped until this time after it failed to respond.
+    /// </summary>
+    internal DateTime UnavailableUntil { get; set; }
+
+    /// <summary>
+    /// The last known queue length plus the prompts sent since it was read.
+    /// </summary>
+    internal int Load => QueueRemaining + Math.Max(0, InFlight - InFlightAtQueueCheck);
+
+    internal void AddInFlight(int delta) => Interlocked.Add(ref _inFlight, delta);
+
+    internal void ReleaseSession()
+    {
+        if (Session == null) return;
+        ComfyuiSession.Release(Session);
+        Session = null;
+    }
+}
+
+/// <summary>
+/// Spreads prompts over every configured ComfyUI server (<see cref="AppSettings.ServerAddress"/> plus
+/// <see cref="AppSettings.AdditionalServerAddresses"/>). Each prompt goes to the least-loaded server that has
+/// every node class the prompt uses. With a single server the pool is a pass-through and makes no extra requests.
+/// </summary>
+public sealed class ComfyuiBackendPool
+{
+    private static readonly TimeSpan QueuePollInterval = TimeSpan.FromSeconds(1);
+    private static readonly TimeSpan FailureCooldown = TimeSpan.FromSeconds(30);
+
+    private readonly AppSettings _settings;
+    private readonly object _lock = new();
+    private readonly Dictionary<string, ComfyuiBackend> _backends = new(StringComparer.OrdinalIgnoreCase);
+    private volatile IReadOnlyList<ComfyuiBackend> _configured = Array.Empty<ComfyuiBackend>();
+
+    public ComfyuiBackendPool(AppSettings settings)
+    {
+        _settings = settings;
+        UpdateBackends();
+    }
+
+    /// <summary>
+    /// Returns the configured server addresses, the primary one first.
+    /// </summary>
+    public static List<string> GetAddresses(AppSettings settings)
+    {
+        return new[] { settings.ServerAddress }
+            .Concat(settings.AdditionalServerAddresses ?? new List<string>())
+            .Where(a => !string.IsNullOrWhiteSpace(a))
+            .Select(a => a.Trim())
+            .Distinct(StringComparer.OrdinalIgnoreCase)
+            .ToList();
+    }
+
+    /// <summary>
+    /// The configured backends, the primary one first, as of the last <see cref="UpdateBackends"/>.
+    /// </summary>
+    public IReadOnlyList<ComfyuiBackend> Backends => _configured;
+
+    /// <summary>
+    /// Opens a backend for each newly configured server and closes the connections of servers that were removed
+    /// from the settings and have no prompts left. Called at start and after the settings change.
+    /// </summary>
+    public void UpdateBackends()
+    {
+        lock (_lock)
+        {
+            var configured = GetAddresses(_settings).Select(address =>
+            {
+                if (!_backends.TryGetValue(address, out var backend))
+                {
+                    backend = new ComfyuiBackend(address);
+                    _backends[address] = backend;
+                }
+                return backend;
+            }).ToList();
+
+            // Backends that were removed from the settings keep their entry (and in-flight count) until
+            // their prompts are released; they are just no longer offered.
+            foreach (var backend in _backends.Values.Except(configured).Where(b => b.InFlight == 0).ToList())
+            {
+                _backends.Remove(backend.Address);
+                backend.ReleaseSession();
+            }
+            _configured = configured;
+        }
+    }
+
+    /// <summary>
+    /// Picks the least-loaded available backend that can run the prompt and reserves a slot on it.
+    /// Every call must be paired with <see cref="Release"/> or <see cref="MarkFailed"/>.
+    /// </summary>
+    /// <param name="prompt">The API prompt, used to check which node class types are required.</param>
+    /// <param name="exclude">Backends that already failed for this prompt.</param>
+    public async Task<ComfyuiBackend> AcquireAsync(JObject prompt, ICollection<ComfyuiBackend> exclude = null)
+    {
+        var backends = Backends;
+        var candidates = backends
+            .Where(b => (exclude == null || !exclude.Contains(b)) && b.UnavailableUntil <= DateTime.UtcNow)
+            .ToList();
+
+        if (candidates.Count > 1)
+        {
+            await Task.WhenAll(candidates.Select(RefreshAsync));
+            candidates.RemoveAll(b => b.UnavailableUntil > DateTime.UtcNow);
+
+            var classTypes = prompt.Properties()
+                .Select(p => p.Value["class_type"]?.ToString())
+                .Where(t => !string.IsNullOrEmpty(t))
+                .ToHashSet();
+            var compatible = candidates.Where(b => b.NodeTypes == null || classTypes.IsSubsetOf(b.NodeTypes)).ToList();
+            if (compatible.Count > 0)
+            {
+                candidates = compatible;
+            }
+            else if (candidates.Count > 0)
+            {
+                var missing = classTypes.Where(t => candidates.All(b => !b.NodeTypes.Contains(t)));
+                Logger.Log($"No ComfyUI server has every node used by the prompt (missing: {string.Join(", ", missing)}). Sending it to the least-loaded server.", LogLevel.Warning);
+            }
+        }
+
+        // With nothing available, fall back to the primary server so that the usual connection error is reported.
+        var backend = candidates.OrderBy(b => b.Load).FirstOrDefault() ?? backends[0];
+        backend.AddInFlight(1);
+        return backend;
+    }
+
+    /// <summary>
+    /// Frees the slot reserved by <see cref="AcquireAsync"/> once the prompt's outputs have been received.
+    /// </summary>
+    public void Release(ComfyuiBackend backend)
+    {
+        if (backend == null) return;
+        backend.AddInFlight(-1);
+        // The last prompt of a server that was removed from the settings lets its connection be closed.
+        if (backend.InFlight == 0 && !_configured.Contains(backend))
+        {
+            UpdateBackends();
+        }
+    }
+
+    /// <summary>
+    /// Frees the reserved slot and skips the backend for a while after it could not be reached.
+    /// </summary>
+    public void MarkFailed(ComfyuiBackend backend)
+    {
+        backend.UnavailableUntil = DateTime.UtcNow + FailureCooldown;
+        Release(backend);
+    }
+
+    private async Task RefreshAsync(ComfyuiBackend backend)
+    {
+        var api = new ComfyUI_API(backend.Address);
+
+        if (backend.QueueCheckedAt + QueuePollInterval <= DateTime.UtcNow)
+        {
+            var inFlight = backend.InFlight;
+            var queueRemaining = await api.GetQueueRemainingAsync();
+            if (queueRemaining == null)
+            {
+                Logger.Log($"ComfyUI server {backend.Address} is not responding; it is skipped for {FailureCooldown.TotalSeconds:0} seconds.", LogLevel.Warning);
+                backend.UnavailableUntil = DateTime.UtcNow + FailureCooldown;
+                return;
+            }
+            backend.QueueRemaining = queueRemaining.Value;
+            backend.InFlightAtQueueCheck = inFlight;
+            backend.QueueCheckedAt = DateTime.UtcNow;
+        }
+
+        if (backend.NodeTypes == null)
+        {
+            try
+            {
+                var objectInfo = await new ModelService(_settings, backend.Address).GetObjectInfoAsync();
+                backend.NodeTypes = objectInfo.Properties().Select(p => p.Name).ToHashSet();
+            }
+            catch (Exception ex)
+            {
+                // Unknown node list: the backend stays eligible for every prompt.
+                Logger.Log($"Could not read the node list of ComfyUI server {backend.Address}: {ex.Message}", LogLevel.Warning);
+            }
+        }
+    }
+}
@@ -0,0 +1,559 @@
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.IO;
+using System.Net.Http;
+using System.Net.WebSockets;
+using System.Text;
+using System.Threading;
+using System.Threading.Channels;
+using System.Threading.Tasks;
+using Newtonsoft.Json;
+using Newtonsoft.Json.Linq;
+
+namespace Comfizen;
+
+/// <summary>
+/// Receives the WebSocket events of a single prompt, as routed by <see cref="ComfyuiSession"/>.
+/// The event stream completes after the final "executing" message (node == null) or when the connection drops.
+/// </summary>
+public sealed class PromptSubscription : IDisposable
+{
+    private readonly ComfyuiSession _session;
+    private readonly Channel<JObject> _channel = Channel.CreateUnbounded<JObject>(
+        new UnboundedChannelOptions { SingleReader = true });
+
+    internal PromptSubscription(ComfyuiSession session, string promptId)
+    {
+        _session = session;
+        PromptId = promptId;
+    }
+
+    public string PromptId { get; internal set; }
+
+    /// <summary>
+    /// The server the prompt was submitted to.
+    /// </summary>
+    public string ServerAddress => _session.ServerAddress;
+
+    /// <summary>
+    /// True if the stream was completed because the WebSocket connection was lost,
+    /// rather than by the server reporting the end of execution.
+    /// </summary>
+    public bool ConnectionLost { get; private set; }
+
+    /// <summary>
+    /// True once no more events will be delivered to this subscription.
+    /// </summary>
+    public bool IsCompleted { get; private set; }
+
+    public ChannelReader<JObject> Events => _channel.Reader;
+
+    internal void Post(JObject message) => _channel.Writer.TryWrite(message);
+
+    internal void Complete(bool connectionLost = false)
+    {
+        if (connectionLost) ConnectionLost = true;
+        IsCompleted = true;
+        _channel.Writer.TryComplete();
+    }
+
+    /// <summary>
+    /// Re-keys this subscription when the server assigned a different prompt id than the one requested.
+    /// </summary>
+    public void Rebind(string promptId) => _session.Rebind(this, promptId);
+
+    /// <summary>
+    /// Waits until the server reports that the prompt has finished executing.
+    /// </summary>
+    public async Task WaitForCompletionAsync(CancellationToken token = default)
+    {
+        while (await Events.WaitToReadAsync(token))
+        {
+            while (Events.TryRead(out _)) { }
+        }
+    }
+
+    public void Dispose() => _session.Unsubscribe(this);
+}
+
+/// <summary>
+/// A long-lived connection to a single ComfyUI server. It owns one pooled HTTP handler and one WebSocket.
+/// A background reader routes prompt events to per-prompt_id subscribers and broadcasts every message
+/// to <see cref="MessageReceived"/> (used by the console log).
+/// </summary>
+public sealed class ComfyuiSession : IDisposable
+{
+    private static readonly ConcurrentDictionary<string, ComfyuiSession> _sessions = new(StringComparer.OrdinalIgnoreCase);
+    private static readonly object _sessionsLock = new();
+
+    // Events that arrive for a prompt id nobody subscribed to yet (e.g. before the /prompt response returned)
+    // are kept for a short while so that a late subscriber does not miss the completion message.
+    private const int MaxOrphanPrompts = 64;
+    private const int MaxOrphanEventsPerPrompt = 1024;
+
+    private readonly object _routeLock = new();
+    private readonly Dictionary<string, PromptSubscription> _subscribers = new();
+    private readonly Dictionary<string, List<JObject>> _orphanEvents = new();
+    private readonly Queue<string> _orphanOrder = new();
+    private volatile LatentPreviewStream[] _previewStreams = Array.Empty<LatentPreviewStream>();
+
+    private readonly object _stateLock = new();
+    private readonly SemaphoreSlim _reconnectSignal = new(0, 1);
+    private TaskCompletionSource<bool> _connected = NewConnectionSignal();
+    private CancellationTokenSource _cts;
+    private Task _connectionLoopTask;
+    private volatile ClientWebSocket _ws;
+    // Long-lived users registered through Acquire; guarded by _sessionsLock.
+    private int _holders;
+
+    /// <summary>
+    /// Returns the shared session for the given server address, creating it on first use.
+    /// A session that is only used through this method stays open until <see cref="DisposeAll"/>;
+    /// long-lived users of a server that may be removed from the settings use <see cref="Acquire"/>.
+    /// </summary>
+    public static ComfyuiSession For(string serverAddress)
+    {
+        lock (_sessionsLock)
+        {
+            return _sessions.GetOrAdd(serverAddress, address => new ComfyuiSession(address));
+        }
+    }
+
+    /// <summary>
+    /// Returns the shared session for the given server address and registers the caller as one of its holders.
+    /// Every call must be paired with <see cref="Release"/>.
+    /// </summary>
+    public static ComfyuiSession Acquire(string serverAddress)
+    {
+        lock (_sessionsLock)
+        {
+            var session = For(serverAddress);
+            session._holders++;
+            return session;
+        }
+    }
+
+    /// <summary>
+    /// Unregisters a holder added by <see cref="Acquire"/>. When the last holder leaves, the session is closed
+    /// and removed, so it stops reconnecting to a server that is no longer used.
+    /// </summary>
+    public static void Release(ComfyuiSession session)
+    {
+        lock (_sessionsLock)
+        {
+            if (--session._holders > 0) return;
+            _sessions.TryRemove(new KeyValuePair<string, ComfyuiSession>(session.ServerAddress, session));
+        }
+        session.Dispose();
+    }
+
+    /// <summary>
+    /// Closes every open session. Called on application shutdown.
+    /// </summary>
+    public static void DisposeAll()
+    {
+        List<ComfyuiSession> sessions;
+        lock (_sessionsLock)
+        {
+            sessions = new List<ComfyuiSession>(_sessions.Values);
+            _sessions.Clear();
+        }
+        foreach (var session in sessions)
+        {
+            session.Dispose();
+        }
+    }
+
+    private ComfyuiSession(string serverAddress)
+    {
+        ServerAddress = serverAddress;
+        ClientId = Guid.NewGuid().ToString();
+
+        var handler = new SocketsHttpHandler
+        {
+            PooledConnectionLifetime = TimeSpan.FromMinutes(10),
+            PooledConnectionIdleTimeout = TimeSpan.FromMinutes(2),
+            MaxConnectionsPerServer = 16
+        };
+        Http = new HttpClient(handler) { BaseAddress = new Uri($"http://{serverAddress}/") };
+    }
+
+    public string ServerAddress { get; }
+
+    /// <summary>
+    /// The client id used both for the WebSocket and for every prompt submitted through this session.
+    /// </summary>
+    public string ClientId { get; }
+
+    /// <summary>
+    /// The pooled HTTP client for this server. Requests may use paths relative to the server root.
+    /// </summary>
+    public HttpClient Http { get; }
+
+    public bool IsConnected => _ws?.State == WebSocketState.Open;
+
+    /// <summary>
+    /// Raised on the reader thread for every JSON message received on the WebSocket.
+    /// Handlers must be fast and must not block.
+    /// </summary>
+    public event Action<JObject> MessageReceived;
+
+    /// <summary>
+    /// Starts the background connection loop if it is not already running.
+    /// The loop reconnects with exponential backoff until the session is disposed.
+    /// </summary>
+    public void Start()
+    {
+        lock (_stateLock)
+        {
+            if (_connectionLoopTask != null && !_connectionLoopTask.IsCompleted) return;
+            _cts = new CancellationTokenSource();
+            var token = _cts.Token;
+            _connectionLoopTask = Task.Run(() => ConnectionLoopAsync(token));
+        }
+    }
+
+    /// <summary>
+    /// Ensures the WebSocket is open, triggering an immediate reconnect attempt if it is not.
+    /// Throws if the server cannot be reached.
+    /// </summary>
+    public async Task EnsureConnectedAsync()
+    {
+        if (IsConnected) return;
+
+        Start();
+        Task<bool> connected;
+        lock (_stateLock)
+        {
+            connected = _connected.Task;
+        }
+        KickReconnect();
+
+        var finished = await Task.WhenAny(connected, Task.Delay(TimeSpan.FromSeconds(15)));
+        if (finished != connected)
+        {
+            throw new WebSocketException($"Timed out connecting to ComfyUI at {ServerAddress}.");
+        }
+        await connected;
+    }
+
+    /// <summary>
+    /// Registers a subscriber for the events of the given prompt id.
+    /// Events already received for that id are replayed into the subscription.
+    /// </summary>
+    public PromptSubscription Subscribe(string promptId)
+    {
+        var subscription = new PromptSubscription(this, promptId);
+        lock (_routeLock)
+        {
+            _subscribers[promptId] = subscription;
+            ReplayOrphans(subscription);
+        }
+        return subscription;
+    }
+
+    /// <summary>
+    /// Opens a stream of the latent previews sent by the server, delivering at most one frame per <paramref name="minInterval"/>.
+    /// Previews are only sent when ComfyUI runs with a preview method enabled (e.g. --preview-method auto).
+    /// </summary>
+    public LatentPreviewStream SubscribePreviews(TimeSpan minInterval)
+    {
+        var stream = new LatentPreviewStream(this, minInterval);
+        lock (_routeLock)
+        {
+            _previewStreams = new List<LatentPreviewStream>(_previewStreams) { stream }.ToArray();
+        }
+        return stream;
+    }
+
+    internal void UnsubscribePreviews(LatentPreviewStream stream)
+    {
+        lock (_routeLock)
+        {
+            _previewStreams = Array.FindAll(_previewStreams, s => s != stream);
+        }
+    }
+
+    internal void Rebind(PromptSubscription subscription, string promptId)
+    {
+        lock (_routeLock)
+        {
+            if (_subscribers.TryGetValue(subscription.PromptId, out var existing) && existing == subscription)
+            {
+                _subscribers.Remove(subscription.PromptId);
+            }
+            subscription.PromptId = promptId;
+            _subscribers[promptId] = subscription;
+            ReplayOrphans(subscription);
+        }
+    }
+
+    internal void Unsubscribe(PromptSubscription subscription)
+    {
+        lock (_routeLock)
+        {
+            if (_subscribers.TryGetValue(subscription.PromptId, out var existing) && existing == subscription)
+            {
+                _subscribers.Remove(subscription.PromptId);
+            }
+        }
+        subscription.Complete();
+    }
+
+    private void ReplayOrphans(PromptSubscription subscription)
+    {
+        if (!_orphanEvents.Remove(subscription.PromptId, out var buffered)) return;
+
+        foreach (var message in buffered)
+        {
+            RouteToSubscriber(subscription, message);
+        }
+    }
+
+    private void KickReconnect()
+    {
+        if (_reconnectSignal.CurrentCount == 0)
+        {
+            try { _reconnectSignal.Release(); }
+            catch (SemaphoreFullException) { /* Already signalled */ }
+        }
+    }
+
+    private static TaskCompletionSource<bool> NewConnectionSignal() =>
+        new(TaskCreationOptions.RunContinuationsAsynchronously);
+
+    private async Task ConnectionLoopAsync(CancellationToken token)
+    {
+        const int minDelayMs = 2000;
+        const int maxDelayMs = 60000;
+        int currentDelayMs = minDelayMs;
+
+        while (!token.IsCancellationRequested)
+        {
+            var ws = new ClientWebSocket();
+            bool wasConnected = false;
+            try
+            {
+                using (var connectCts = CancellationTokenSource.CreateLinkedTokenSource(token))
+                {
+                    connectCts.CancelAfter(TimeSpan.FromSeconds(10));
+                    await ws.ConnectAsync(new Uri($"ws://{ServerAddress}/ws?clientId={ClientId}"), connectCts.Token);
+                }
+
+                _ws = ws;
+                wasConnected = true;
+                currentDelayMs = minDelayMs;
+                lock (_stateLock)
+                {
+                    _connected.TrySetResult(true);
+                }
+
+                await ReadLoopAsync(ws, token);
+            }
+            catch (OperationCanceledException) when (token.IsCancellationRequested)
+            {
+                break;
+            }
+            catch (Exception ex) when (ex is WebSocketException || ex is HttpRequestException || ex is OperationCanceledException)
+            {
+                if (!wasConnected)
+                {
+                    Logger.Log($"Failed to connect to ComfyUI WebSocket at {ServerAddress}: {ex.Message}", LogLevel.Error);
+                    lock (_stateLock)
+                    {
+                        _connected.TrySetException(new WebSocketException($"Failed to connect to ComfyUI at {ServerAddress}: {ex.Message}", ex));
+                        _connected = NewConnectionSignal();
+                    }
+                }
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, $"Error in ComfyUI WebSocket session for {ServerAddress}");
+            }
+            finally
+            {
+                _ws = null;
+                ws.Dispose();
+                if (wasConnected)
+                {
+                    lock (_stateLock)
+                    {
+                        _connected = NewConnectionSignal();
+                    }
+                    CompleteAllSubscriptions();
+                }
+            }
+
+            if (token.IsCancellationRequested) break;
+
+            try
+            {
+                // Sleep for the backoff period unless someone explicitly needs the connection now.
+                await _reconnectSignal.WaitAsync(currentDelayMs, token);
+                currentDelayMs = Math.Min(currentDelayMs * 2, maxDelayMs);
+            }
+            catch (OperationCanceledException)
+            {
+                break;
+            }
+        }
+    }
+
+    private async Task ReadLoopAsync(ClientWebSocket ws, CancellationToken token)
+    {
+        var buffer = new byte[16 * 1024];
+        using var ms = new MemoryStream();
+
+        while (ws.State == WebSocketState.Open && !token.IsCancellationRequested)
+        {
+            ms.SetLength(0);
+            WebSocketReceiveResult result;
+            do
+            {
+                result = await ws.ReceiveAsync(new ArraySegment<byte>(buffer), token);
+                if (result.MessageType == WebSocketMessageType.Close)
+                {
+                    return;
+                }
+                ms.Write(buffer, 0, result.Count);
+            } while (!result.EndOfMessage);
+
+            if (result.MessageType == WebSocketMessageType.Binary)
+            {
+                // Binary messages carry latent previews; they are parsed straight from the receive buffer.
+                var previewStreams = _previewStreams;
+                foreach (var stream in previewStreams)
+                {
+                    stream.Offer(ms.GetBuffer().AsSpan(0, (int)ms.Length));
+                }
+                continue;
+            }
+
+            JObject message;
+            try
+            {
+                ms.Position = 0;
+                using var reader = new JsonTextReader(new StreamReader(ms, Encoding.UTF8, false, 4096, leaveOpen: true));
+                message = JObject.Load(reader);
+            }
+            catch (JsonException)
+            {
+                continue; // Ignore non-JSON messages
+            }
+
+            Dispatch(message);
+        }
+    }
+
+    private void Dispatch(JObject message)
+    {
+        var promptId = (message["data"] as JObject)?["prompt_id"]?.ToString();
+        if (!string.IsNullOrEmpty(promptId))
+        {
+            lock (_routeLock)
+            {
+                if (_subscribers.TryGetValue(promptId, out var subscription))
+                {
+                    RouteToSubscriber(subscription, message);
+                }
+                else
+                {
+                    BufferOrphan(promptId, message);
+                }
+            }
+        }
+
+        try
+        {
+            MessageReceived?.Invoke(message);
+        }
+        catch (Exception ex)
+        {
+            Logger.Log(ex, "Error in ComfyUI WebSocket message handler");
+        }
+    }
+
+    private static void RouteToSubscriber(PromptSubscription subscription, JObject message)
+    {
+        subscription.Post(message);
+        if (IsExecutionComplete(message))
+        {
+            subscription.Complete();
+        }
+    }
+
+    private void BufferOrphan(string promptId, JObject message)
+    {
+        if (!_orphanEvents.TryGetValue(promptId, out var list))
+        {
+            list = new List<JObject>();
+            _orphanEvents[promptId] = list;
+            _orphanOrder.Enqueue(promptId);
+            while (_orphanOrder.Count > MaxOrphanPrompts)
+            {
+                _orphanEvents.Remove(_orphanOrder.Dequeue());
+            }
+        }
+        if (list.Count < MaxOrphanEventsPerPrompt)
+        {
+            list.Add(message);
+        }
+    }
+
+    /// <summary>
+    /// The end of a prompt is reported as an "executing" message whose node is null.
+    /// </summary>
+    private static bool IsExecutionComplete(JObject message)
+    {
+        return message["type"]?.ToString() == "executing"
+               && message["data"] is JObject data
+               && data.TryGetValue("node", out var node)
+               && node.Type == JTokenType.Null;
+    }
+
+    private void CompleteAllSubscriptions()
+    {
+        List<PromptSubscription> subscriptions;
+        lock (_routeLock)
+        {
+            subscriptions = new List<PromptSubscription>(_subscribers.Values);
+            _subscribers.Clear();
+        }
+        foreach (var subscription in subscriptions)
+        {
+            subscription.Complete(connectionLost: true);
+        }
+    }
+
+    public void Dispose()
+    {
+        var ws = _ws;
+        if (ws != null && ws.State == WebSocketState.Open)
+        {
+            try
+            {
+                using var closeCts = new CancellationTokenSource(TimeSpan.FromSeconds(2));
+                ws.CloseAsync(WebSocketCloseStatus.NormalClosure, "Client disconnecting", closeCts.Token).Wait(closeCts.Token);
+            }
+            catch (Exception) { /* Ignore */ }
+        }
+
+        Task loop;
+        lock (_stateLock)
+        {
+            _cts?.Cancel();
+            loop = _connectionLoopTask;
+            _connectionLoopTask = null;
+        }
+
+        try { loop?.Wait(TimeSpan.FromSeconds(2)); }
+        catch (Exception) { /* Ignore */ }
+
+        CompleteAllSubscriptions();
+        _cts?.Dispose();
+        _cts = null;
+        // Also disposes the pooled handler and its connections.
+        Http.Dispose();
+    }
+}
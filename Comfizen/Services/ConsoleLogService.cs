@@ -2,12 +2,8 @@
 using System.Collections.Concurrent;
 using System.Collections.Generic;
 using System.Collections.ObjectModel;
-using System.IO;
 using System.Linq;
-using System.Net.WebSockets;
-using System.Text;
 using System.Text.RegularExpressions;
-using System.Threading;
 using System.Threading.Tasks;
 using System.Windows;
 using System.Windows.Media;
@@ -22,18 +18,16 @@ namespace Comfizen
     public class ConsoleLogService
     {
         private AppSettings _settings;
-        private ClientWebSocket _ws;
-        private CancellationTokenSource _cts;
+        private ComfyuiSession _session;
         
         private readonly ConcurrentQueue<LogMessage> _logQueue = new();
         private readonly DispatcherTimer _logUpdateTimer;
         private readonly List<LogMessage> _fullLogHistory = new List<LogMessage>();
 
         private readonly object _connectionLock = new object();
-        private Task _connectionManagerTask;
 
         public ObservableCollection<LogMessage> LogMessages { get; } = new ObservableCollection<LogMessage>();
-        public bool IsConnected => _ws?.State == WebSocketState.Open;
+        public bool IsConnected => _session?.IsConnected == true;
         public event Action<LogLevel> OnLogReceived;
         
         // Regex to detect the execution time message.
@@ -53,151 +47,46 @@ namespace Comfizen
             _logUpdateTimer.Start();
         }
 
+        /// <summary>
+        /// Starts listening for console messages on the shared WebSocket of the configured server's session.
+        /// </summary>
         public Task ConnectAsync()
         {
             lock (_connectionLock)
             {
-                if (_connectionManagerTask == null || _connectionManagerTask.IsCompleted)
+                if (_session == null)
                 {
-                    _cts = new CancellationTokenSource();
-                    _connectionManagerTask = Task.Run(() => ConnectionManagerLoopAsync(_cts.Token));
+                    _session = ComfyuiSession.Acquire(_settings.ServerAddress);
+                    _session.MessageReceived += ProcessMessage;
+                    _session.Start();
                 }
             }
             return Task.CompletedTask;
         }
         
-        public async Task DisconnectAsync()
+        public Task DisconnectAsync()
         {
             _logUpdateTimer?.Stop();
             
-            if (_cts != null && !_cts.IsCancellationRequested)
-            {
-                _cts.Cancel();
-            }
-
-            if (_connectionManagerTask != null)
-            {
-                try
-                {
-                    await _connectionManagerTask;
-                }
-                catch (OperationCanceledException) { /* Expected */ }
-                catch (Exception ex)
-                {
-                    Logger.Log(ex, "Error while waiting for the connection manager task to complete");
-                }
-                _connectionManagerTask = null;
-            }
-
-            if (_ws != null)
+            lock (_connectionLock)
             {
-                if (_ws.State == WebSocketState.Open || _ws.State == WebSocketState.Connecting)
+                if (_session != null)
                 {
-                    try
-                    {
-                        var closeCts = new CancellationTokenSource(TimeSpan.FromSeconds(2));
-                        await _ws.CloseAsync(WebSocketCloseStatus.NormalClosure, "Client disconnecting", closeCts.Token);
-                    }
-                    catch (Exception) { /* Ignore */ }
+                    _session.MessageReceived -= ProcessMessage;
+                    ComfyuiSession.Release(_session);
+                    _session = null;
                 }
-                _ws.Dispose();
-                _ws = null;
             }
-
-            _cts?.Dispose();
-            _cts = null;
+            return Task.CompletedTask;
         }
 
         public async Task ReconnectAsync(AppSettings newSettings)
         {
             await DisconnectAsync();
             _settings = newSettings;
+            _logUpdateTimer?.Start();
             await ConnectAsync();
         }
-
-        private async Task ConnectionManagerLoopAsync(CancellationToken token)
-        {
-            int minDelayMs = 5000;
-            int maxDelayMs = 60000;
-            int currentDelayMs = minDelayMs;
-
-            while (!token.IsCancellationRequested)
-            {
-                try
-                {
-                    _ws?.Dispose();
-                    _ws = new ClientWebSocket();
-
-                    var uriBuilder = new UriBuilder($"http://{_settings.ServerAddress}")
-                    {
-                        Scheme = "ws",
-                        Path = "/ws",
-                        Query = $"clientId={Guid.NewGuid()}"
-                    };
-
-                    var connectCts = new CancellationTokenSource(TimeSpan.FromSeconds(10));
-                    using var linkedCts = CancellationTokenSource.CreateLinkedTokenSource(token, connectCts.Token);
-                    
-                    await _ws.ConnectAsync(uriBuilder.Uri, linkedCts.Token);
-
-                    currentDelayMs = minDelayMs;
-                    await ListenForMessages(token);
-                }
-                catch (Exception ex) when (ex is WebSocketException || ex is System.Net.Http.HttpRequestException)
-                {
-                    Logger.Log($"Failed to connect to ComfyUI log WebSocket: {ex.Message}", LogLevel.Error);
-                }
-                catch (OperationCanceledException)
-                {
-                    if (token.IsCancellationRequested) break;
-                }
-                catch (Exception ex)
-                {
-                    Logger.Log(ex, "Error while connecting or listening to the log WebSocket");
-                }
-                finally
-                {
-                    _ws?.Dispose();
-                    _ws = null;
-                }
-
-                if (!token.IsCancellationRequested)
-                {
-                    try
-                    {
-                        await Task.Delay(currentDelayMs, token);
-                        currentDelayMs = Math.Min(currentDelayMs * 2, maxDelayMs);
-                    }
-                    catch (OperationCanceledException)
-                    {
-                        break;
-                    }
-                }
-            }
-        }
-
-        private async Task ListenForMessages(CancellationToken token)
-        {
-            var buffer = new ArraySegment<byte>(new byte[8192]);
-
-            while (_ws.State == WebSocketState.Open && !token.IsCancellationRequested)
-            {
-                using (var ms = new MemoryStream())
-                {
-                    WebSocketReceiveResult result;
-                    do
-                    {
-                        result = await _ws.ReceiveAsync(buffer, token);
-                        ms.Write(buffer.Array, buffer.Offset, result.Count);
-                    } while (!result.EndOfMessage);
-
-                    if (result.MessageType == WebSocketMessageType.Close) break;
-
-                    var message = Encoding.UTF8.GetString(ms.ToArray());
-                    ProcessMessage(message);
-                }
-            }
-        }
         
         /// <summary>
         /// Safely enqueues a log message to be processed and added to the UI console.
@@ -224,11 +113,10 @@ namespace Comfizen
             LogMessages.Clear();
         }
         
-        private void ProcessMessage(string message)
+        private void ProcessMessage(JObject json)
         {
             try
             {
-                var json = JObject.Parse(message);
                 var type = json["type"]?.ToString();
                 
                 if (type == "console_log_message" || type == "console_stdout_output")
@@ -292,7 +180,7 @@ namespace Comfizen
             }
             catch
             {
-                // Ignore non-JSON messages
+                // Ignore malformed messages
             }
         }
 
@@ -0,0 +1,233 @@
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Security.Cryptography;
+using System.Threading.Tasks;
+using Newtonsoft.Json;
+using Newtonsoft.Json.Linq;
+
+namespace Comfizen;
+
+/// <summary>
+/// Content-addressed uploads of inpaint images and masks. Instead of embedding base64 data into every queued prompt,
+/// the image is stored once on local disk under its SHA-256 and the prompt field holds a short reference.
+/// When the prompt is submitted, each referenced image is uploaded to the chosen server through /upload/image
+/// (once per server and content) and the base64 loader node is rewritten to an equivalent LoadImage node.
+/// </summary>
+public sealed class ImageUploadService
+{
+    private static readonly Lazy<ImageUploadService> _instance = new(() => new ImageUploadService());
+    public static ImageUploadService Instance => _instance.Value;
+
+    /// <summary>
+    /// Prefix of the field values written by <see cref="Store"/>, followed by the stored file name.
+    /// </summary>
+    public const string ReferencePrefix = "comfizen-upload:";
+
+    private static readonly string _storeDirectory = Path.Combine(Directory.GetCurrentDirectory(), "uploads");
+
+    // Stored images not used (stored again or loaded) for this long are deleted on start. Saved queues and images
+    // that still reference them can no longer send the image.
+    private static readonly TimeSpan _unusedLifetime = TimeSpan.FromDays(30);
+
+    // Base64 loader node (comfyui-tooling-nodes) -> the core node that loads the same data from the input folder.
+    private static readonly Dictionary<string, (string ClassType, JObject ExtraInputs)> _loaderReplacements = new()
+    {
+        ["ETN_LoadImageBase64"] = ("LoadImage", new JObject()),
+        ["ETN_LoadMaskBase64"] = ("LoadImageMask", new JObject { ["channel"] = "red" })
+    };
+
+    // "server|file name" -> the name the server stored the upload under
+    private readonly ConcurrentDictionary<string, Task<string>> _uploads = new(StringComparer.OrdinalIgnoreCase);
+
+    private ImageUploadService()
+    {
+        Task.Run(PruneStore);
+    }
+
+    /// <summary>
+    /// Stores the image in the local upload store, if it is not there yet, and returns the reference to put into the prompt.
+    /// </summary>
+    public string Store(byte[] data)
+    {
+        var fileName = $"{Convert.ToHexString(SHA256.HashData(data)).ToLowerInvariant()}{GetExtension(data)}";
+        var path = Path.Combine(_storeDirectory, fileName);
+        if (File.Exists(path))
+        {
+            MarkUsed(path);
+        }
+        else
+        {
+            Directory.CreateDirectory(_storeDirectory);
+            // Written under a temporary name so that a crash never leaves a truncated file behind a valid hash.
+            var tempPath = $"{path}.{Guid.NewGuid():N}.tmp";
+            File.WriteAllBytes(tempPath, data);
+            try
+            {
+                File.Move(tempPath, path);
+            }
+            catch (IOException)
+            {
+                File.Delete(tempPath); // Stored concurrently by another task
+            }
+        }
+        return ReferencePrefix + fileName;
+    }
+
+    public static bool IsReference(string value) => value != null && value.StartsWith(ReferencePrefix, StringComparison.Ordinal);
+
+    /// <summary>
+    /// Reads the image behind a reference, or returns null if it is not in the local store.
+    /// </summary>
+    public byte[] Load(string reference)
+    {
+        var path = GetStorePath(reference);
+        if (path == null || !File.Exists(path)) return null;
+        MarkUsed(path);
+        return File.ReadAllBytes(path);
+    }
+
+    /// <summary>
+    /// Forgets the uploads to a server whose file names appear in the server's error for a rejected prompt,
+    /// e.g. after its input folder was cleaned. The next <see cref="ResolveAsync"/> uploads them again.
+    /// </summary>
+    /// <returns>True if an upload was forgotten, i.e. resolving and submitting the prompt again may succeed.</returns>
+    public bool ForgetMissingUploads(string serverError, string serverAddress)
+    {
+        if (string.IsNullOrEmpty(serverError)) return false;
+
+        bool forgotten = false;
+        var prefix = serverAddress + "|";
+        foreach (var (key, upload) in _uploads)
+        {
+            if (!key.StartsWith(prefix, StringComparison.OrdinalIgnoreCase) || !upload.IsCompletedSuccessfully) continue;
+            if (upload.Result != null && serverError.Contains(upload.Result, StringComparison.Ordinal) && _uploads.TryRemove(key, out _))
+            {
+                forgotten = true;
+            }
+        }
+        return forgotten;
+    }
+
+    /// <summary>
+    /// Prepares a prompt that contains upload references for a server: uploads the referenced images
+    /// it does not have yet and rewrites the nodes that hold them.
+    /// </summary>
+    /// <returns>The prompt to send; <paramref name="json"/> itself if it contains no references.</returns>
+    public async Task<string> ResolveAsync(string json, string serverAddress)
+    {
+        if (!json.Contains(ReferencePrefix, StringComparison.Ordinal)) return json;
+
+        var prompt = JObject.Parse(json);
+        foreach (var node in prompt.Properties().Select(p => p.Value).OfType<JObject>())
+        {
+            if (node["inputs"] is not JObject inputs) continue;
+
+            foreach (var input in inputs.Properties().ToList())
+            {
+                var value = input.Value.Type == JTokenType.String ? input.Value.ToString() : null;
+                if (!IsReference(value)) continue;
+
+                var serverFileName = await UploadAsync(value, serverAddress);
+                var classType = node["class_type"]?.ToString();
+                if (serverFileName != null && classType != null && _loaderReplacements.TryGetValue(classType, out var replacement))
+                {
+                    var newInputs = new JObject { ["image"] = serverFileName };
+                    newInputs.Merge(replacement.ExtraInputs);
+                    node["class_type"] = replacement.ClassType;
+                    node["inputs"] = newInputs;
+                    break;
+                }
+                if (serverFileName != null && classType is "LoadImage" or "LoadImageMask")
+                {
+                    input.Value = serverFileName;
+                    continue;
+                }
+
+                // A node that only understands inline data: embed the image the way it was done before.
+                var data = Load(value);
+                if (data == null)
+                {
+                    throw new FileNotFoundException($"The uploaded image '{value}' is missing from the local upload store.", GetStorePath(value));
+                }
+                input.Value = Convert.ToBase64String(data);
+            }
+        }
+        return prompt.ToString(Formatting.None);
+    }
+
+    private Task<string> UploadAsync(string reference, string serverAddress)
+    {
+        var key = $"{serverAddress}|{reference.Substring(ReferencePrefix.Length)}";
+        return _uploads.GetOrAdd(key, k => UploadCoreAsync(reference, serverAddress, k));
+    }
+
+    private async Task<string> UploadCoreAsync(string reference, string serverAddress, string key)
+    {
+        var data = Load(reference);
+        if (data == null) return null;
+
+        var serverFileName = await new ComfyUI_API(serverAddress).UploadImageAsync(data, $"comfizen_{reference.Substring(ReferencePrefix.Length)}");
+        if (serverFileName == null)
+        {
+            // Forget the failure so that the next prompt that needs the image tries again.
+            _uploads.TryRemove(key, out _);
+            Logger.Log($"Could not upload an inpaint image to ComfyUI server {serverAddress}; sending it inline instead.", LogLevel.Warning);
+        }
+        return serverFileName;
+    }
+
+    private static void MarkUsed(string path)
+    {
+        try
+        {
+            File.SetLastWriteTimeUtc(path, DateTime.UtcNow);
+        }
+        catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+        {
+            // Only affects when the image is pruned
+        }
+    }
+
+    /// <summary>
+    /// Deletes stored images that have not been used for <see cref="_unusedLifetime"/>, and temporary files left by a crash.
+    /// </summary>
+    private static void PruneStore()
+    {
+        try
+        {
+            var directory = new DirectoryInfo(_storeDirectory);
+            if (!directory.Exists) return;
+
+            var cutoff = DateTime.UtcNow - _unusedLifetime;
+            foreach (var file in directory.EnumerateFiles())
+            {
+                bool isTemp = file.Extension.Equals(".tmp", StringComparison.OrdinalIgnoreCase);
+                if (file.LastWriteTimeUtc < cutoff || (isTemp && file.LastWriteTimeUtc < DateTime.UtcNow.AddHours(-1)))
+                {
+                    file.Delete();
+                }
+            }
+        }
+        catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+        {
+            Logger.Log(ex, "Failed to prune the upload store");
+        }
+    }
+
+    private static string GetStorePath(string reference)
+    {
+        var fileName = reference.Substring(ReferencePrefix.Length);
+        // References come from saved queues and images; never let one point outside the store.
+        return fileName == Path.GetFileName(fileName) ? Path.Combine(_storeDirectory, fileName) : null;
+    }
+
+    private static string GetExtension(byte[] data)
+    {
+        if (data.Length >= 3 && data[0] == 0xFF && data[1] == 0xD8 && data[2] == 0xFF) return ".jpg";
+        if (data.Length >= 12 && data[0] == 'R' && data[1] == 'I' && data[2] == 'F' && data[3] == 'F' && data[8] == 'W' && data[9] == 'E' && data[10] == 'B' && data[11] == 'P') return ".webp";
+        return ".png";
+    }
+}
@@ -1,5 +1,7 @@
 ﻿using System;
+using System.Buffers;
 using System.Collections.Concurrent;
+using System.IO;
 using System.Net;
 using System.Threading;
 using System.Threading.Tasks;
@@ -8,7 +10,7 @@ using System.Windows;
 namespace Comfizen;
 
 /// <summary>
-/// A singleton in-memory HTTP server to stream byte arrays to the WPF MediaElement.
+/// A singleton in-memory HTTP server to stream byte arrays (or local files) to the WPF MediaElement.
 /// </summary>
 public sealed class InMemoryHttpServer
 {
@@ -18,6 +20,7 @@ public sealed class InMemoryHttpServer
     private readonly HttpListener _listener;
     private readonly string _baseUrl;
     private readonly ConcurrentDictionary<string, byte[]> _mediaStore = new ConcurrentDictionary<string, byte[]>();
+    private readonly ConcurrentDictionary<string, string> _mediaFiles = new ConcurrentDictionary<string, string>();
     private CancellationTokenSource _cts;
 
     private InMemoryHttpServer()
@@ -64,6 +67,7 @@ public sealed class InMemoryHttpServer
 
         _cts?.Dispose();
         _mediaStore.Clear();
+        _mediaFiles.Clear();
     }
 
     public Uri RegisterMedia(byte[] mediaBytes, string fileName)
@@ -75,6 +79,17 @@ public sealed class InMemoryHttpServer
         return new Uri($"{_baseUrl}{mediaId}/{Uri.EscapeDataString(fileName)}");
     }
 
+    /// <summary>
+    /// Registers a file on disk for playback without loading it into memory.
+    /// </summary>
+    public Uri RegisterMediaFile(string filePath, string fileName)
+    {
+        var mediaId = Guid.NewGuid().ToString();
+        _mediaFiles.TryAdd(mediaId, filePath);
+
+        return new Uri($"{_baseUrl}{mediaId}/{Uri.EscapeDataString(fileName)}");
+    }
+
     private async Task ListenLoop(CancellationToken token)
     {
         try
@@ -102,8 +117,26 @@ public sealed class InMemoryHttpServer
         if (segments.Length > 0)
         {
             var mediaId = segments[0];
-            if (_mediaStore.TryGetValue(mediaId, out var mediaBytes))
+            Stream media = null;
+            try
+            {
+                if (_mediaStore.TryGetValue(mediaId, out var mediaBytes))
+                {
+                    media = new MemoryStream(mediaBytes, false);
+                }
+                else if (_mediaFiles.TryGetValue(mediaId, out var mediaPath) && File.Exists(mediaPath))
+                {
+                    media = new FileStream(mediaPath, FileMode.Open, FileAccess.Read, FileShare.ReadWrite | FileShare.Delete, 81920, true);
+                }
+            }
+            catch (IOException ex)
             {
+                Logger.Log(ex, $"InMemoryHttpServer failed to open media {mediaId}");
+            }
+            
+            if (media != null)
+            {
+                await using var _ = media;
                 try
                 {
                     context.Response.ContentType = segments.Length > 1 && segments[1].EndsWith(".gif", StringComparison.OrdinalIgnoreCase) ? "image/gif" : "video/mp4";
@@ -111,7 +144,7 @@ public sealed class InMemoryHttpServer
 
                     var rangeHeader = context.Request.Headers["Range"];
                     long start = 0;
-                    long end = mediaBytes.Length - 1;
+                    long end = media.Length - 1;
 
                     if (!string.IsNullOrEmpty(rangeHeader))
                     {
@@ -122,8 +155,8 @@ public sealed class InMemoryHttpServer
                             end = long.Parse(range[1]);
                         }
                         
-                        end = Math.Min(end, mediaBytes.Length - 1);
-                        if (start >= mediaBytes.Length)
+                        end = Math.Min(end, media.Length - 1);
+                        if (start >= media.Length)
                         {
                             context.Response.StatusCode = (int)HttpStatusCode.RequestedRangeNotSatisfiable;
                             context.Response.OutputStream.Close();
@@ -131,7 +164,7 @@ public sealed class InMemoryHttpServer
                         }
                         
                         context.Response.StatusCode = (int)HttpStatusCode.PartialContent;
-                        context.Response.AddHeader("Content-Range", $"bytes {start}-{end}/{mediaBytes.Length}");
+                        context.Response.AddHeader("Content-Range", $"bytes {start}-{end}/{media.Length}");
                     }
                     else
                     {
@@ -141,7 +174,7 @@ public sealed class InMemoryHttpServer
                     long length = end - start + 1;
                     context.Response.ContentLength64 = length;
                     
-                    await context.Response.OutputStream.WriteAsync(mediaBytes, (int)start, (int)length, token);
+                    await CopyRangeAsync(media, context.Response.OutputStream, start, length, token);
                 }
                 catch (HttpListenerException) { /* Client disconnected, common scenario. */ }
                 catch (OperationCanceledException) { /* Server is shutting down. */ }
@@ -157,4 +190,24 @@ public sealed class InMemoryHttpServer
         context.Response.StatusCode = (int)HttpStatusCode.NotFound;
         context.Response.OutputStream.Close();
     }
+
+    private static async Task CopyRangeAsync(Stream source, Stream destination, long start, long length, CancellationToken token)
+    {
+        source.Seek(start, SeekOrigin.Begin);
+        var buffer = ArrayPool<byte>.Shared.Rent(81920);
+        try
+        {
+            while (length > 0)
+            {
+                int read = await source.ReadAsync(buffer.AsMemory(0, (int)Math.Min(buffer.Length, length)), token);
+                if (read == 0) break;
+                await destination.WriteAsync(buffer.AsMemory(0, read), token);
+                length -= read;
+            }
+        }
+        finally
+        {
+            ArrayPool<byte>.Shared.Return(buffer);
+        }
+    }
 }
\ No newline at end of file
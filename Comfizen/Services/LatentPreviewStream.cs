@@ -0,0 +1,189 @@
+using System;
+using System.Buffers;
+using System.Buffers.Binary;
+using System.Collections.Generic;
+using System.Runtime.CompilerServices;
+using System.Text;
+using System.Threading;
+using System.Threading.Channels;
+using System.Threading.Tasks;
+using Newtonsoft.Json.Linq;
+
+namespace Comfizen;
+
+/// <summary>
+/// A latent preview image that ComfyUI sends as a binary WebSocket message while a sampler is running.
+/// The encoded image is kept in a pooled buffer that is reused for a later frame, so it is only valid
+/// until the reader asks <see cref="LatentPreviewStream"/> for the next one.
+/// </summary>
+public sealed class PreviewFrame
+{
+    private byte[] _buffer = Array.Empty<byte>();
+    private int _length;
+
+    /// <summary>
+    /// The encoded image (JPEG or PNG, see <see cref="ImageFormat"/>).
+    /// </summary>
+    public ReadOnlyMemory<byte> Data => _buffer.AsMemory(0, _length);
+
+    /// <summary>
+    /// The MIME type of <see cref="Data"/>, e.g. "image/jpeg".
+    /// </summary>
+    public string ImageFormat { get; private set; }
+
+    /// <summary>
+    /// The prompt and node the preview belongs to. Only known on servers that send previews with metadata.
+    /// </summary>
+    public string PromptId { get; private set; }
+    public string NodeId { get; private set; }
+
+    internal void Set(ReadOnlySpan<byte> image, string imageFormat, string promptId, string nodeId)
+    {
+        if (_buffer.Length < image.Length)
+        {
+            if (_buffer.Length > 0) ArrayPool<byte>.Shared.Return(_buffer);
+            _buffer = ArrayPool<byte>.Shared.Rent(image.Length);
+        }
+        image.CopyTo(_buffer);
+        _length = image.Length;
+        ImageFormat = imageFormat;
+        PromptId = promptId;
+        NodeId = nodeId;
+    }
+
+    internal void Release()
+    {
+        if (_buffer.Length > 0) ArrayPool<byte>.Shared.Return(_buffer);
+        _buffer = Array.Empty<byte>();
+        _length = 0;
+    }
+}
+
+/// <summary>
+/// A throttled, latest-wins stream of the latent previews received by a <see cref="ComfyuiSession"/>.
+/// Frames that arrive while the reader is busy overwrite each other, so a slow reader always gets the
+/// newest preview and never falls behind. Two frame buffers are swapped between the WebSocket reader and
+/// the consumer, so no memory is allocated per frame once they have grown to the preview size.
+/// </summary>
+public sealed class LatentPreviewStream : IDisposable
+{
+    // Binary event types, see ComfyUI's server.py (BinaryEventTypes).
+    private const int PreviewImage = 1;
+    private const int PreviewImageWithMetadata = 4;
+
+    private readonly ComfyuiSession _session;
+    private readonly TimeSpan _minInterval;
+    private readonly object _lock = new();
+    private readonly Channel<bool> _signal = Channel.CreateBounded<bool>(
+        new BoundedChannelOptions(1) { FullMode = BoundedChannelFullMode.DropWrite, SingleReader = true });
+
+    private PreviewFrame _back = new(); // Filled by the WebSocket reader
+    private PreviewFrame _front = new(); // Handed to the consumer
+    private bool _hasFrame;
+    private bool _disposed;
+
+    internal LatentPreviewStream(ComfyuiSession session, TimeSpan minInterval)
+    {
+        _session = session;
+        _minInterval = minInterval;
+    }
+
+    /// <summary>
+    /// Yields the newest preview at most once per the interval given to <see cref="ComfyuiSession.SubscribePreviews"/>.
+    /// Each yielded frame is reused as soon as the loop continues; copy or decode it inside the loop body.
+    /// </summary>
+    public async IAsyncEnumerable<PreviewFrame> ReadAllAsync([EnumeratorCancellation] CancellationToken token = default)
+    {
+        while (await _signal.Reader.WaitToReadAsync(token))
+        {
+            _signal.Reader.TryRead(out _);
+
+            PreviewFrame frame;
+            lock (_lock)
+            {
+                if (!_hasFrame) continue;
+                (_front, _back) = (_back, _front);
+                _hasFrame = false;
+                frame = _front;
+            }
+
+            var shownAt = Environment.TickCount64;
+            yield return frame;
+
+            var wait = _minInterval - TimeSpan.FromMilliseconds(Environment.TickCount64 - shownAt);
+            if (wait > TimeSpan.Zero)
+            {
+                await Task.Delay(wait, token);
+            }
+        }
+    }
+
+    /// <summary>
+    /// Parses a binary WebSocket message and, if it is a preview image, makes it the latest frame.
+    /// </summary>
+    internal void Offer(ReadOnlySpan<byte> message)
+    {
+        if (!TryParse(message, out var image, out var imageFormat, out var promptId, out var nodeId)) return;
+
+        lock (_lock)
+        {
+            if (_disposed) return;
+            _back.Set(image, imageFormat, promptId, nodeId);
+            _hasFrame = true;
+        }
+        _signal.Writer.TryWrite(true);
+    }
+
+    internal static bool TryParse(ReadOnlySpan<byte> message, out ReadOnlySpan<byte> image, out string imageFormat, out string promptId, out string nodeId)
+    {
+        image = default;
+        imageFormat = null;
+        promptId = null;
+        nodeId = null;
+        if (message.Length < 8) return false;
+
+        switch (BinaryPrimitives.ReadInt32BigEndian(message))
+        {
+            case PreviewImage:
+                // [event type][image type: 1 = JPEG, 2 = PNG][image]
+                imageFormat = BinaryPrimitives.ReadInt32BigEndian(message.Slice(4)) == 2 ? "image/png" : "image/jpeg";
+                image = message.Slice(8);
+                return image.Length > 0;
+
+            case PreviewImageWithMetadata:
+                // [event type][metadata length][metadata JSON][image]
+                var metadataLength = BinaryPrimitives.ReadInt32BigEndian(message.Slice(4));
+                if (metadataLength < 0 || metadataLength > message.Length - 8) return false;
+                try
+                {
+                    var metadata = JObject.Parse(Encoding.UTF8.GetString(message.Slice(8, metadataLength)));
+                    imageFormat = metadata["image_type"]?.ToString() ?? "image/jpeg";
+                    promptId = metadata["prompt_id"]?.ToString();
+                    nodeId = metadata["node_id"]?.ToString();
+                }
+                catch (Exception)
+                {
+                    return false;
+                }
+                image = message.Slice(8 + metadataLength);
+                return image.Length > 0;
+
+            default:
+                return false; // Text and unencoded previews are not used by this client
+        }
+    }
+
+    public void Dispose()
+    {
+        _session.UnsubscribePreviews(this);
+        lock (_lock)
+        {
+            if (_disposed) return;
+            _disposed = true;
+            _hasFrame = false;
+            _back.Release();
+        }
+        // The front frame may still be in use by the reader; it is left to the GC rather than returned to the pool.
+        _signal.Writer.TryComplete();
+    }
+}
@@ -88,6 +88,7 @@ public class ModelService
     private static ModelCache _persistentCache;
     private static readonly object _cacheLock = new();
     private readonly string _apiBaseUrl;
+    private readonly string _serverAddress;
     private readonly AppSettings _settings;
     private static bool _isConnectionErrorVisible = false;
 
@@ -101,10 +102,18 @@ public class ModelService
 
     // --- END: Persistent Cache Logic ---
 
-    public ModelService(AppSettings settings)
+    public ModelService(AppSettings settings) : this(settings, settings.ServerAddress)
+    {
+    }
+
+    /// <summary>
+    ///     Creates a service for a specific server of the backend pool. Caches are kept per server.
+    /// </summary>
+    public ModelService(AppSettings settings, string serverAddress)
     {
         _settings = settings;
-        _apiBaseUrl = $"http://{_settings.ServerAddress}";
+        _serverAddress = serverAddress;
+        _apiBaseUrl = $"http://{serverAddress}";
     }
     
     /// <summary>
@@ -228,7 +237,7 @@ public class ModelService
         // 1. Check in-memory cache (fastest)
         if (_objectInfoCache.TryGetValue(_apiBaseUrl, out var cachedInfo)) return cachedInfo;
 
-        var serverKey = _settings.ServerAddress;
+        var serverKey = _serverAddress;
 
         // 2. Check persistent file cache
         lock (_cacheLock)
@@ -298,7 +307,7 @@ public class ModelService
     {
         if (modelTypeInfo == null) return new List<string>();
 
-        var serverKey = _settings.ServerAddress;
+        var serverKey = _serverAddress;
         var modelTypeKey = modelTypeInfo.Name;
 
         // 1. Check in-memory cache (fastest, for current session).
@@ -0,0 +1,447 @@
+using System;
+using System.Collections.Generic;
+using System.Diagnostics;
+using System.Globalization;
+using System.IO;
+using System.Linq;
+using System.Runtime.CompilerServices;
+using System.Text;
+using System.Threading;
+using System.Threading.Tasks;
+using Newtonsoft.Json;
+using Newtonsoft.Json.Linq;
+
+namespace Comfizen;
+
+/// <summary>
+/// Aggregated execution times of one node class_type within one workflow.
+/// </summary>
+public class NodeTimingStats
+{
+    public int Executions { get; set; }
+    public int CachedRuns { get; set; }
+    public double TotalSeconds { get; set; }
+    public double MaxSeconds { get; set; }
+    public double LastSeconds { get; set; }
+
+    /// <summary>
+    /// Progress steps reported by executions that sent "progress" events (samplers), and the time they took.
+    /// </summary>
+    public long TotalSteps { get; set; }
+    public double SteppedSeconds { get; set; }
+
+    [JsonIgnore] public double MeanSeconds => Executions > 0 ? TotalSeconds / Executions : 0;
+    [JsonIgnore] public double SecondsPerStep => TotalSteps > 0 ? SteppedSeconds / TotalSteps : 0;
+
+    /// <summary>
+    /// The share of runs in which the node actually executed instead of being served from ComfyUI's cache.
+    /// </summary>
+    [JsonIgnore] public double ExecutionRatio => Executions + CachedRuns > 0 ? (double)Executions / (Executions + CachedRuns) : 1;
+}
+
+/// <summary>
+/// Collects how long each node takes to execute, per workflow and node class_type, from the WebSocket events
+/// of queued prompts. The data is used to predict the duration of pending tasks and can be exported to find slow nodes.
+/// </summary>
+public sealed class NodeTimingService
+{
+    private static readonly Lazy<NodeTimingService> _instance = new(() => new NodeTimingService());
+    public static NodeTimingService Instance => _instance.Value;
+
+    private static readonly string _storePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory, "node_timings.json");
+    private static readonly TimeSpan SaveInterval = TimeSpan.FromSeconds(30);
+
+    // Workflow key -> class_type -> stats
+    private readonly Dictionary<string, Dictionary<string, NodeTimingStats>> _workflows;
+    // class_type -> stats over every workflow, used when a workflow has no data for a node yet
+    private readonly Dictionary<string, NodeTimingStats> _allWorkflows = new();
+    private readonly ConditionalWeakTable<string, List<(string ClassType, int Steps)>> _profiles = new();
+    private readonly object _lock = new();
+    private DateTime _lastSave = DateTime.MinValue;
+
+    private NodeTimingService()
+    {
+        _workflows = Load();
+        foreach (var workflow in _workflows.Values)
+        {
+            foreach (var (classType, stats) in workflow)
+            {
+                Merge(GetOrAdd(_allWorkflows, classType), stats);
+            }
+        }
+    }
+
+    /// <summary>
+    /// Starts recording the node timings of a submitted prompt. Feed the prompt's WebSocket events to the recorder.
+    /// </summary>
+    public PromptTimingRecorder CreateRecorder(string workflowKey, JObject prompt)
+    {
+        var classTypes = new Dictionary<string, string>();
+        foreach (var node in prompt.Properties())
+        {
+            var classType = node.Value["class_type"]?.ToString();
+            if (!string.IsNullOrEmpty(classType))
+            {
+                classTypes[node.Name] = classType;
+            }
+        }
+        return new PromptTimingRecorder(this, workflowKey ?? string.Empty, classTypes);
+    }
+
+    /// <summary>
+    /// Predicts how long a prompt will take from the recorded timings of its nodes.
+    /// Node lists are parsed once per JSON string instance, so calling this repeatedly for queued tasks is cheap.
+    /// </summary>
+    /// <returns>The predicted duration in seconds, or null if none of the prompt's nodes has been timed yet.</returns>
+    public double? PredictSeconds(string workflowKey, string apiJson)
+    {
+        if (string.IsNullOrEmpty(apiJson)) return null;
+
+        var profile = _profiles.GetValue(apiJson, ParseProfile);
+        double total = 0;
+        bool anyKnown = false;
+
+        lock (_lock)
+        {
+            _workflows.TryGetValue(workflowKey ?? string.Empty, out var workflow);
+            foreach (var (classType, steps) in profile)
+            {
+                NodeTimingStats stats = null;
+                if (workflow == null || !workflow.TryGetValue(classType, out stats) || stats.Executions == 0)
+                {
+                    _allWorkflows.TryGetValue(classType, out stats);
+                }
+                if (stats == null || stats.Executions == 0) continue;
+
+                anyKnown = true;
+                var seconds = steps > 0 && stats.SecondsPerStep > 0 ? steps * stats.SecondsPerStep : stats.MeanSeconds;
+                total += seconds * stats.ExecutionRatio;
+            }
+        }
+        return anyKnown ? total : null;
+    }
+
+    /// <summary>
+    /// Returns the mean execution time of a node class_type in a workflow (or in any workflow), or null if it was never timed.
+    /// </summary>
+    public double? GetMeanSeconds(string workflowKey, string classType)
+    {
+        lock (_lock)
+        {
+            NodeTimingStats stats = null;
+            if (!_workflows.TryGetValue(workflowKey ?? string.Empty, out var workflow) || !workflow.TryGetValue(classType, out stats) || stats.Executions == 0)
+            {
+                _allWorkflows.TryGetValue(classType, out stats);
+            }
+            return stats != null && stats.Executions > 0 ? stats.MeanSeconds : null;
+        }
+    }
+
+    /// <summary>
+    /// Writes the collected timings to a file, as CSV or as JSON lines if the extension is .jsonl/.ndjson.
+    /// Rows are sorted by total time, slowest first.
+    /// </summary>
+    public void Export(string path)
+    {
+        List<(string Workflow, string ClassType, NodeTimingStats Stats)> rows;
+        lock (_lock)
+        {
+            rows = _workflows
+                .SelectMany(w => w.Value.Select(n => (w.Key, n.Key, n.Value)))
+                .OrderByDescending(r => r.Item3.TotalSeconds)
+                .ToList();
+        }
+
+        var extension = Path.GetExtension(path).ToLowerInvariant();
+        var sb = new StringBuilder();
+        if (extension == ".jsonl" || extension == ".ndjson")
+        {
+            foreach (var (workflow, classType, stats) in rows)
+            {
+                var row = new JObject
+                {
+                    ["workflow"] = workflow,
+                    ["class_type"] = classType,
+                    ["executions"] = stats.Executions,
+                    ["cached_runs"] = stats.CachedRuns,
+                    ["total_seconds"] = Math.Round(stats.TotalSeconds, 3),
+                    ["mean_seconds"] = Math.Round(stats.MeanSeconds, 3),
+                    ["max_seconds"] = Math.Round(stats.MaxSeconds, 3),
+                    ["last_seconds"] = Math.Round(stats.LastSeconds, 3),
+                    ["seconds_per_step"] = Math.Round(stats.SecondsPerStep, 4)
+                };
+                sb.AppendLine(row.ToString(Formatting.None));
+            }
+        }
+        else
+        {
+            sb.AppendLine("workflow,class_type,executions,cached_runs,total_seconds,mean_seconds,max_seconds,last_seconds,seconds_per_step");
+            foreach (var (workflow, classType, stats) in rows)
+            {
+                sb.AppendLine(string.Join(",",
+                    CsvEscape(workflow), CsvEscape(classType),
+                    stats.Executions.ToString(CultureInfo.InvariantCulture),
+                    stats.CachedRuns.ToString(CultureInfo.InvariantCulture),
+                    stats.TotalSeconds.ToString("0.###", CultureInfo.InvariantCulture),
+                    stats.MeanSeconds.ToString("0.###", CultureInfo.InvariantCulture),
+                    stats.MaxSeconds.ToString("0.###", CultureInfo.InvariantCulture),
+                    stats.LastSeconds.ToString("0.###", CultureInfo.InvariantCulture),
+                    stats.SecondsPerStep.ToString("0.####", CultureInfo.InvariantCulture)));
+            }
+        }
+        File.WriteAllText(path, sb.ToString());
+    }
+
+    /// <summary>
+    /// Saves the timings to disk. Called on application shutdown; completed prompts also save periodically.
+    /// </summary>
+    public void Save()
+    {
+        string json;
+        lock (_lock)
+        {
+            json = JsonConvert.SerializeObject(_workflows, Formatting.Indented);
+            _lastSave = DateTime.UtcNow;
+        }
+        try
+        {
+            File.WriteAllText(_storePath, json);
+        }
+        catch (Exception ex)
+        {
+            Logger.Log(ex, "Failed to save node timings");
+        }
+    }
+
+    internal void RecordExecution(string workflowKey, string classType, double seconds, int steps)
+    {
+        lock (_lock)
+        {
+            foreach (var stats in new[] { GetOrAdd(GetOrAdd(_workflows, workflowKey), classType), GetOrAdd(_allWorkflows, classType) })
+            {
+                stats.Executions++;
+                stats.TotalSeconds += seconds;
+                stats.MaxSeconds = Math.Max(stats.MaxSeconds, seconds);
+                stats.LastSeconds = seconds;
+                if (steps > 0)
+                {
+                    stats.TotalSteps += steps;
+                    stats.SteppedSeconds += seconds;
+                }
+            }
+        }
+    }
+
+    internal void RecordCached(string workflowKey, string classType)
+    {
+        lock (_lock)
+        {
+            GetOrAdd(GetOrAdd(_workflows, workflowKey), classType).CachedRuns++;
+            GetOrAdd(_allWorkflows, classType).CachedRuns++;
+        }
+    }
+
+    internal void PromptFinished()
+    {
+        bool saveDue;
+        lock (_lock)
+        {
+            saveDue = DateTime.UtcNow - _lastSave >= SaveInterval;
+            if (saveDue) _lastSave = DateTime.UtcNow;
+        }
+        if (saveDue)
+        {
+            Task.Run(Save);
+        }
+    }
+
+    private static List<(string ClassType, int Steps)> ParseProfile(string apiJson)
+    {
+        var profile = new List<(string ClassType, int Steps)>();
+        try
+        {
+            foreach (var node in JObject.Parse(apiJson).Properties())
+            {
+                var classType = node.Value["class_type"]?.ToString();
+                if (string.IsNullOrEmpty(classType)) continue;
+
+                // Sampler nodes scale with their step count; links ([node, slot]) to other nodes are not numbers.
+                var stepsToken = node.Value["inputs"]?["steps"];
+                var steps = stepsToken?.Type == JTokenType.Integer ? stepsToken.Value<int>() : 0;
+                profile.Add((classType, steps));
+            }
+        }
+        catch (JsonException)
+        {
+            // Not a valid prompt; nothing to predict from.
+        }
+        return profile;
+    }
+
+    private static Dictionary<string, Dictionary<string, NodeTimingStats>> Load()
+    {
+        try
+        {
+            if (File.Exists(_storePath))
+            {
+                return JsonConvert.DeserializeObject<Dictionary<string, Dictionary<string, NodeTimingStats>>>(File.ReadAllText(_storePath))
+                       ?? new Dictionary<string, Dictionary<string, NodeTimingStats>>();
+            }
+        }
+        catch (Exception ex)
+        {
+            Logger.Log(ex, "Failed to load node timings");
+        }
+        return new Dictionary<string, Dictionary<string, NodeTimingStats>>();
+    }
+
+    private static TValue GetOrAdd<TValue>(Dictionary<string, TValue> dictionary, string key) where TValue : new()
+    {
+        if (!dictionary.TryGetValue(key, out var value))
+        {
+            value = new TValue();
+            dictionary[key] = value;
+        }
+        return value;
+    }
+
+    private static void Merge(NodeTimingStats target, NodeTimingStats source)
+    {
+        target.Executions += source.Executions;
+        target.CachedRuns += source.CachedRuns;
+        target.TotalSeconds += source.TotalSeconds;
+        target.MaxSeconds = Math.Max(target.MaxSeconds, source.MaxSeconds);
+        target.LastSeconds = source.LastSeconds;
+        target.TotalSteps += source.TotalSteps;
+        target.SteppedSeconds += source.SteppedSeconds;
+    }
+
+    private static string CsvEscape(string value)
+    {
+        if (value.IndexOfAny(new[] { ',', '"', '\n', '\r' }) < 0) return value;
+        return $"\"{value.Replace("\"", "\"\"")}\"";
+    }
+}
+
+/// <summary>
+/// Turns the WebSocket events of one prompt into node timings. A node runs from its "executing" event until the
+/// next "executing" event of the prompt; nodes listed in "execution_cached" are counted as cache hits.
+/// Not thread-safe: feed it from the single reader of the prompt's events.
+/// </summary>
+public sealed class PromptTimingRecorder
+{
+    private readonly NodeTimingService _service;
+    private readonly string _workflowKey;
+    private readonly Dictionary<string, string> _classTypes;
+    private long _startedAt;
+    private string _currentNode;
+    private long _currentNodeStartedAt;
+    private int _currentNodeSteps;
+    private bool _finished;
+
+    internal PromptTimingRecorder(NodeTimingService service, string workflowKey, Dictionary<string, string> classTypes)
+    {
+        _service = service;
+        _workflowKey = workflowKey;
+        _classTypes = classTypes;
+    }
+
+    /// <summary>
+    /// Time since the server started executing the prompt, or null if it has not started yet.
+    /// </summary>
+    public TimeSpan? Elapsed
+    {
+        get
+        {
+            var startedAt = Volatile.Read(ref _startedAt);
+            return startedAt == 0 ? null : Stopwatch.GetElapsedTime(startedAt);
+        }
+    }
+
+    public void OnEvent(JObject message)
+    {
+        if (_finished || message["data"] is not JObject data) return;
+
+        switch (message["type"]?.ToString())
+        {
+            case "execution_start":
+                MarkStarted();
+                break;
+
+            case "execution_cached":
+                MarkStarted();
+                if (data["nodes"] is JArray nodes)
+                {
+                    foreach (var node in nodes)
+                    {
+                        if (_classTypes.TryGetValue(node.ToString(), out var classType))
+                        {
+                            _service.RecordCached(_workflowKey, classType);
+                        }
+                    }
+                }
+                break;
+
+            case "executing":
+                MarkStarted();
+                FinishCurrentNode();
+                var nodeId = data["node"]?.ToString();
+                if (string.IsNullOrEmpty(nodeId))
+                {
+                    Finish();
+                }
+                else
+                {
+                    _currentNode = nodeId;
+                    _currentNodeStartedAt = Stopwatch.GetTimestamp();
+                    _currentNodeSteps = 0;
+                }
+                break;
+
+            case "progress":
+                if (data["node"]?.ToString() == _currentNode)
+                {
+                    _currentNodeSteps = data["max"]?.Value<int>() ?? 0;
+                }
+                break;
+
+            case "execution_success":
+                FinishCurrentNode();
+                Finish();
+                break;
+
+            case "execution_error":
+            case "execution_interrupted":
+                // The node that was running did not complete; its time says nothing about its normal duration.
+                _currentNode = null;
+                Finish();
+                break;
+        }
+    }
+
+    private void MarkStarted()
+    {
+        if (_startedAt == 0)
+        {
+            Volatile.Write(ref _startedAt, Stopwatch.GetTimestamp());
+        }
+    }
+
+    private void FinishCurrentNode()
+    {
+        if (_currentNode == null) return;
+
+        if (_classTypes.TryGetValue(_currentNode, out var classType))
+        {
+            var seconds = Stopwatch.GetElapsedTime(_currentNodeStartedAt).TotalSeconds;
+            _service.RecordExecution(_workflowKey, classType, seconds, _currentNodeSteps);
+        }
+        _currentNode = null;
+    }
+
+    private void Finish()
+    {
+        _finished = true;
+        _service.PromptFinished();
+    }
+}
@@ -0,0 +1,146 @@
+using System;
+using System.IO;
+using System.IO.Hashing;
+using System.Threading;
+
+namespace Comfizen;
+
+/// <summary>
+/// Content-addressed store of gallery output payloads on local disk, so that a session's outputs are not all held in
+/// memory. A payload is stored once under the XXH3-128 of its content, sharded into 256 directories by the first
+/// byte of the hash, and identified by that hash. Each process has its own session directory, deleted on close;
+/// directories left behind by sessions that did not close cleanly are deleted by the next session.
+/// </summary>
+public sealed class OutputBlobStore
+{
+    private static readonly Lazy<OutputBlobStore> _instance = new(() => new OutputBlobStore());
+    public static OutputBlobStore Instance => _instance.Value;
+
+    private const string LockFileName = "session.lock";
+
+    /// <summary>
+    /// The directory that holds the session directories.
+    /// </summary>
+    public static string RootDirectory { get; } = Path.Combine(Path.GetTempPath(), "Comfizen", "blobs");
+
+    private readonly string _sessionDirectory;
+    // Held open for the whole session: another session can only delete this directory after the lock file.
+    private FileStream _sessionLock;
+
+    private OutputBlobStore()
+    {
+        DeleteAbandonedSessions();
+        _sessionDirectory = Path.Combine(RootDirectory, $"{Environment.ProcessId}-{Guid.NewGuid():N}");
+        Directory.CreateDirectory(_sessionDirectory);
+        _sessionLock = new FileStream(Path.Combine(_sessionDirectory, LockFileName), FileMode.Create, FileAccess.ReadWrite, FileShare.None, 1, FileOptions.DeleteOnClose);
+    }
+
+    /// <summary>
+    /// Stores the payload, if it is not there yet, and returns its id; null if it could not be written.
+    /// </summary>
+    public string TryPut(byte[] data)
+    {
+        var id = Convert.ToHexString(XxHash128.Hash(data)).ToLowerInvariant();
+        var path = GetPath(id);
+        if (File.Exists(path)) return id;
+
+        try
+        {
+            Directory.CreateDirectory(Path.GetDirectoryName(path));
+            // Written under a temporary name so that a reader never sees a truncated file behind a valid hash.
+            var tempPath = $"{path}.{Guid.NewGuid():N}.tmp";
+            File.WriteAllBytes(tempPath, data);
+            try
+            {
+                File.Move(tempPath, path);
+            }
+            catch (IOException)
+            {
+                File.Delete(tempPath); // Stored concurrently by another task
+            }
+            return id;
+        }
+        catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+        {
+            Logger.Log(ex, "Failed to write an output to the blob store; it is kept in memory");
+            return null;
+        }
+    }
+
+    /// <summary>
+    /// Reads a stored payload, or returns null if it is not in the store.
+    /// </summary>
+    public byte[] Read(string id)
+    {
+        try
+        {
+            return File.ReadAllBytes(GetPath(id));
+        }
+        catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+        {
+            Logger.Log(ex, $"Failed to read output {id} from the blob store");
+            return null;
+        }
+    }
+
+    /// <summary>
+    /// Opens a stored payload for reading without loading it into memory, or returns null if it is not in the store.
+    /// </summary>
+    public Stream OpenRead(string id)
+    {
+        try
+        {
+            return new FileStream(GetPath(id), FileMode.Open, FileAccess.Read, FileShare.Read | FileShare.Delete, 81920, FileOptions.SequentialScan);
+        }
+        catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+        {
+            Logger.Log(ex, $"Failed to open output {id} in the blob store");
+            return null;
+        }
+    }
+
+    /// <summary>
+    /// The file that holds a stored payload, for consumers that read files themselves (e.g. the media server).
+    /// </summary>
+    public string GetPath(string id) => Path.Combine(_sessionDirectory, id.Substring(0, 2), id);
+
+    /// <summary>
+    /// Deletes this session's payloads. Outputs still in the gallery can no longer be read afterwards.
+    /// </summary>
+    public void DeleteSession()
+    {
+        var sessionLock = Interlocked.Exchange(ref _sessionLock, null);
+        if (sessionLock == null) return;
+        sessionLock.Dispose();
+        try
+        {
+            Directory.Delete(_sessionDirectory, true);
+        }
+        catch (Exception ex)
+        {
+            Logger.Log(ex, "Failed to delete the output blob store");
+        }
+    }
+
+    /// <summary>
+    /// Deletes the session directories whose lock file is not held by a running session.
+    /// </summary>
+    private static void DeleteAbandonedSessions()
+    {
+        if (!Directory.Exists(RootDirectory)) return;
+        foreach (var directory in Directory.EnumerateDirectories(RootDirectory))
+        {
+            try
+            {
+                // Fails while the owning session is running, before anything of it has been deleted.
+                var lockPath = Path.Combine(directory, LockFileName);
+                if (File.Exists(lockPath)) File.Delete(lockPath);
+                Directory.Delete(directory, true);
+            }
+            catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+            {
+                // In use by another instance of the application
+            }
+        }
+    }
+}
@@ -0,0 +1,218 @@
+using System;
+using System.Collections.Generic;
+using System.Linq;
+using System.Security.Cryptography;
+using System.Text;
+using Newtonsoft.Json;
+using Newtonsoft.Json.Linq;
+
+namespace Comfizen;
+
+/// <summary>
+/// The order in which a batch of prompts should be queued and how much of it ComfyUI is expected to serve from its cache.
+/// </summary>
+public sealed class PromptCachePlan
+{
+    /// <summary>
+    /// Indices into the original batch, in the order the prompts should be queued.
+    /// </summary>
+    public IReadOnlyList<int> Order { get; init; }
+
+    /// <summary>
+    /// The predicted share of node executions served from the cache, in <see cref="Order"/> and in the original order.
+    /// </summary>
+    public double CachedRatio { get; init; }
+    public double OriginalCachedRatio { get; init; }
+}
+
+/// <summary>
+/// Orders a batch of API prompts so that consecutive prompts share as much of their graph as possible.
+/// ComfyUI reuses a node's cached output only when the node and everything upstream of it are unchanged
+/// since the previous prompt, so e.g. a checkpoint axis should be the outer loop of an XY grid.
+/// </summary>
+public static class PromptCacheOrdering
+{
+    // The greedy search compares about n²/2 pairs; beyond this it takes too long and the batch keeps its order.
+    private const int MaxOptimizedBatchSize = 512;
+
+    /// <summary>
+    /// Predicts the cached-node ratio of a batch and, if <paramref name="optimize"/> is set, finds a better order.
+    /// The first prompt always stays first.
+    /// </summary>
+    /// <param name="nodeCost">The relative cost of executing a node of the given class_type, e.g. its mean execution time.</param>
+    public static PromptCachePlan Plan(IReadOnlyList<JObject> prompts, Func<string, double> nodeCost, bool optimize)
+    {
+        var graphs = prompts.Select(p => new PromptGraph(p, nodeCost)).ToList();
+        var originalOrder = Enumerable.Range(0, graphs.Count).ToList();
+        // One buffer for the invalidated flags of every comparison, sized for the largest prompt.
+        var scratch = new bool[graphs.Count == 0 ? 0 : graphs.Max(g => g.Count)];
+        var originalRatio = GetCachedRatio(graphs, originalOrder, scratch);
+
+        if (!optimize || graphs.Count < 3 || graphs.Count > MaxOptimizedBatchSize)
+        {
+            return new PromptCachePlan { Order = originalOrder, CachedRatio = originalRatio, OriginalCachedRatio = originalRatio };
+        }
+
+        // Greedy nearest neighbour: always queue the prompt that is cheapest to run after the current one.
+        // Ties keep the original order, so batches without any reuse are left as they are.
+        var order = new List<int> { 0 };
+        var remaining = new List<int>(originalOrder.Skip(1));
+        while (remaining.Count > 0)
+        {
+            var current = graphs[order[^1]];
+            int best = 0;
+            double bestCost = double.MaxValue;
+            for (int i = 0; i < remaining.Count; i++)
+            {
+                var cost = GetTransitionCost(current, graphs[remaining[i]], scratch);
+                if (cost < bestCost)
+                {
+                    bestCost = cost;
+                    best = i;
+                }
+            }
+            order.Add(remaining[best]);
+            remaining.RemoveAt(best);
+        }
+
+        if (GetTotalCost(graphs, order, scratch) >= GetTotalCost(graphs, originalOrder, scratch))
+        {
+            return new PromptCachePlan { Order = originalOrder, CachedRatio = originalRatio, OriginalCachedRatio = originalRatio };
+        }
+        return new PromptCachePlan { Order = order, CachedRatio = GetCachedRatio(graphs, order, scratch), OriginalCachedRatio = originalRatio };
+    }
+
+    private static double GetTotalCost(List<PromptGraph> graphs, List<int> order, bool[] scratch)
+    {
+        double total = 0;
+        for (int i = 1; i < order.Count; i++)
+        {
+            total += GetTransitionCost(graphs[order[i - 1]], graphs[order[i]], scratch);
+        }
+        return total;
+    }
+
+    private static double GetCachedRatio(List<PromptGraph> graphs, List<int> order, bool[] scratch)
+    {
+        // The first prompt is assumed to run completely.
+        int total = graphs[order[0]].Count;
+        int cached = 0;
+        for (int i = 1; i < order.Count; i++)
+        {
+            var next = graphs[order[i]];
+            GetInvalidated(graphs[order[i - 1]], next, scratch);
+            total += next.Count;
+            for (int n = 0; n < next.Count; n++)
+            {
+                if (!scratch[n]) cached++;
+            }
+        }
+        return total > 0 ? (double)cached / total : 0;
+    }
+
+    private static double GetTransitionCost(PromptGraph previous, PromptGraph next, bool[] scratch)
+    {
+        GetInvalidated(previous, next, scratch);
+        double cost = 0;
+        for (int i = 0; i < next.Count; i++)
+        {
+            if (scratch[i]) cost += next.Costs[i];
+        }
+        return cost;
+    }
+
+    /// <summary>
+    /// Marks the nodes of <paramref name="next"/> that have to execute again after <paramref name="previous"/>:
+    /// new nodes, nodes whose class or inputs changed, and everything downstream of them.
+    /// The flags are written to the first <c>next.Count</c> entries of <paramref name="invalidated"/>.
+    /// </summary>
+    private static void GetInvalidated(PromptGraph previous, PromptGraph next, bool[] invalidated)
+    {
+        Array.Clear(invalidated, 0, next.Count);
+        foreach (var i in next.TopologicalOrder)
+        {
+            if (!previous.IndexOf.TryGetValue(next.Ids[i], out var j) || previous.Signatures[j] != next.Signatures[i])
+            {
+                invalidated[i] = true;
+                continue;
+            }
+            foreach (var upstream in next.Upstream[i])
+            {
+                if (invalidated[upstream])
+                {
+                    invalidated[i] = true;
+                    break;
+                }
+            }
+        }
+    }
+
+    /// <summary>
+    /// A prompt reduced to what matters for caching: per node a signature of its class and inputs
+    /// (links included) and the nodes it depends on.
+    /// </summary>
+    private sealed class PromptGraph
+    {
+        public readonly string[] Ids;
+        public readonly Dictionary<string, int> IndexOf = new();
+        public readonly (long, long)[] Signatures;
+        public readonly double[] Costs;
+        public readonly int[][] Upstream;
+        public readonly List<int> TopologicalOrder = new();
+
+        public int Count => Ids.Length;
+
+        public PromptGraph(JObject prompt, Func<string, double> nodeCost)
+        {
+            var nodes = prompt.Properties().Where(p => p.Value is JObject).ToList();
+            Ids = nodes.Select(n => n.Name).ToArray();
+            Signatures = new (long, long)[Ids.Length];
+            Costs = new double[Ids.Length];
+            Upstream = new int[Ids.Length][];
+            for (int i = 0; i < Ids.Length; i++) IndexOf[Ids[i]] = i;
+
+            for (int i = 0; i < nodes.Count; i++)
+            {
+                var node = (JObject)nodes[i].Value;
+                var classType = node["class_type"]?.ToString() ?? string.Empty;
+                var inputs = node["inputs"] as JObject;
+                Signatures[i] = Hash(classType + "\n" + (inputs?.ToString(Formatting.None) ?? string.Empty));
+                Costs[i] = nodeCost(classType);
+
+                // Links are [node id, output index] arrays.
+                Upstream[i] = inputs == null ? Array.Empty<int>() : inputs.Properties()
+                    .Select(p => p.Value is JArray { Count: 2 } link ? link[0]?.ToString() : null)
+                    .Where(id => id != null && IndexOf.ContainsKey(id))
+                    .Select(id => IndexOf[id])
+                    .Distinct()
+                    .ToArray();
+            }
+
+            // Kahn's algorithm, so that a node is always visited after its inputs.
+            var pending = Upstream.Select(u => u.Length).ToArray();
+            var downstream = Enumerable.Range(0, Ids.Length).Select(_ => new List<int>()).ToArray();
+            for (int i = 0; i < Ids.Length; i++)
+            {
+                foreach (var u in Upstream[i]) downstream[u].Add(i);
+            }
+            var ready = new Queue<int>(Enumerable.Range(0, Ids.Length).Where(i => pending[i] == 0));
+            while (ready.Count > 0)
+            {
+                var i = ready.Dequeue();
+                TopologicalOrder.Add(i);
+                foreach (var d in downstream[i])
+                {
+                    if (--pending[d] == 0) ready.Enqueue(d);
+                }
+            }
+            // API prompts are acyclic; anything left over is still visited rather than silently treated as cached.
+            TopologicalOrder.AddRange(Enumerable.Range(0, Ids.Length).Where(i => pending[i] > 0));
+        }
+
+        private static (long, long) Hash(string text)
+        {
+            var hash = MD5.HashData(Encoding.UTF8.GetBytes(text));
+            return (BitConverter.ToInt64(hash, 0), BitConverter.ToInt64(hash, 8));
+        }
+    }
+}
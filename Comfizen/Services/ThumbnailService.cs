@@ -0,0 +1,277 @@
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Threading;
+using System.Threading.Tasks;
+using System.Windows;
+using System.Windows.Media;
+using System.Windows.Media.Imaging;
+
+namespace Comfizen;
+
+/// <summary>
+/// Gallery thumbnails, decoded at the size of the gallery tiles instead of at full resolution.
+/// Thumbnails are decoded by a small pool of background workers, visible tiles first, and cached in memory
+/// and on disk under the output's content hash and the thumbnail size, so a gallery that is shown again
+/// (also in a later session) is read from small files instead of decoding every full-size image.
+/// </summary>
+public sealed class ThumbnailService
+{
+    private static readonly Lazy<ThumbnailService> _instance = new(() => new ThumbnailService());
+    public static ThumbnailService Instance => _instance.Value;
+
+    // Thumbnails are decoded in steps of this many pixels, so that resizing the tiles does not decode everything again.
+    private const int SizeStep = 128;
+    private const int MaxSize = 2048;
+    private const long MemoryCacheBytes = 256L * 1024 * 1024;
+    private const long DiskCacheBytes = 512L * 1024 * 1024;
+
+    private static readonly string _cacheDirectory = Path.Combine(Directory.GetCurrentDirectory(), "thumbnails");
+
+    private readonly DecodedImageCache _memoryCache = new(MemoryCacheBytes);
+    // Requests waiting for a worker, taken from the front; visible tiles are moved there.
+    private readonly LinkedList<(ImageOutput Output, string Key, int Size)> _pending = new();
+    private readonly Dictionary<string, LinkedListNode<(ImageOutput Output, string Key, int Size)>> _pendingByKey = new();
+    // Thumbnails of images that cannot be decoded; they are not requested again.
+    private readonly HashSet<string> _failed = new();
+    private readonly object _lock = new();
+    private readonly SemaphoreSlim _pendingCount = new(0);
+    private int _pixelSize = SizeStep;
+    // The size of the disk cache as of the last trim plus the thumbnails written since; set while a trim runs.
+    private long _diskCacheSize;
+    private int _trimming = 1;
+
+    private ThumbnailService()
+    {
+        int workers = Math.Clamp(Environment.ProcessorCount / 2, 1, 4);
+        for (int i = 0; i < workers; i++)
+        {
+            Task.Run(WorkAsync);
+        }
+        Task.Run(TrimDiskCache);
+    }
+
+    public bool HasPending
+    {
+        get { lock (_lock) return _pending.Count > 0; }
+    }
+
+    /// <summary>
+    /// Sets the size of the gallery tiles in device-independent pixels. Returns true if thumbnails of a larger
+    /// size are needed from now on.
+    /// </summary>
+    public bool SetTileSize(double tileSize)
+    {
+        var dpiScale = Application.Current?.MainWindow != null ? VisualTreeHelper.GetDpi(Application.Current.MainWindow).DpiScaleX : 1.0;
+        int pixelSize = Math.Clamp((int)Math.Ceiling(tileSize * dpiScale / SizeStep) * SizeStep, SizeStep, MaxSize);
+        int previous = Interlocked.Exchange(ref _pixelSize, pixelSize);
+        return pixelSize > previous;
+    }
+
+    /// <summary>
+    /// Returns the output's thumbnail if it is in memory. Otherwise queues it to be loaded, calls
+    /// <see cref="ImageOutput.RefreshThumbnail"/> when it is ready, and returns a smaller cached thumbnail
+    /// or null in the meantime.
+    /// </summary>
+    public BitmapSource GetOrRequest(ImageOutput output)
+    {
+        var contentKey = output.BlobId ?? output.VisualHash;
+        int size = _pixelSize;
+        if (_memoryCache.TryGet(GetKey(contentKey, size), out var thumbnail)) return thumbnail;
+
+        Enqueue(output, contentKey, size);
+        for (int smaller = size - SizeStep; smaller >= SizeStep; smaller -= SizeStep)
+        {
+            if (_memoryCache.TryGet(GetKey(contentKey, smaller), out thumbnail)) return thumbnail;
+        }
+        return null;
+    }
+
+    /// <summary>
+    /// Moves the queued requests of the given outputs to the front of the queue, e.g. the tiles on screen.
+    /// </summary>
+    public void Prioritize(IEnumerable<ImageOutput> outputs)
+    {
+        var outputSet = outputs as ISet<ImageOutput> ?? outputs.ToHashSet();
+        lock (_lock)
+        {
+            var node = _pending.First;
+            while (node != null)
+            {
+                var next = node.Next;
+                if (outputSet.Contains(node.Value.Output))
+                {
+                    _pending.Remove(node);
+                    _pending.AddFirst(node);
+                }
+                node = next;
+            }
+        }
+    }
+
+    private void Enqueue(ImageOutput output, string contentKey, int size)
+    {
+        var key = GetKey(contentKey, size);
+        lock (_lock)
+        {
+            if (_pendingByKey.ContainsKey(key) || _failed.Contains(key)) return;
+            _pendingByKey[key] = _pending.AddLast((output, key, size));
+        }
+        _pendingCount.Release();
+    }
+
+    private async Task WorkAsync()
+    {
+        while (true)
+        {
+            await _pendingCount.WaitAsync().ConfigureAwait(false);
+            (ImageOutput Output, string Key, int Size) request;
+            lock (_lock)
+            {
+                request = _pending.First.Value;
+                _pending.RemoveFirst();
+            }
+
+            BitmapSource thumbnail = null;
+            bool undecodable = false;
+            try
+            {
+                // Requests for a size the gallery no longer shows are dropped; the tile asks again when it is refreshed.
+                if (request.Size == _pixelSize && !_memoryCache.TryGet(request.Key, out thumbnail))
+                {
+                    thumbnail = ReadFromDisk(request.Key) ?? Decode(request.Output, request.Key, request.Size);
+                    if (thumbnail != null) _memoryCache.Add(request.Key, thumbnail);
+                }
+            }
+            catch (Exception ex)
+            {
+                // Other failures, e.g. a file that is still being written, are retried when the tile asks again.
+                undecodable = ex is NotSupportedException or FileFormatException;
+                Logger.Log(ex, $"Failed to create the thumbnail of {request.Output.FileName}");
+            }
+
+            bool refresh = thumbnail != null || request.Size != _pixelSize;
+            lock (_lock)
+            {
+                _pendingByKey.Remove(request.Key);
+                if (undecodable) _failed.Add(request.Key);
+            }
+            if (refresh)
+            {
+                Application.Current?.Dispatcher.InvokeAsync(request.Output.RefreshThumbnail);
+            }
+        }
+    }
+
+    private static BitmapSource ReadFromDisk(string key)
+    {
+        var path = Path.Combine(_cacheDirectory, key + ".png");
+        if (!File.Exists(path)) return null;
+        try
+        {
+            var image = new BitmapImage();
+            image.BeginInit();
+            image.CacheOption = BitmapCacheOption.OnLoad;
+            image.CreateOptions = BitmapCreateOptions.IgnoreImageCache;
+            image.UriSource = new Uri(path);
+            image.EndInit();
+            image.Freeze();
+            // Marks the file as recently used for trimming.
+            File.SetLastWriteTimeUtc(path, DateTime.UtcNow);
+            return image;
+        }
+        catch (Exception ex) when (ex is IOException or NotSupportedException or UnauthorizedAccessException)
+        {
+            return null;
+        }
+    }
+
+    private BitmapSource Decode(ImageOutput output, string key, int size)
+    {
+        using var stream = output.OpenRead();
+        if (stream == null) return null;
+
+        // Only the header is read to find the longer side.
+        var frame = BitmapFrame.Create(stream, BitmapCreateOptions.DelayCreation, BitmapCacheOption.None);
+        int width = frame.PixelWidth, height = frame.PixelHeight;
+        stream.Position = 0;
+
+        // The decoder scales while decoding, so the full-size image is never held in memory.
+        var image = new BitmapImage();
+        image.BeginInit();
+        image.CacheOption = BitmapCacheOption.OnLoad;
+        image.StreamSource = stream;
+        if (width >= height) image.DecodePixelWidth = Math.Min(size, width);
+        else image.DecodePixelHeight = Math.Min(size, height);
+        image.EndInit();
+        image.Freeze();
+
+        WriteToDisk(key, image);
+        return image;
+    }
+
+    private void WriteToDisk(string key, BitmapSource thumbnail)
+    {
+        var path = Path.Combine(_cacheDirectory, key + ".png");
+        var tempPath = $"{path}.{Guid.NewGuid():N}.tmp";
+        try
+        {
+            Directory.CreateDirectory(_cacheDirectory);
+            var encoder = new PngBitmapEncoder();
+            encoder.Frames.Add(BitmapFrame.Create(thumbnail));
+            long length;
+            using (var file = File.Create(tempPath))
+            {
+                encoder.Save(file);
+                length = file.Length;
+            }
+            File.Move(tempPath, path, true);
+
+            if (Interlocked.Add(ref _diskCacheSize, length) > DiskCacheBytes && Interlocked.Exchange(ref _trimming, 1) == 0)
+            {
+                Task.Run(TrimDiskCache);
+            }
+        }
+        catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+        {
+            try { File.Delete(tempPath); } catch { /* Best effort */ }
+        }
+    }
+
+    /// <summary>
+    /// Deletes the least recently used thumbnails until the disk cache is down to three quarters of its limit, so that
+    /// it is not trimmed again after every thumbnail. Runs at start and whenever the cache grows over its limit.
+    /// </summary>
+    private void TrimDiskCache()
+    {
+        // Thumbnails written while the directory is listed may be counted twice, which only brings the next trim forward.
+        long counted = Interlocked.Read(ref _diskCacheSize);
+        long total = 0;
+        try
+        {
+            var directory = new DirectoryInfo(_cacheDirectory);
+            if (!directory.Exists) return;
+
+            var files = directory.GetFiles("*.png");
+            total = files.Sum(f => f.Length);
+            foreach (var file in files.OrderBy(f => f.LastWriteTimeUtc))
+            {
+                if (total <= DiskCacheBytes / 4 * 3) break;
+                file.Delete();
+                total -= file.Length;
+            }
+        }
+        catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+        {
+            Logger.Log(ex, "Failed to trim the thumbnail cache");
+        }
+        finally
+        {
+            Interlocked.Add(ref _diskCacheSize, total - counted);
+            Volatile.Write(ref _trimming, 0);
+        }
+    }
+
+    private static string GetKey(string contentKey, int size) => $"{contentKey}_{size}";
+}
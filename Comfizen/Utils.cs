@@ -226,20 +226,10 @@ namespace Comfizen
             }
         }
         
-        public static string ComputePixelHash(byte[] imageBytes)
-        {
-            try
-            {
-                using var image = Image.Load(imageBytes);
-                using var memoryStream = new MemoryStream();
-                image.SaveAsBmp(memoryStream);
-                return ComputeMd5Hash(memoryStream.ToArray());
-            }
-            catch (Exception)
-            {
-                return ComputeMd5Hash(imageBytes);
-            }
-        }
+        /// <summary>
+        /// The visual identity of an image, equal for files with the same pixels. See <see cref="PixelHash"/>.
+        /// </summary>
+        public static Task<string> ComputePixelHashAsync(byte[] imageBytes) => PixelHash.ComputeAsync(imageBytes);
 
         public static async Task<string> GetUniqueFilePathAsync(string desiredPath, byte[] newFileBytes)
         {
@@ -481,11 +471,11 @@ namespace Comfizen
             return -1;
         }
         
-        public static string ReplaceWildcards(string input, long seed)
+        public static string ReplaceWildcards(string input, long seed, string fieldPath = null)
         {
             if (string.IsNullOrEmpty(input)) return input;
 
-            var processor = new WildcardProcessor(seed);
+            var processor = new WildcardProcessor(seed, fieldPath);
             string result = processor.Process(input);
 
             // Log the processed prompt if it has changed
@@ -711,7 +701,8 @@ namespace Comfizen
             if (results == null || !results.Any()) return null;
             
             // --- Image Grid Specifics: Determine cell size from the first image ---
-            using var firstImage = Image.Load(results.First().ImageOutputs.First().ImageBytes);
+            // Decoded straight from the output store, without reading each file into an array first.
+            using var firstImage = LoadOutputImage(results.First().ImageOutputs.First());
             int cellWidth = firstImage.Width;
             int cellHeight = firstImage.Height;
 
@@ -739,7 +730,7 @@ namespace Comfizen
                 // If there's only one image, draw it, resized to fit the cell.
                 if (count == 1)
                 {
-                    using var img = Image.Load(result.ImageOutputs[0].ImageBytes);
+                    using var img = LoadOutputImage(result.ImageOutputs[0]);
                     // --- START OF CHANGE: Resize image to fit the calculated cell size ---
                     img.Mutate(x => x.Resize(new ResizeOptions 
                     { 
@@ -760,7 +751,7 @@ namespace Comfizen
                 
                 for (int i = 0; i < count; i++)
                 {
-                    using var img = Image.Load(result.ImageOutputs[i].ImageBytes);
+                    using var img = LoadOutputImage(result.ImageOutputs[i]);
                     img.Mutate(x => x.Resize(new ResizeOptions { Size = new Size(tileWidth, tileHeight), Mode = ResizeMode.Pad, PadColor = Color.Black }));
                     
                     int x = cellRect.X + (i % cols) * tileWidth;
@@ -778,6 +769,12 @@ namespace Comfizen
             return ms.ToArray();
         }
         
+        private static Image LoadOutputImage(ImageOutput output)
+        {
+            using var stream = output.OpenRead() ?? throw new FileNotFoundException($"The content of output '{output.FileName}' is missing.");
+            return Image.Load(stream);
+        }
+        
         public static async Task<byte[]> CreateVideoGridAsync(
             List<GridCellResult> results,
             string xAxisField, IReadOnlyList<string> xValues,
@@ -793,7 +790,7 @@ namespace Comfizen
                 var videoToProcess = result.ImageOutputs.FirstOrDefault(io => io.Type == FileType.Video);
                 if (videoToProcess != null)
                 {
-                    extractionTasks[result] = ExtractFramesAsync(videoToProcess.ImageBytes, frameCount);
+                    extractionTasks[result] = ExtractFramesAsync(videoToProcess.ReadContent(), frameCount);
                 }
             }
 
@@ -120,7 +120,7 @@ namespace Comfizen
                     success = await _comfyuiModel.SaveVideoFileAsync(
                         _settings.SavedImagesDirectory, 
                         fileIdentifier,
-                        CurrentFullScreenImage.ImageBytes,
+                        CurrentFullScreenImage.ReadContent(),
                         promptToSave
                     );
                 }
@@ -129,7 +129,7 @@ namespace Comfizen
                     success = await _comfyuiModel.SaveImageFileAsync(
                         _settings.SavedImagesDirectory,
                         fileIdentifier,
-                        CurrentFullScreenImage.ImageBytes,
+                        CurrentFullScreenImage.ReadContent(),
                         promptToSave,
                         _settings
                     );
@@ -183,12 +183,14 @@ namespace Comfizen
         }
         private void CopyCurrentImageToClipboard(object obj)
         {
-            if (CurrentFullScreenImage?.ImageBytes == null) return;
+            if (CurrentFullScreenImage?.HasContent != true) return;
 
             try
             {
-                using (var ms = new System.IO.MemoryStream(CurrentFullScreenImage.ImageBytes))
+                using (var ms = CurrentFullScreenImage.OpenRead())
                 {
+                    if (ms == null) return;
+
                     var bitmap = new System.Windows.Media.Imaging.BitmapImage();
                     bitmap.BeginInit();
                     bitmap.StreamSource = ms;
@@ -2,6 +2,7 @@
 using System.Collections;
 using System.Collections.Generic;
 using System.Collections.ObjectModel;
+using System.Collections.Specialized;
 using System.ComponentModel;
 using System.Diagnostics;
 using System.IO;
@@ -27,7 +28,7 @@ namespace Comfizen
         private readonly ComfyuiModel _comfyuiModel;
         public AppSettings Settings { get; set; }
             
-        public ObservableCollection<ImageOutput> ImageOutputs { get; set; } = new();
+        public GalleryCollection ImageOutputs { get; set; } = new();
         public ObservableCollection<ImageOutput> FilteredImageOutputs { get; set; } = new();
             
         public string SearchFilterText { get; set; }
@@ -38,8 +39,22 @@ namespace Comfizen
         public double SimilarityThreshold { get; set; } = 95.0;
         public bool IsSimilaritySortActive => SelectedSortOption == SortOption.Similarity;
         
+        // The perceptual hashes of the outputs, kept in step with ImageOutputs, for the similarity grouping.
+        private readonly PerceptualHashIndex<ImageOutput> _similarityIndex = new();
+        private readonly Dictionary<ImageOutput, ulong> _indexedHashes = new();
+        
         public ImageOutput SelectedGalleryImage { get; set; }
         public double GalleryThumbnailSize { get; set; } = 128.0;
+        
+        private void OnGalleryThumbnailSizeChanged()
+        {
+            // Tiles that grew past their thumbnail ask for a larger one.
+            if (!ThumbnailService.Instance.SetTileSize(GalleryThumbnailSize)) return;
+            foreach (var output in ImageOutputs)
+            {
+                output.RefreshThumbnail();
+            }
+        }
             
         public int SelectedItemsCount { get; set; }
         public bool IsAnyVideoSelected { get; private set; }
@@ -74,7 +89,11 @@ namespace Comfizen
         {
             _comfyuiModel = comfyuiModel;
             Settings = settings;
-            ImageOutputs.CollectionChanged += (s, e) => UpdateFilteredOutputs();
+            ImageOutputs.CollectionChanged += (s, e) =>
+            {
+                UpdateSimilarityIndex(e);
+                UpdateFilteredOutputs();
+            };
                 
             this.PropertyChanged += OnFilterChanged;
 
@@ -82,11 +101,7 @@ namespace Comfizen
                 x =>
                 {
                     // Create a copy of the filtered list to avoid modification during enumeration
-                    var itemsToClear = FilteredImageOutputs.ToList();
-                    foreach (var item in itemsToClear)
-                    {
-                        ImageOutputs.Remove(item);
-                    }
+                    ImageOutputs.RemoveRange(FilteredImageOutputs.ToList());
                 },
                 // The command can only be executed if there are items visible in the gallery
                 x => FilteredImageOutputs.Any()
@@ -117,10 +132,7 @@ namespace Comfizen
 
                 if (!proceed) return;
 
-                foreach (var image in itemsToDelete)
-                {
-                    ImageOutputs.Remove(image);
-                }
+                ImageOutputs.RemoveRange(itemsToDelete);
             });
             
             SaveSelectedImagesCommand = new AsyncRelayCommand(async param =>
@@ -362,7 +374,7 @@ namespace Comfizen
                     success = await _comfyuiModel.SaveVideoFileAsync(
                         targetDirectory,
                         image.FilePath ?? image.FileName,
-                        image.ImageBytes,
+                        image.ReadContent(),
                         promptToSave
                     );
                 }
@@ -371,7 +383,7 @@ namespace Comfizen
                     success = await _comfyuiModel.SaveImageFileAsync(
                         targetDirectory,
                         image.FilePath ?? image.FileName,
-                        image.ImageBytes,
+                        image.ReadContent(),
                         promptToSave,
                         Settings,
                         formatOverride
@@ -402,6 +414,49 @@ namespace Comfizen
             }
         }
 
+        private void UpdateSimilarityIndex(NotifyCollectionChangedEventArgs e)
+        {
+            if (e.Action == NotifyCollectionChangedAction.Reset)
+            {
+                _similarityIndex.Clear();
+                _indexedHashes.Clear();
+                return;
+            }
+            if (e.OldItems == null || e.Action == NotifyCollectionChangedAction.Move) return;
+
+            foreach (ImageOutput item in e.OldItems)
+            {
+                if (_indexedHashes.Remove(item, out var hash))
+                {
+                    _similarityIndex.Remove(hash, item);
+                }
+            }
+        }
+
+        /// <summary>
+        /// Adds an output to the similarity index once its perceptual hash is known.
+        /// </summary>
+        private void IndexForSimilarity(ImageOutput item)
+        {
+            if (_indexedHashes.TryGetValue(item, out var indexedHash))
+            {
+                if (indexedHash == item.PerceptualHash) return;
+                _similarityIndex.Remove(indexedHash, item);
+            }
+            _indexedHashes[item] = item.PerceptualHash;
+            _similarityIndex.Add(item.PerceptualHash, item);
+        }
+
+        /// <summary>
+        /// The largest Hamming distance between two 64-bit hashes whose similarity still reaches the threshold.
+        /// </summary>
+        private static int GetMaxHammingDistance(double similarityThreshold)
+        {
+            int maxDistance = -1;
+            while (maxDistance < 64 && (64 - (maxDistance + 1)) / 64.0 * 100.0 >= similarityThreshold) maxDistance++;
+            return maxDistance;
+        }
+
         private async void UpdateFilteredOutputs()
         {
             var filteredQuery = ImageOutputs.AsEnumerable();
@@ -441,6 +496,15 @@ namespace Comfizen
                     .OrderByDescending(io => io.CreatedAt) // Initial sort for stable group creation
                     .ToList();
 
+                // Position in the date order; the index also holds outputs that the filters hide.
+                var positions = new Dictionary<ImageOutput, int>(allItemsWithHash.Count);
+                foreach (var item in allItemsWithHash)
+                {
+                    IndexForSimilarity(item);
+                    positions.TryAdd(item, positions.Count);
+                }
+                int maxDistance = GetMaxHammingDistance(SimilarityThreshold);
+
                 var processedImages = new HashSet<ImageOutput>();
                 var similarityGroups = new List<List<ImageOutput>>();
                 
@@ -449,15 +513,11 @@ namespace Comfizen
                 {
                     if (processedImages.Contains(item)) continue;
 
-                    var group = allItemsWithHash
-                        .Where(other => !processedImages.Contains(other))
-                        .Select(other => new {
-                            Image = other,
-                            Similarity = (64 - Utils.CalculateHammingDistance(item.PerceptualHash, other.PerceptualHash)) / 64.0 * 100.0
-                        })
-                        .Where(i => i.Similarity >= SimilarityThreshold)
-                        .OrderByDescending(i => i.Image.CreatedAt) // Sort items within a group by date
-                        .Select(i => i.Image)
+                    // Only the outputs within the threshold are visited, instead of comparing with every other output.
+                    var group = _similarityIndex.FindWithin(item.PerceptualHash, maxDistance)
+                        .Where(other => positions.ContainsKey(other) && !processedImages.Contains(other))
+                        .Distinct()
+                        .OrderBy(other => positions[other]) // Sort items within a group by date
                         .ToList();
 
                     if (group.Count > 1)
@@ -500,6 +560,8 @@ namespace Comfizen
             for (int i = 0; i < newFilteredList.Count; i++)
             {
                 var item = newFilteredList[i];
+                // Usually only a new output was inserted in front and the rest is already in place.
+                if (i < FilteredImageOutputs.Count && ReferenceEquals(FilteredImageOutputs[i], item)) continue;
                 var currentIndex = FilteredImageOutputs.IndexOf(item);
 
                 if (currentIndex == -1)
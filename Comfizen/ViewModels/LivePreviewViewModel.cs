@@ -0,0 +1,149 @@
+﻿using System;
+using System.Buffers;
+using System.ComponentModel;
+using System.IO;
+using System.Runtime.InteropServices;
+using System.Threading;
+using System.Threading.Tasks;
+using System.Windows;
+using System.Windows.Media;
+using System.Windows.Media.Imaging;
+using PropertyChanged;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// Shows the latent previews of the running prompt. Frames are decoded off the UI thread into a pooled
+    /// pixel buffer and copied into a single reused <see cref="WriteableBitmap"/>, so a fast sampler does not
+    /// allocate a new bitmap per step and the UI never has more than one frame to catch up on.
+    /// </summary>
+    [AddINotifyPropertyChangedInterface]
+    public class LivePreviewViewModel : INotifyPropertyChanged
+    {
+        private static readonly TimeSpan FrameInterval = TimeSpan.FromMilliseconds(100);
+
+        private byte[] _pixels = Array.Empty<byte>();
+        // A frame of the previous session may still be decoding when the next session's first frame arrives.
+        private readonly SemaphoreSlim _frameLock = new(1, 1);
+        private readonly object _sessionLock = new();
+        private ComfyuiSession _session;
+        private CancellationTokenSource _sessionCts;
+
+        public event PropertyChangedEventHandler PropertyChanged;
+
+        public WriteableBitmap Image { get; private set; }
+
+        /// <summary>
+        /// True while a preview of the running prompt is available.
+        /// </summary>
+        public bool HasPreview { get; private set; }
+
+        /// <summary>
+        /// Shows the previews of the given session (the server running the current prompt) from now on,
+        /// instead of those of the session followed before.
+        /// </summary>
+        public void Follow(ComfyuiSession session)
+        {
+            lock (_sessionLock)
+            {
+                if (_session == session) return;
+                _sessionCts?.Cancel();
+                _sessionCts = new CancellationTokenSource();
+                _session = session;
+                _ = RunAsync(session, _sessionCts.Token);
+            }
+        }
+
+        /// <summary>
+        /// Stops receiving previews and hides the current one.
+        /// </summary>
+        public void Stop()
+        {
+            lock (_sessionLock)
+            {
+                _sessionCts?.Cancel();
+                _sessionCts = null;
+                _session = null;
+            }
+            Clear();
+        }
+
+        private async Task RunAsync(ComfyuiSession session, CancellationToken token)
+        {
+            using var previews = session.SubscribePreviews(FrameInterval);
+            try
+            {
+                await foreach (var frame in previews.ReadAllAsync(token))
+                {
+                    if (!MemoryMarshal.TryGetArray(frame.Data, out var encoded)) continue;
+
+                    await _frameLock.WaitAsync(token);
+                    try
+                    {
+                        int width, height;
+                        try
+                        {
+                            (width, height) = Decode(encoded);
+                        }
+                        catch (Exception ex) when (ex is NotSupportedException || ex is FileFormatException || ex is ArgumentException)
+                        {
+                            Logger.Log($"Skipped an undecodable latent preview ({frame.ImageFormat}): {ex.Message}", LogLevel.Debug);
+                            continue;
+                        }
+
+                        // A frame of a server that is no longer followed is not shown.
+                        if (token.IsCancellationRequested) break;
+                        await Application.Current.Dispatcher.InvokeAsync(() => Show(width, height));
+                    }
+                    finally
+                    {
+                        _frameLock.Release();
+                    }
+                }
+            }
+            catch (OperationCanceledException) when (token.IsCancellationRequested)
+            {
+                // Stopped by the queue or switched to another server
+            }
+        }
+
+        /// <summary>
+        /// Hides the current preview, e.g. when the next prompt starts.
+        /// </summary>
+        public void Clear()
+        {
+            Application.Current.Dispatcher.InvokeAsync(() => HasPreview = false);
+        }
+
+        private (int Width, int Height) Decode(ArraySegment<byte> encoded)
+        {
+            using var ms = new MemoryStream(encoded.Array!, encoded.Offset, encoded.Count, false);
+            var decoder = BitmapDecoder.Create(ms, BitmapCreateOptions.PreservePixelFormat, BitmapCacheOption.OnLoad);
+            BitmapSource source = decoder.Frames[0];
+            if (source.Format != PixelFormats.Bgra32)
+            {
+                source = new FormatConvertedBitmap(source, PixelFormats.Bgra32, null, 0);
+            }
+
+            int stride = source.PixelWidth * 4;
+            int size = stride * source.PixelHeight;
+            if (_pixels.Length < size)
+            {
+                if (_pixels.Length > 0) ArrayPool<byte>.Shared.Return(_pixels);
+                _pixels = ArrayPool<byte>.Shared.Rent(size);
+            }
+            source.CopyPixels(_pixels, stride, 0);
+            return (source.PixelWidth, source.PixelHeight);
+        }
+
+        private void Show(int width, int height)
+        {
+            if (Image == null || Image.PixelWidth != width || Image.PixelHeight != height)
+            {
+                Image = new WriteableBitmap(width, height, 96, 96, PixelFormats.Bgra32, null);
+            }
+            Image.WritePixels(new Int32Rect(0, 0, width, height), _pixels, width * 4, 0);
+            HasPreview = true;
+        }
+    }
+}
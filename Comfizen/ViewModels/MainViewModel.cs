@@ -5,6 +5,8 @@ using System.Collections.ObjectModel;
 using System.ComponentModel;
 using System.IO;
 using System.Linq;
+using System.Net.Http;
+using System.Net.WebSockets;
 using System.Windows;
 using System.Windows.Input;
 using Newtonsoft.Json;
@@ -13,6 +15,7 @@ using System.Diagnostics;
 using System.Globalization;
 using System.Text;
 using System.Threading;
+using System.Threading.Channels;
 using System.Threading.Tasks;
 using System.Windows.Controls;
 using System.Windows.Data;
@@ -56,6 +59,7 @@ namespace Comfizen
         public static ICommand GlobalQueueCommand { get; private set; }
         
         private ComfyuiModel _comfyuiModel;
+        private ComfyuiBackendPool _backendPool;
         private AppSettings _settings;
         private readonly SettingsService _settingsService;
         private SessionManager _sessionManager;
@@ -71,6 +75,11 @@ namespace Comfizen
         public ConsoleLogService GetConsoleLogService() => _consoleLogService;
         
         public ImageProcessingViewModel ImageProcessing { get; private set; }
+        
+        /// <summary>
+        /// Latent previews of the running prompt, shown under the current task in the queue panel.
+        /// </summary>
+        public LivePreviewViewModel LivePreview { get; } = new LivePreviewViewModel();
         public FullScreenViewModel FullScreen { get; private set; }
         public SliderCompareViewModel SliderCompare { get; private set; }
 
@@ -170,6 +179,7 @@ namespace Comfizen
         
         public ICommand SaveQueueCommand { get; }
         public ICommand ImportQueueCommand { get; }
+        public ICommand ExportNodeTimingsCommand { get; }
         
         /// <summary>
         /// A transient UI state indicating whether the queue control panel is undocked.
@@ -412,6 +422,7 @@ namespace Comfizen
             _settings = _settingsService.Settings;
 
             _comfyuiModel = new ComfyuiModel(_settings);
+            _backendPool = new ComfyuiBackendPool(_settings);
             _modelService = new ModelService(_settings);
             
             ImageProcessing = new ImageProcessingViewModel(_comfyuiModel, _settings);
@@ -470,7 +481,7 @@ namespace Comfizen
             OpenSettingsCommand = new RelayCommand(OpenSettings);
             
             InterruptCommand = new AsyncRelayCommand(
-                async _ => await _comfyuiModel.Interrupt(),
+                async _ => await _comfyuiModel.Interrupt(_currentTaskServerAddress),
                 _ => _isProcessing
             );
             
@@ -507,11 +518,7 @@ namespace Comfizen
                 SelectedTab.Workflow.BlockedNodeIds.Add(nodeId);
 
                 // Remove existing items from the gallery from this node
-                var itemsToRemove = ImageProcessing.ImageOutputs.Where(item => item.NodeId == nodeId).ToList();
-                foreach (var item in itemsToRemove)
-                {
-                    ImageProcessing.ImageOutputs.Remove(item);
-                }
+                ImageProcessing.ImageOutputs.RemoveRange(ImageProcessing.ImageOutputs.Where(item => item.NodeId == nodeId).ToList());
             }, p => p is ImageOutput);
             
             ClearBlockedNodesCommand = new RelayCommand(o =>
@@ -696,6 +703,7 @@ namespace Comfizen
             
             SaveQueueCommand = new AsyncRelayCommand(SaveQueueAsync, _ => _isProcessing || PendingQueueItems.Any());
             ImportQueueCommand = new AsyncRelayCommand(ImportQueueAsync);
+            ExportNodeTimingsCommand = new RelayCommand(ExportNodeTimings);
             
             RenameWorkflowCommand = new RelayCommand(p => {
                 if (p is WorkflowTabViewModel tab)
@@ -722,6 +730,7 @@ namespace Comfizen
                 var nodeConnectionSnapshots = data["nodeConnectionSnapshots"]?.ToObject<Dictionary<string, JObject>>() ?? new Dictionary<string, JObject>();
                 var globalPresets = data["globalPresets"]?.ToObject<ObservableCollection<GlobalPreset>>() ?? new ObservableCollection<GlobalPreset>();
                 var advancedPromptOriginalTexts = data["advancedPromptOriginalTexts"]?.ToObject<Dictionary<string, string>>();
+                var wildcardSeed = data["wildcardSeed"]?.ToObject<long?>();
                 var attachedFullWorkflow = data["attachedFullWorkflow"] as JObject;
                 var attachedFullWorkflowName = data["attachedFullWorkflowName"]?.ToString();
         
@@ -748,6 +757,8 @@ namespace Comfizen
                 );
 
                 newTab.QueueItemSource = queueItemVm;
+                // The prompt fields are templates again; with the task's seed they expand as they did for the task.
+                if (wildcardSeed.HasValue) newTab.WorkflowInputsController.GlobalControls.WildcardSeed = wildcardSeed.Value;
 
                 OpenTabs.Add(newTab);
                 SelectedTab = newTab;
@@ -808,6 +819,9 @@ namespace Comfizen
                 }
             }
 
+            // The seed the wildcard fields are expanded with; stored so that the expansion can be reproduced from the output.
+            long? wildcardSeed = advancedPromptOriginalTexts.Any() ? controller.GlobalControls.WildcardSeed : null;
+
             // Process fields like wildcards, inpaint, etc.
             await controller.ProcessSpecialFieldsAsync(apiPromptForTask);
             // Trigger the hook for final modifications
@@ -823,6 +837,7 @@ namespace Comfizen
                 globalPresets = tab.Workflow.GlobalPresets.Any() ? tab.Workflow.GlobalPresets : null,
                 nodeConnectionSnapshots = tab.Workflow.NodeConnectionSnapshots.Any() ? tab.Workflow.NodeConnectionSnapshots : null,
                 advancedPromptOriginalTexts = advancedPromptOriginalTexts.Any() ? advancedPromptOriginalTexts : null,
+                wildcardSeed,
                 attachedFullWorkflow = tab.Workflow.AttachedFullWorkflow,
                 attachedFullWorkflowName = tab.Workflow.AttachedFullWorkflowName
             };
@@ -831,12 +846,37 @@ namespace Comfizen
     
             return new PromptTask
             {
-                JsonPromptForApi = apiPromptForTask.ToString(),
+                JsonPromptForApi = apiPromptForTask.ToString(Formatting.None),
                 FullWorkflowStateJson = fullWorkflowStateJsonForThisTask,
                 OriginTab = tab // Keep origin tab reference
             };
         }
         
+        private void ExportNodeTimings(object obj)
+        {
+            var dialog = new SaveFileDialog
+            {
+                FileName = "node_timings.csv",
+                Filter = LocalizationService.Instance["QueueManager_ExportNodeTimingsFilter"],
+                Title = LocalizationService.Instance["QueueManager_ExportNodeTimingsTitle"]
+            };
+
+            if (dialog.ShowDialog() != true)
+            {
+                return;
+            }
+
+            try
+            {
+                NodeTimingService.Instance.Export(dialog.FileName);
+                Logger.Log($"Node timings exported to {dialog.FileName}");
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, "Failed to export node timings");
+            }
+        }
+
         private async Task SaveQueueAsync(object obj)
         {
             var dialog = new SaveFileDialog
@@ -854,19 +894,19 @@ namespace Comfizen
             try
             {
                 var queueToSave = new List<SerializablePromptTask>();
-                // Add the currently executing task first, if it exists
-                if (_currentTask != null)
+                // Add the tasks currently being executed first, if any
+                foreach (var inFlightTask in GetInFlightTasksSnapshot())
                 {
                     queueToSave.Add(new SerializablePromptTask
                     {
-                        JsonPromptForApi = _currentTask.JsonPromptForApi,
-                        FullWorkflowStateJson = _currentTask.FullWorkflowStateJson,
-                        WorkflowName = _currentTask.OriginTab.Header, // Use Header as workflow name
-                        OriginalApiPromptJson = _currentTask.OriginTab.Workflow.OriginalApi?.ToString(Formatting.None),
-                        IsGridTask = _currentTask.IsGridTask,
-                        XValue = _currentTask.XValue,
-                        YValue = _currentTask.YValue,
-                        GridConfig = _currentTask.GridConfig
+                        JsonPromptForApi = inFlightTask.JsonPromptForApi,
+                        FullWorkflowStateJson = inFlightTask.FullWorkflowStateJson,
+                        WorkflowName = inFlightTask.OriginTab.Header, // Use Header as workflow name
+                        OriginalApiPromptJson = inFlightTask.OriginTab.Workflow.OriginalApi?.ToString(Formatting.None),
+                        IsGridTask = inFlightTask.IsGridTask,
+                        XValue = inFlightTask.XValue,
+                        YValue = inFlightTask.YValue,
+                        GridConfig = inFlightTask.GridConfig
                     });
                 }
 
@@ -925,7 +965,7 @@ namespace Comfizen
                     return;
                 }
                 
-                if (PendingQueueItems.Count == 0 && _currentTask == null)
+                if (PendingQueueItems.Count == 0 && !GetInFlightTasksSnapshot().Any())
                 {
                     IsQueuePaused = true;
                 }
@@ -1102,17 +1142,64 @@ namespace Comfizen
         private void EtaUpdateTimer_Tick(object sender, EventArgs e)
         {
             // This logic is moved from the processing loop to be called every second.
-            if (_isProcessing && CompletedTasks > 0 && TotalTasks > CompletedTasks)
+            if (!_isProcessing || TotalTasks <= CompletedTasks) return;
+            
+            // Each remaining task is predicted from the recorded timings of its own nodes, so mixed queues
+            // (grid cells, videos) are estimated correctly. Tasks whose nodes were never timed fall back
+            // to the average time per completed task.
+            double remainingSeconds = 0;
+            int predictedTasks = 0;
+            int unpredictedTasks = 0;
+
+            List<(PromptTask Task, PromptTimingRecorder Timing)> inFlight;
+            lock (_inFlightTasks)
+            {
+                inFlight = _inFlightTasks.Select(t => (t, _inFlightTimings.GetValueOrDefault(t))).ToList();
+            }
+            foreach (var (task, timing) in inFlight)
             {
-                var elapsed = _queueStopwatch.Elapsed;
-                var timePerTask = elapsed.TotalSeconds / CompletedTasks;
-                var remainingSeconds = timePerTask * (TotalTasks - CompletedTasks);
-                var remainingTime = TimeSpan.FromSeconds(remainingSeconds);
-                EstimatedTimeRemaining = $"~{FormatEta(remainingTime)}";
+                var predicted = PredictTaskSeconds(task);
+                if (predicted == null) { unpredictedTasks++; continue; }
+                
+                predictedTasks++;
+                remainingSeconds += Math.Max(0, predicted.Value - (timing?.Elapsed?.TotalSeconds ?? 0));
+            }
+            foreach (var item in PendingQueueItems)
+            {
+                var predicted = PredictTaskSeconds(item.Task);
+                if (predicted == null) { unpredictedTasks++; continue; }
+                
+                predictedTasks++;
+                remainingSeconds += predicted.Value;
             }
+
+            if (unpredictedTasks > 0)
+            {
+                if (CompletedTasks == 0) return;
+                remainingSeconds += unpredictedTasks * _queueStopwatch.Elapsed.TotalSeconds / CompletedTasks;
+            }
+            if (predictedTasks == 0 && unpredictedTasks == 0) return;
+            
+            // Several servers work through the queue in parallel.
+            remainingSeconds /= Math.Max(1, _backendPool.Backends.Count);
+            EstimatedTimeRemaining = $"~{FormatEta(TimeSpan.FromSeconds(remainingSeconds))}";
             // Don't clear the ETA here, it will be cleared when the queue finishes.
         }
 
+        private double? PredictTaskSeconds(PromptTask task)
+        {
+            return NodeTimingService.Instance.PredictSeconds(GetWorkflowKey(task.OriginTab), task.JsonPromptForApi);
+        }
+
+        /// <summary>
+        /// Identifies a workflow in the node timing store: its path relative to the workflows folder, or the tab header for unsaved tabs.
+        /// </summary>
+        private static string GetWorkflowKey(WorkflowTabViewModel tab)
+        {
+            if (tab == null) return string.Empty;
+            return tab.IsVirtual ? tab.Header : Path.GetRelativePath(Workflow.WorkflowsDir, tab.FilePath);
+        }
+
         private void HandleHighPriorityLog(LogLevel level)
         {
             // Ignore Warnings, open only on Error or Critical
@@ -1139,11 +1226,11 @@ namespace Comfizen
             };
         }
 
-        public void ImportStateFromFile(string filePath)
+        public async Task ImportStateFromFileAsync(string filePath)
         {
             try
             {
-                var fileBytes = File.ReadAllBytes(filePath);
+                var fileBytes = await File.ReadAllBytesAsync(filePath);
                 var jsonString = Utils.ReadStateFromImage(fileBytes);
 
                 if (string.IsNullOrEmpty(jsonString))
@@ -1152,6 +1239,11 @@ namespace Comfizen
                     {
                         jsonString = File.ReadAllText(filePath);
                     }
+                    else if ((await FindGalleryOutputAsync(fileBytes))?.Prompt is { Length: > 0 } galleryState)
+                    {
+                        // Saved without the workflow, but still in the gallery: its state is known.
+                        jsonString = galleryState;
+                    }
                     else
                     {
                         Logger.Log(LocalizationService.Instance["MainVM_ImportNoMetadataError"], LogLevel.Error);
@@ -1169,6 +1261,16 @@ namespace Comfizen
                 MessageBox.Show(string.Format(LocalizationService.Instance["MainVM_ImportGenericError"], ex.Message), LocalizationService.Instance["MainVM_ImportErrorTitle"], MessageBoxButton.OK, MessageBoxImage.Error);            }
         }
         
+        /// <summary>
+        /// The gallery output with the same pixels as the file, if there is one.
+        /// </summary>
+        private async Task<ImageOutput> FindGalleryOutputAsync(byte[] fileBytes)
+        {
+            if (ImageProcessing.ImageOutputs.Count == 0) return null;
+            var visualHash = await Utils.ComputePixelHashAsync(fileBytes);
+            return ImageProcessing.ImageOutputs.FindByVisualHash(visualHash);
+        }
+        
         private void PatchPromptWithOriginalTexts(JObject prompt, Dictionary<string, string> originalTexts)
         {
             if (prompt == null || originalTexts == null) return;
@@ -1209,6 +1311,7 @@ namespace Comfizen
             var nodeConnectionSnapshots = workflowData["nodeConnectionSnapshots"]?.ToObject<Dictionary<string, JObject>>() ?? new Dictionary<string, JObject>();
             var globalPresets = workflowData["globalPresets"]?.ToObject<ObservableCollection<GlobalPreset>>() ?? new ObservableCollection<GlobalPreset>();
             var advancedPromptOriginalTexts = workflowData["advancedPromptOriginalTexts"]?.ToObject<Dictionary<string, string>>();
+            var wildcardSeed = workflowData["wildcardSeed"]?.ToObject<long?>();
             var attachedFullWorkflow = workflowData["attachedFullWorkflow"] as JObject;
             var attachedFullWorkflowName = workflowData["attachedFullWorkflowName"]?.ToString();
             
@@ -1236,6 +1339,8 @@ namespace Comfizen
             );
             
             newTab.WorkflowInputsController.SelectedSeedControl = SeedControl.Randomize;
+            // The first task queued from the imported workflow expands its wildcards as they were for this output.
+            if (wildcardSeed.HasValue) newTab.WorkflowInputsController.GlobalControls.WildcardSeed = wildcardSeed.Value;
 
             OpenTabs.Add(newTab);
             SelectedTab = newTab;
@@ -1561,6 +1666,7 @@ namespace Comfizen
         private async void OpenSettings(object obj)
         {
             var oldExtensions = _settings.ModelExtensions;
+            var oldServerAddress = _settings.ServerAddress;
             var settingsWindow = new SettingsWindow { Owner = Application.Current.MainWindow };
             settingsWindow.ShowDialog();
 
@@ -1580,7 +1686,12 @@ namespace Comfizen
             // ImageProcessing.Settings = _settings;
             // FullScreen = new FullScreenViewModel(this, _comfyuiModel, _settings, ImageProcessing.FilteredImageOutputs);
             
-            // await _consoleLogService.ReconnectAsync(_settings);
+            if (!string.Equals(_settings.ServerAddress, oldServerAddress, StringComparison.OrdinalIgnoreCase))
+            {
+                // Moves the console to the new server and closes the old connection.
+                await _consoleLogService.ReconnectAsync(_settings);
+            }
+            _backendPool.UpdateBackends();
             
             foreach (var tab in OpenTabs)
             {
@@ -1620,7 +1731,9 @@ namespace Comfizen
         private readonly Stopwatch _queueStopwatch = new();
 
         private bool _cancellationRequested = false;
-        private PromptTask _currentTask; // --- ADDED: To track the currently executing task ---
+        private readonly List<PromptTask> _inFlightTasks = new(); // Tasks sent to the server whose results are not processed yet
+        private readonly Dictionary<PromptTask, PromptTimingRecorder> _inFlightTimings = new(); // Guarded by _inFlightTasks
+        private string _currentTaskServerAddress; // The server running the current task, target of the Interrupt command
 
         private readonly object _processingLock = new object();
         private bool _isProcessing = false;
@@ -1877,6 +1990,7 @@ namespace Comfizen
                             }
 
                             var advancedPromptOriginalTexts = GetAdvancedPromptOriginalTexts(apiPromptForTask);
+                            long? wildcardSeed = advancedPromptOriginalTexts.Any() ? controller.GlobalControls.WildcardSeed : null;
 
                             await tab.WorkflowInputsController.ProcessSpecialFieldsAsync(apiPromptForTask, pathsToIgnore);
                             tab.ExecuteHook("on_before_prompt_queue", apiPromptForTask);
@@ -1891,6 +2005,7 @@ namespace Comfizen
                                 globalPresets = tab.Workflow.GlobalPresets.Any() ? tab.Workflow.GlobalPresets : null,
                                 nodeConnectionSnapshots = tab.Workflow.NodeConnectionSnapshots.Any() ? tab.Workflow.NodeConnectionSnapshots : null,
                                 advancedPromptOriginalTexts = advancedPromptOriginalTexts.Any() ? advancedPromptOriginalTexts : null,
+                                wildcardSeed,
                                 attachedFullWorkflow = tab.Workflow.AttachedFullWorkflow,
                                 attachedFullWorkflowName = tab.Workflow.AttachedFullWorkflowName
                             };
@@ -1898,7 +2013,7 @@ namespace Comfizen
 
                             tasks.Add(new PromptTask
                             {
-                                JsonPromptForApi = apiPromptForTask.ToString(),
+                                JsonPromptForApi = apiPromptForTask.ToString(Formatting.None),
                                 FullWorkflowStateJson = fullWorkflowStateJsonForThisTask,
                                 OriginTab = tab,
                                 IsGridTask = true,
@@ -1921,49 +2036,96 @@ namespace Comfizen
                         }
                     }
                 }
-                return tasks;
+                return await ApplyCacheOrderingAsync(tasks, tab);
             }
             
-            for (int i = 0; i < QueueSize; i++)
+            try
             {
-                // 1. Create a clone of the API prompt that will be modified for this specific task.
-                var apiPromptForTask = tab.Workflow.JsonClone();
+                // Expand the wildcard prompts of the whole batch in parallel instead of one by one below.
+                await controller.PrepareWildcardBatchAsync(QueueSize);
+
+                for (int i = 0; i < QueueSize; i++)
+                {
+                    // 1. Create a clone of the API prompt that will be modified for this specific task.
+                    var apiPromptForTask = tab.Workflow.JsonClone();
                 
-                var advancedPromptOriginalTexts = GetAdvancedPromptOriginalTexts(apiPromptForTask);
+                    var advancedPromptOriginalTexts = GetAdvancedPromptOriginalTexts(apiPromptForTask);
+                    long? wildcardSeed = advancedPromptOriginalTexts.Any() ? controller.GlobalControls.WildcardSeed : null;
 
-                await tab.WorkflowInputsController.ProcessSpecialFieldsAsync(apiPromptForTask);
+                    await tab.WorkflowInputsController.ProcessSpecialFieldsAsync(apiPromptForTask);
                 
-                tab.ExecuteHook("on_before_prompt_queue", apiPromptForTask);
-
-                // 3. NOW, create the full state object using the MODIFIED prompt clone.
-                // This ensures that the state we save to metadata is identical to what's used for generation.
-                var fullStateForThisTask = new
-                {
-                    prompt = apiPromptForTask,
-                    promptTemplate = tab.Workflow.Groups,
-                    scripts = (tab.Workflow.Scripts.Hooks.Any() || tab.Workflow.Scripts.Actions.Any()) ? tab.Workflow.Scripts : null,
-                    tabs = tab.Workflow.Tabs.Any() ? tab.Workflow.Tabs : null,
-                    presets = tab.Workflow.Presets.Any() ? tab.Workflow.Presets : null,
-                    globalPresets = tab.Workflow.GlobalPresets.Any() ? tab.Workflow.GlobalPresets : null,
-                    nodeConnectionSnapshots = tab.Workflow.NodeConnectionSnapshots.Any() ? tab.Workflow.NodeConnectionSnapshots : null,
-                    advancedPromptOriginalTexts = advancedPromptOriginalTexts.Any() ? advancedPromptOriginalTexts : null,
-                    attachedFullWorkflow = tab.Workflow.AttachedFullWorkflow,
-                    attachedFullWorkflowName = tab.Workflow.AttachedFullWorkflowName
-                };
+                    tab.ExecuteHook("on_before_prompt_queue", apiPromptForTask);
+
+                    // 3. NOW, create the full state object using the MODIFIED prompt clone.
+                    // This ensures that the state we save to metadata is identical to what's used for generation.
+                    var fullStateForThisTask = new
+                    {
+                        prompt = apiPromptForTask,
+                        promptTemplate = tab.Workflow.Groups,
+                        scripts = (tab.Workflow.Scripts.Hooks.Any() || tab.Workflow.Scripts.Actions.Any()) ? tab.Workflow.Scripts : null,
+                        tabs = tab.Workflow.Tabs.Any() ? tab.Workflow.Tabs : null,
+                        presets = tab.Workflow.Presets.Any() ? tab.Workflow.Presets : null,
+                        globalPresets = tab.Workflow.GlobalPresets.Any() ? tab.Workflow.GlobalPresets : null,
+                        nodeConnectionSnapshots = tab.Workflow.NodeConnectionSnapshots.Any() ? tab.Workflow.NodeConnectionSnapshots : null,
+                        advancedPromptOriginalTexts = advancedPromptOriginalTexts.Any() ? advancedPromptOriginalTexts : null,
+                        wildcardSeed,
+                        attachedFullWorkflow = tab.Workflow.AttachedFullWorkflow,
+                        attachedFullWorkflowName = tab.Workflow.AttachedFullWorkflowName
+                    };
             
-                // 4. Serialize this complete and correct state for embedding.
-                string fullWorkflowStateJsonForThisTask = JsonConvert.SerializeObject(fullStateForThisTask, new JsonSerializerSettings { NullValueHandling = NullValueHandling.Ignore, Formatting = Formatting.None });
+                    // 4. Serialize this complete and correct state for embedding.
+                    string fullWorkflowStateJsonForThisTask = JsonConvert.SerializeObject(fullStateForThisTask, new JsonSerializerSettings { NullValueHandling = NullValueHandling.Ignore, Formatting = Formatting.None });
                 
-                // 5. Add the new task with the correct data.
-                tasks.Add(new PromptTask
-                {
-                    JsonPromptForApi = apiPromptForTask.ToString(), // This is sent to the server
-                    FullWorkflowStateJson = fullWorkflowStateJsonForThisTask, // This is saved in the image
-                    OriginTab = tab
-                });
+                    // 5. Add the new task with the correct data.
+                    tasks.Add(new PromptTask
+                    {
+                        JsonPromptForApi = apiPromptForTask.ToString(Formatting.None), // This is sent to the server
+                        FullWorkflowStateJson = fullWorkflowStateJsonForThisTask, // This is saved in the image
+                        OriginTab = tab
+                    });
+                }
+            }
+            finally
+            {
+                // Prepared results would be stale for the next batch, e.g. after a wildcard file changed.
+                controller.ClearPreparedWildcards();
             }
             
-            return tasks;
+            return await ApplyCacheOrderingAsync(tasks, tab);
+        }
+        
+        /// <summary>
+        /// Reports how much of a batch ComfyUI is expected to serve from its node cache and, if enabled in the settings,
+        /// reorders the batch to maximise it. Nodes are weighted by their recorded execution time, so avoiding a model
+        /// reload counts for more than avoiding a cheap text encode.
+        /// </summary>
+        private async Task<List<PromptTask>> ApplyCacheOrderingAsync(List<PromptTask> tasks, WorkflowTabViewModel tab)
+        {
+            var optimize = _settings.OptimizeBatchOrderForCache;
+            if (tasks.Count < 2 || (!optimize && !tasks[0].IsGridTask)) return tasks;
+
+            try
+            {
+                var workflowKey = GetWorkflowKey(tab);
+                // A large batch takes a noticeable time to compare, so it is planned off the UI thread.
+                var plan = await Task.Run(() => PromptCacheOrdering.Plan(
+                    tasks.Select(t => JObject.Parse(t.JsonPromptForApi)).ToList(),
+                    classType => NodeTimingService.Instance.GetMeanSeconds(workflowKey, classType) ?? 1.0,
+                    optimize));
+
+                if (plan.Order.SequenceEqual(Enumerable.Range(0, tasks.Count)))
+                {
+                    Logger.Log($"Batch of {tasks.Count} tasks: about {plan.CachedRatio:P0} of node executions are expected to be served from the ComfyUI cache.");
+                    return tasks;
+                }
+                Logger.Log($"Batch of {tasks.Count} tasks reordered for cache reuse: about {plan.CachedRatio:P0} of node executions are expected to be served from the ComfyUI cache (original order: {plan.OriginalCachedRatio:P0}).");
+                return plan.Order.Select(i => tasks[i]).ToList();
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, "Failed to analyse the batch for cache reuse; keeping the original order.");
+                return tasks;
+            }
         }
         
         /// <summary>
@@ -1989,7 +2151,7 @@ namespace Comfizen
 
             var task = new PromptTask
             {
-                JsonPromptForApi = prompt.ToString(),
+                JsonPromptForApi = prompt.ToString(Formatting.None),
                 FullWorkflowStateJson = fullWorkflowStateJson,
                 OriginTab = originTab
             };
@@ -2149,39 +2311,100 @@ namespace Comfizen
             SelectedTab = helpTab;
         }
 
+        /// <summary>
+        /// A prompt that has been sent to the server and whose outputs are collected in the background.
+        /// </summary>
+        private class InFlightPrompt
+        {
+            public QueueItemViewModel TaskVm { get; init; }
+            public PromptTask PromptTask => TaskVm.Task;
+            public JObject Prompt { get; init; }
+            public PromptSubscription Subscription { get; init; }
+            public ComfyuiBackend Backend { get; init; }
+            public PromptTimingRecorder Timing { get; init; }
+            public Task<List<ImageOutput>> Outputs { get; set; }
+            
+            /// <summary>
+            /// Receives each output as soon as it is downloaded, before the whole prompt has finished.
+            /// </summary>
+            public Channel<ImageOutput> StreamedOutputs { get; } =
+                Channel.CreateUnbounded<ImageOutput>(new UnboundedChannelOptions { SingleReader = true, SingleWriter = true });
+            
+            /// <summary>
+            /// Set when the prompt was removed from the server queue before it started executing.
+            /// </summary>
+            public bool Cancelled { get; set; }
+        }
+
+        /// <summary>
+        /// Returns the tasks that have been sent to the server but whose results have not been processed yet, in queue order.
+        /// </summary>
+        private List<PromptTask> GetInFlightTasksSnapshot()
+        {
+            lock (_inFlightTasks)
+            {
+                return _inFlightTasks.ToList();
+            }
+        }
+
         private async Task ProcessQueueAsync()
         {
             WorkflowTabViewModel lastTaskOriginTab = null; 
             List<Utils.GridCellResult> currentGridResults = null;
             XYGridConfig currentGridConfig = null;
+            var inFlight = new Queue<InFlightPrompt>();
+            bool cancellationHandled = false;
             
             try
             {
                 _etaUpdateTimer.Start();
+                var primary = _backendPool.Backends.FirstOrDefault();
+                if (primary != null) LivePreview.Follow(primary.Session);
                 
                 while (true)
                 {
-                    while (IsQueuePaused && !_cancellationRequested)
+                    if (_cancellationRequested && !cancellationHandled)
                     {
-                        await Task.Delay(500);
+                        cancellationHandled = true;
+                        await CancelInFlightPromptsAsync(inFlight);
+                    }
+                    else if (!_cancellationRequested)
+                    {
+                        cancellationHandled = false; // A new batch was queued after the previous one was cleared
                     }
-                    
-                    if (_cancellationRequested) break;
 
-                    QueueItemViewModel taskVm = null;
-                    await Application.Current.Dispatcher.InvokeAsync(() =>
+                    try
                     {
-                        taskVm = PendingQueueItems.FirstOrDefault();
-                        if (taskVm != null)
+                        // Keep up to MaxInFlightPrompts prompts queued per server, so the GPUs do not
+                        // sit idle while the outputs of the previous prompt are downloaded and processed.
+                        int maxInFlight = Math.Max(1, _settings.MaxInFlightPrompts) * _backendPool.Backends.Count;
+                        while (!_cancellationRequested && !IsQueuePaused && inFlight.Count < maxInFlight)
                         {
-                            PendingQueueItems.RemoveAt(0);
-                            CurrentTaskVm = taskVm;
+                            var submitted = await SubmitNextPromptAsync(lastTaskOriginTab);
+                            if (submitted == null) break;
+                            
+                            inFlight.Enqueue(submitted);
+                            lastTaskOriginTab = submitted.PromptTask.OriginTab;
                         }
-                    });
 
-                    if (taskVm != null)
-                    {
-                        var task = taskVm.Task;
+                        if (inFlight.Count == 0)
+                        {
+                            if (IsQueuePaused && !_cancellationRequested)
+                            {
+                                await Task.Delay(500);
+                                continue;
+                            }
+                            break;
+                        }
+
+                        // Results are always processed in submission order, regardless of which download finishes first.
+                        var current = inFlight.Peek();
+                        var task = current.PromptTask;
+                        await Application.Current.Dispatcher.InvokeAsync(() => CurrentTaskVm = current.TaskVm);
+                        _currentTaskServerAddress = current.Backend.Address;
+                        LivePreview.Clear();
+                        // Previews come from the server that runs the current prompt.
+                        LivePreview.Follow(current.Backend.Session);
                         
                         if (currentGridResults != null && task.GridConfig != currentGridConfig)
                         {
@@ -2190,143 +2413,101 @@ namespace Comfizen
                             currentGridConfig = null;
                         }
                         
-                        _currentTask = task;
-                        lastTaskOriginTab = task.OriginTab;
-                        
                         if (task.IsGridTask && currentGridResults == null)
                         {
                             currentGridResults = new List<Utils.GridCellResult>();
                             currentGridConfig = task.GridConfig; 
                         }
                         
-                        try
+                        var promptForTask = current.Prompt;
+                        
+                        // Show each output as soon as its node has executed, instead of waiting for the whole prompt.
+                        // Poll so that clearing the queue removes the waiting prompts from the server right away.
+                        var streamedOutputs = current.StreamedOutputs.Reader;
+                        Task<bool> waitForOutput = null;
+                        while (true)
                         {
-                            var promptForTask = JObject.Parse(task.JsonPromptForApi);
-                            
-                            var outputsForCurrentTask = new List<ImageOutput>();
-                            await foreach (var io in _comfyuiModel.QueuePrompt(task.JsonPromptForApi))
+                            while (streamedOutputs.TryRead(out var imageOutput))
                             {
-                                if (task.OriginTab.Workflow.BlockedNodeIds.Contains(io.NodeId))
-                                {
-                                    continue; 
-                                }
-
-                                io.Prompt = task.FullWorkflowStateJson;
-                                
-                                var originalApiForDetails = task.OriginTab.Workflow.OriginalApi;
-                                io.GenerationDetails.AddRange(GenerateComparisonDetails(promptForTask, originalApiForDetails, task.OriginTab));
-                                
-                                if (task.OriginTab?.Workflow.LoadedApi?[io.NodeId] is JObject nodeData)
+                                if (!current.Cancelled)
                                 {
-                                    io.NodeTitle = nodeData["_meta"]?["title"]?.ToString() ?? "Untitled";
-                                    io.NodeType = nodeData["class_type"]?.ToString();
+                                    await PublishOutputAsync(task, promptForTask, imageOutput);
                                 }
-                                outputsForCurrentTask.Add(io);
                             }
+                            if (streamedOutputs.Completion.IsCompleted) break;
                             
-                            await Application.Current.Dispatcher.InvokeAsync(() =>
+                            waitForOutput ??= streamedOutputs.WaitToReadAsync().AsTask();
+                            await Task.WhenAny(waitForOutput, Task.Delay(500));
+                            if (waitForOutput.IsCompleted) waitForOutput = null;
+                            
+                            if (_cancellationRequested && !cancellationHandled)
                             {
-                                if (task.IsGridTask)
-                                {
-                                    if (outputsForCurrentTask.Any())
-                                    {
-                                        currentGridResults.Add(new Utils.GridCellResult
-                                        {
-                                            ImageOutputs = outputsForCurrentTask,
-                                            XValue = task.XValue,
-                                            YValue = task.YValue
-                                        });
-                                    }
-                                    
-                                    if (task.OriginTab.WorkflowInputsController.XyGridShowIndividualImages)
-                                    {
-                                        foreach (var imageOutput in outputsForCurrentTask)
-                                        {
-                                            if (!this.ImageProcessing.ImageOutputs.Any(existing => existing.VisualHash == imageOutput.VisualHash))
-                                            {
-                                                this.ImageProcessing.ImageOutputs.Insert(0, imageOutput);
-                                            }
-                                        }
-                                    }
-                                }
-                                else 
-                                {
-                                    foreach (var imageOutput in outputsForCurrentTask)
-                                    {
-                                        if (!this.ImageProcessing.ImageOutputs.Any(existing => existing.VisualHash == imageOutput.VisualHash))
-                                        {
-                                            this.ImageProcessing.ImageOutputs.Insert(0, imageOutput);
-                                        }
-                                    }
-                                }
-                                
-                                foreach (var imageOutput in outputsForCurrentTask)
-                                {
-                                    task.OriginTab?.ExecuteHook("on_output_received", promptForTask, imageOutput);
-                                }
-                            });
+                                cancellationHandled = true;
+                                await CancelInFlightPromptsAsync(inFlight);
+                            }
+                        }
                         
-                            await Application.Current.Dispatcher.InvokeAsync(() =>
-                            {
-                                CompletedTasks++;
-                                CurrentProgress = (TotalTasks > 0) ? (CompletedTasks * 100) / TotalTasks : 0;
-                            });
-                            
-                            await Application.Current.Dispatcher.InvokeAsync(() => task.OriginTab?.ExecuteHook("on_queue_finish", promptForTask));
+                        var outputsForCurrentTask = await current.Outputs;
+                        inFlight.Dequeue();
+                        lock (_inFlightTasks)
+                        {
+                            _inFlightTasks.Remove(task);
+                            _inFlightTimings.Remove(task);
                         }
-                        catch (Exception ex)
+                        
+                        if (current.Cancelled) continue;
+                        
+                        if (task.IsGridTask && outputsForCurrentTask.Any())
                         {
-                            Logger.Log(ex, "[Connection Error] Failed to queue prompt");
-                            
-                            await Application.Current.Dispatcher.InvokeAsync(() =>
+                            currentGridResults.Add(new Utils.GridCellResult
                             {
-                                MessageBox.Show(
-                                    LocalizationService.Instance["MainVM_ConnectionErrorMessage"],
-                                    LocalizationService.Instance["MainVM_ConnectionErrorTitle"],
-                                    MessageBoxButton.OK, MessageBoxImage.Error);
+                                ImageOutputs = outputsForCurrentTask,
+                                XValue = task.XValue,
+                                YValue = task.YValue
                             });
-                        
-                            _cancellationRequested = true; 
-                            break;
                         }
+                    
+                        await Application.Current.Dispatcher.InvokeAsync(() =>
+                        {
+                            CompletedTasks++;
+                            CurrentProgress = (TotalTasks > 0) ? (CompletedTasks * 100) / TotalTasks : 0;
+                        });
+                        
+                        await Application.Current.Dispatcher.InvokeAsync(() => task.OriginTab?.ExecuteHook("on_queue_finish", promptForTask));
                     }
-                    else
+                    catch (Exception ex)
                     {
-                        if (IsInfiniteQueueEnabled && !_cancellationRequested && lastTaskOriginTab != null)
-                        {
-                            List<PromptTask> newTasks = null;
-                            newTasks = await CreatePromptTasks(lastTaskOriginTab);
-
-                            if (newTasks != null && newTasks.Any())
-                            {
-                                foreach (var p in newTasks)
-                                {
-                                    var templatePrompt = lastTaskOriginTab.Workflow.JsonClone();
-                                    var queueItem = new QueueItemViewModel(p, lastTaskOriginTab.Header, templatePrompt);
-                                    await Application.Current.Dispatcher.InvokeAsync(() =>
-                                    {
-                                        PopulateQueueItemDetails(queueItem);
-                                        PendingQueueItems.Add(queueItem);
-                                    });
-                                }
-                                TotalTasks += newTasks.Count;
-                                await Task.Delay(100);
-                            }
-                            else
-                            {
-                                break; 
-                            }
-                        }
-                        else
+                        Logger.Log(ex, "[Connection Error] Failed to queue prompt");
+                        
+                        await Application.Current.Dispatcher.InvokeAsync(() =>
                         {
-                            break;
-                        }
+                            MessageBox.Show(
+                                LocalizationService.Instance["MainVM_ConnectionErrorMessage"],
+                                LocalizationService.Instance["MainVM_ConnectionErrorTitle"],
+                                MessageBoxButton.OK, MessageBoxImage.Error);
+                        });
+                    
+                        _cancellationRequested = true; 
+                        break;
                     }
                 }
             }
             finally
             {
                 _etaUpdateTimer.Stop();
+                LivePreview.Stop();
+                _currentTaskServerAddress = null;
+                
+                // Only reached with prompts still in flight after a connection error.
+                foreach (var abandoned in inFlight)
+                {
+                    abandoned.Subscription?.Dispose();
+                }
+                lock (_inFlightTasks)
+                {
+                    _inFlightTasks.Clear();
+                    _inFlightTimings.Clear();
+                }
                 
                 await Application.Current.Dispatcher.InvokeAsync(() => CurrentTaskVm = null);
                 
@@ -2339,7 +2520,6 @@ namespace Comfizen
                 {
                     _isProcessing = false;
                 }
-                _currentTask = null; 
             
                 _queueStopwatch.Stop();
                 EstimatedTimeRemaining = null; 
@@ -2369,6 +2549,212 @@ namespace Comfizen
             }
         }
 
+        /// <summary>
+        /// Takes the next pending queue item (refilling the queue first in infinite mode), sends it to the server
+        /// and starts collecting its outputs in the background.
+        /// </summary>
+        /// <returns>The submitted prompt, or null if there is nothing left to submit.</returns>
+        private async Task<InFlightPrompt> SubmitNextPromptAsync(WorkflowTabViewModel lastTaskOriginTab)
+        {
+            var taskVm = await TakeNextPendingItemAsync();
+            if (taskVm == null && IsInfiniteQueueEnabled && !_cancellationRequested && lastTaskOriginTab != null)
+            {
+                if (await RefillInfiniteQueueAsync(lastTaskOriginTab))
+                {
+                    taskVm = await TakeNextPendingItemAsync();
+                }
+            }
+            if (taskVm == null) return null;
+
+            var task = taskVm.Task;
+            lock (_inFlightTasks)
+            {
+                _inFlightTasks.Add(task);
+            }
+
+            var prompt = JObject.Parse(task.JsonPromptForApi);
+            var timing = NodeTimingService.Instance.CreateRecorder(GetWorkflowKey(task.OriginTab), prompt);
+            lock (_inFlightTasks)
+            {
+                _inFlightTimings[task] = timing;
+            }
+            
+            var (backend, subscription) = await SubmitToBackendAsync(task.JsonPromptForApi, prompt);
+            var submitted = new InFlightPrompt
+            {
+                TaskVm = taskVm,
+                Prompt = prompt,
+                Subscription = subscription,
+                Backend = backend,
+                Timing = timing
+            };
+            submitted.Outputs = Task.Run(() => CollectOutputsAsync(submitted));
+            return submitted;
+        }
+
+        /// <summary>
+        /// Sends a prompt to the least-loaded server of the backend pool that can run it,
+        /// moving on to the next server if one cannot be reached.
+        /// </summary>
+        private async Task<(ComfyuiBackend Backend, PromptSubscription Subscription)> SubmitToBackendAsync(string json, JObject prompt)
+        {
+            var failed = new List<ComfyuiBackend>();
+            while (true)
+            {
+                var backend = await _backendPool.AcquireAsync(prompt, failed);
+                try
+                {
+                    return (backend, await _comfyuiModel.SubmitPromptAsync(json, backend.Address));
+                }
+                catch (Exception ex) when (ex is WebSocketException || ex is HttpRequestException)
+                {
+                    _backendPool.MarkFailed(backend);
+                    failed.Add(backend);
+                    if (failed.Count >= _backendPool.Backends.Count) throw;
+                    
+                    Logger.Log($"ComfyUI server {backend.Address} could not be reached ({ex.Message}); trying another server.", LogLevel.Warning);
+                }
+            }
+        }
+
+        private async Task<QueueItemViewModel> TakeNextPendingItemAsync()
+        {
+            QueueItemViewModel taskVm = null;
+            await Application.Current.Dispatcher.InvokeAsync(() =>
+            {
+                taskVm = PendingQueueItems.FirstOrDefault();
+                if (taskVm != null)
+                {
+                    PendingQueueItems.RemoveAt(0);
+                }
+            });
+            return taskVm;
+        }
+
+        /// <summary>
+        /// Creates a new batch of tasks from the given tab for infinite queue mode.
+        /// </summary>
+        /// <returns>True if new tasks were added to the pending queue.</returns>
+        private async Task<bool> RefillInfiniteQueueAsync(WorkflowTabViewModel originTab)
+        {
+            var newTasks = await CreatePromptTasks(originTab);
+            if (newTasks == null || !newTasks.Any()) return false;
+
+            foreach (var p in newTasks)
+            {
+                var templatePrompt = originTab.Workflow.JsonClone();
+                var queueItem = new QueueItemViewModel(p, originTab.Header, templatePrompt);
+                await Application.Current.Dispatcher.InvokeAsync(() =>
+                {
+                    PopulateQueueItemDetails(queueItem);
+                    PendingQueueItems.Add(queueItem);
+                });
+            }
+            TotalTasks += newTasks.Count;
+            await Task.Delay(100);
+            return true;
+        }
+
+        /// <summary>
+        /// Receives the outputs of a submitted prompt and prepares them for the gallery, passing each one on through
+        /// <see cref="InFlightPrompt.StreamedOutputs"/> as soon as it is ready. Runs off the queue loop,
+        /// so downloads and hashing of one prompt overlap with the execution of the next.
+        /// </summary>
+        private async Task<List<ImageOutput>> CollectOutputsAsync(InFlightPrompt inFlightPrompt)
+        {
+            var outputs = new List<ImageOutput>();
+            var task = inFlightPrompt.PromptTask;
+            var streamedOutputs = inFlightPrompt.StreamedOutputs.Writer;
+            Exception error = null;
+            if (inFlightPrompt.Subscription == null)
+            {
+                _backendPool.Release(inFlightPrompt.Backend);
+                streamedOutputs.TryComplete();
+                return outputs;
+            }
+
+            try
+            {
+                using var subscription = inFlightPrompt.Subscription;
+                await foreach (var io in _comfyuiModel.ReceiveOutputsAsync(subscription, task.JsonPromptForApi, inFlightPrompt.Timing.OnEvent))
+                {
+                    if (task.OriginTab.Workflow.BlockedNodeIds.Contains(io.NodeId))
+                    {
+                        continue; 
+                    }
+
+                    io.Prompt = task.FullWorkflowStateJson;
+                    
+                    var originalApiForDetails = task.OriginTab.Workflow.OriginalApi;
+                    io.GenerationDetails.AddRange(GenerateComparisonDetails(inFlightPrompt.Prompt, originalApiForDetails, task.OriginTab));
+                    
+                    if (task.OriginTab?.Workflow.LoadedApi?[io.NodeId] is JObject nodeData)
+                    {
+                        io.NodeTitle = nodeData["_meta"]?["title"]?.ToString() ?? "Untitled";
+                        io.NodeType = nodeData["class_type"]?.ToString();
+                    }
+                    outputs.Add(io);
+                    streamedOutputs.TryWrite(io);
+                }
+            }
+            catch (Exception ex)
+            {
+                error = ex;
+                throw;
+            }
+            finally
+            {
+                _backendPool.Release(inFlightPrompt.Backend);
+                streamedOutputs.TryComplete(error);
+            }
+            return outputs;
+        }
+
+        /// <summary>
+        /// Adds a single output of the running task to the gallery and runs the on_output_received hook.
+        /// Grid outputs are only shown individually when the grid is configured to do so.
+        /// </summary>
+        private async Task PublishOutputAsync(PromptTask task, JObject promptForTask, ImageOutput imageOutput)
+        {
+            await Application.Current.Dispatcher.InvokeAsync(() =>
+            {
+                bool showInGallery = !task.IsGridTask || task.OriginTab.WorkflowInputsController.XyGridShowIndividualImages;
+                if (showInGallery && !this.ImageProcessing.ImageOutputs.ContainsVisualHash(imageOutput.VisualHash))
+                {
+                    this.ImageProcessing.ImageOutputs.Insert(0, imageOutput);
+                }
+                
+                task.OriginTab?.ExecuteHook("on_output_received", promptForTask, imageOutput);
+            });
+        }
+
+        /// <summary>
+        /// Removes the prompts that have not started executing yet from the server queue.
+        /// Prompts that are already running are left to finish, like the current task in serial mode.
+        /// </summary>
+        private async Task CancelInFlightPromptsAsync(IEnumerable<InFlightPrompt> inFlight)
+        {
+            var waiting = inFlight.Where(p => p.Subscription != null && !p.Subscription.IsCompleted).ToList();
+            if (!waiting.Any()) return;
+
+            try
+            {
+                var stillQueued = await _comfyuiModel.CancelQueuedPromptsAsync(waiting.Select(p => p.Subscription).ToList());
+
+                foreach (var prompt in waiting)
+                {
+                    if (stillQueued.Contains(prompt.Subscription.PromptId) || prompt.Subscription.IsCompleted) continue;
+                    
+                    prompt.Cancelled = true;
+                    prompt.Subscription.Dispose();
+                }
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, "Failed to remove pending prompts from the server queue.");
+            }
+        }
+
         private async Task GenerateAndAddGridImageAsync(List<Utils.GridCellResult> gridResults, XYGridConfig gridConfig)
         {
             if (gridResults == null || !gridResults.Any() || gridConfig == null || !gridConfig.CreateGridImage)
@@ -2447,9 +2833,10 @@ namespace Comfizen
                         {
                             XValue = r.XValue,
                             YValue = r.YValue,
+                            // Embedded in the grid's metadata, so the content is read once per cell here.
                             ImageOutputs = r.ImageOutputs.Select(io => new SerializableImageOutput
                             {
-                                ImageBytes = io.ImageBytes,
+                                ImageBytes = io.ReadContent(),
                                 FileName = io.FileName
                             }).ToList()
                         }).ToList();
@@ -2472,11 +2859,11 @@ namespace Comfizen
 
                     var gridImageOutput = new ImageOutput
                     {
-                        ImageBytes = gridImageBytes,
                         FileName = $"{LocalizationService.Instance["XYGrid_GeneratedImageName"]}_{DateTime.Now:yyyyMMdd_HHmmss}.png",
                         Prompt = promptForGrid,
-                        VisualHash = Utils.ComputePixelHash(gridImageBytes)
+                        VisualHash = await Utils.ComputePixelHashAsync(gridImageBytes)
                     };
+                    gridImageOutput.SetContent(gridImageBytes);
 
                     await Application.Current.Dispatcher.InvokeAsync(() =>
                     {
@@ -2800,21 +3187,25 @@ namespace Comfizen
             
             _consoleLogService.OnLogReceived -= HandleHighPriorityLog;
             await _consoleLogService.DisconnectAsync();
+            ComfyuiSession.DisposeAll();
+            ComfyUI_API.DeleteTempOutputs();
+            OutputBlobStore.Instance.DeleteSession();
+            NodeTimingService.Instance.Save();
             
             // --- START OF CHANGE: Save pending queue on close ---
             var queueToSave = new List<SerializablePromptTask>();
-            if (_currentTask != null) // Save the currently executing task first
+            foreach (var inFlightTask in GetInFlightTasksSnapshot()) // Save the currently executing tasks first
             {
                 queueToSave.Add(new SerializablePromptTask
                 {
-                    JsonPromptForApi = _currentTask.JsonPromptForApi,
-                    FullWorkflowStateJson = _currentTask.FullWorkflowStateJson,
-                    WorkflowName = _currentTask.OriginTab.Header,
-                    OriginalApiPromptJson = _currentTask.OriginTab.Workflow.OriginalApi?.ToString(Formatting.None),
-                    IsGridTask = _currentTask.IsGridTask,
-                    XValue = _currentTask.XValue,
-                    YValue = _currentTask.YValue,
-                    GridConfig = _currentTask.GridConfig
+                    JsonPromptForApi = inFlightTask.JsonPromptForApi,
+                    FullWorkflowStateJson = inFlightTask.FullWorkflowStateJson,
+                    WorkflowName = inFlightTask.OriginTab.Header,
+                    OriginalApiPromptJson = inFlightTask.OriginTab.Workflow.OriginalApi?.ToString(Formatting.None),
+                    IsGridTask = inFlightTask.IsGridTask,
+                    XValue = inFlightTask.XValue,
+                    YValue = inFlightTask.YValue,
+                    GridConfig = inFlightTask.GridConfig
                 });
             }
 
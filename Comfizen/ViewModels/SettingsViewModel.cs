@@ -1,4 +1,5 @@
-﻿using System.Collections.Generic;
+﻿using System;
+using System.Collections.Generic;
 using System.Collections.ObjectModel;
 using System.ComponentModel;
 using System.Globalization;
@@ -39,6 +40,11 @@ namespace Comfizen
         public ICommand MoveSchedulerDownCommand { get; }
         
         public string ServerAddress { get; set; }
+        
+        /// <summary>
+        /// Additional ComfyUI servers for the queue, one address per line.
+        /// </summary>
+        public string AdditionalServerAddresses { get; set; }
         public string SavedImagesDirectory { get; set; }
         public bool SavePromptWithFile { get; set; }
         public bool RemoveBase64OnSave { get; set; }
@@ -52,6 +58,11 @@ namespace Comfizen
         public IEnumerable<ImageSaveFormat> ImageSaveFormatValues => System.Enum.GetValues(typeof(ImageSaveFormat)).Cast<ImageSaveFormat>();
         public int MaxRecentWorkflows { get; set; }
         public int MaxQueueSize { get; set; }
+        public int MaxInFlightPrompts { get; set; }
+        public bool OptimizeBatchOrderForCache { get; set; }
+        public int MaxParallelDownloads { get; set; }
+        public bool DownloadVideosToTempFile { get; set; }
+        public bool UploadInpaintImages { get; set; }
         public bool ShowDeleteConfirmation { get; set; }
         public bool ShowPresetDeleteConfirmation { get; set; }
         public bool ShowGroupDeleteConfirmation { get; set; }
@@ -99,6 +110,7 @@ namespace Comfizen
             
             // Load all settings from the settings object
             ServerAddress = _settings.ServerAddress;
+            AdditionalServerAddresses = string.Join(Environment.NewLine, _settings.AdditionalServerAddresses);
             SavedImagesDirectory = _settings.SavedImagesDirectory;
             SavePromptWithFile = _settings.SavePromptWithFile;
             RemoveBase64OnSave = _settings.RemoveBase64OnSave;
@@ -112,6 +124,11 @@ namespace Comfizen
             CompressAnyFieldImagesToJpg = _settings.CompressAnyFieldImagesToJpg;
             AnyFieldJpgCompressionQuality = _settings.AnyFieldJpgCompressionQuality;
             MaxQueueSize = _settings.MaxQueueSize;
+            MaxInFlightPrompts = _settings.MaxInFlightPrompts;
+            OptimizeBatchOrderForCache = _settings.OptimizeBatchOrderForCache;
+            MaxParallelDownloads = _settings.MaxParallelDownloads;
+            DownloadVideosToTempFile = _settings.DownloadVideosToTempFile;
+            UploadInpaintImages = _settings.UploadInpaintImages;
             MaxRecentWorkflows = _settings.MaxRecentWorkflows;
             ShowDeleteConfirmation = _settings.ShowDeleteConfirmation;
             ShowPresetDeleteConfirmation = _settings.ShowPresetDeleteConfirmation;
@@ -206,6 +223,9 @@ namespace Comfizen
                 param => {
                     // Save all settings back to the settings object
                     _settings.ServerAddress = ServerAddress;
+                    _settings.AdditionalServerAddresses = (AdditionalServerAddresses ?? string.Empty)
+                        .Split(new[] { '\r', '\n', ',', ';' }, StringSplitOptions.RemoveEmptyEntries | StringSplitOptions.TrimEntries)
+                        .ToList();
                     _settings.SavedImagesDirectory = SavedImagesDirectory;
                     _settings.SavePromptWithFile = SavePromptWithFile;
                     _settings.RemoveBase64OnSave = RemoveBase64OnSave;
@@ -219,6 +239,11 @@ namespace Comfizen
                     _settings.CompressAnyFieldImagesToJpg = CompressAnyFieldImagesToJpg;
                     _settings.AnyFieldJpgCompressionQuality = AnyFieldJpgCompressionQuality;
                     _settings.MaxQueueSize = MaxQueueSize;
+                    _settings.MaxInFlightPrompts = MaxInFlightPrompts;
+                    _settings.OptimizeBatchOrderForCache = OptimizeBatchOrderForCache;
+                    _settings.MaxParallelDownloads = MaxParallelDownloads;
+                    _settings.DownloadVideosToTempFile = DownloadVideosToTempFile;
+                    _settings.UploadInpaintImages = UploadInpaintImages;
                     _settings.MaxRecentWorkflows = MaxRecentWorkflows;
                     _settings.ShowDeleteConfirmation = ShowDeleteConfirmation;
                     _settings.ShowUndoRedoButtons = ShowUndoRedoButtons;
@@ -103,7 +103,7 @@ namespace Comfizen
         /// <summary>
         /// Opens a file dialog to let the user choose a new image.
         /// </summary>
-        private void ChangeImage(Action<ImageOutput> setImageAction)
+        private async void ChangeImage(Action<ImageOutput> setImageAction)
         {
             var dialog = new OpenFileDialog
             {
@@ -114,7 +114,7 @@ namespace Comfizen
             {
                 try
                 {
-                    var newImage = new ImageOutput(dialog.FileName);
+                    var newImage = await ImageOutput.FromFileAsync(dialog.FileName);
                     setImageAction(newImage);
                 }
                 catch (Exception ex)
@@ -128,7 +128,7 @@ namespace Comfizen
         /// <summary>
         /// Handles drop operations from both the internal gallery and the file system.
         /// </summary>
-        public void HandleDrop(DragEventArgs e, string target)
+        public async void HandleDrop(DragEventArgs e, string target)
         {
             ImageOutput newImage = null;
 
@@ -143,7 +143,7 @@ namespace Comfizen
                     string filePath = files[0];
                     try
                     {
-                        newImage = new ImageOutput(filePath);
+                        newImage = await ImageOutput.FromFileAsync(filePath);
                     }
                     catch (Exception ex)
                     {
@@ -4,6 +4,8 @@ using System.Collections.ObjectModel;
 using System.ComponentModel;
 using System.IO;
 using System.Linq;
+using System.Threading;
+using System.Threading.Tasks;
 using System.Windows;
 using System.Windows.Forms; // Requires reference to System.Windows.Forms.dll
 using System.Windows.Input;
@@ -18,10 +20,15 @@ public class WildcardBrowserViewModel : INotifyPropertyChanged
     private readonly Window _hostWindow;
     private readonly Action<string> _insertAction;
     private List<string> _allWildcards;
+    private CancellationTokenSource _lineCountCts;
 
     public string SearchText { get; set; }
     public ObservableCollection<string> FilteredWildcards { get; } = new();
     public string SelectedWildcard { get; set; }
+    /// <summary>
+    /// The number of lines of the selected wildcard, or of all wildcards in a searched folder.
+    /// </summary>
+    public string LineCountText { get; private set; }
 
     public ICommand InsertCommand { get; }
     public ICommand CancelCommand { get; }
@@ -60,13 +67,17 @@ public class WildcardBrowserViewModel : INotifyPropertyChanged
         {
             FilterWildcards();
         }
+        else if (propertyName == nameof(SelectedWildcard))
+        {
+            UpdateLineCount();
+        }
     }
 
     private void LoadWildcards()
     {
         // FIX: Use the central WildcardFileHandler to get ALL wildcard names, including from YAML.
+        // The list is shared and already sorted; it must not be modified here.
         _allWildcards = WildcardFileHandler.GetAllWildcardNames();
-        _allWildcards.Sort();
         FilterWildcards();
     }
 
@@ -80,6 +91,18 @@ public class WildcardBrowserViewModel : INotifyPropertyChanged
             return;
         }
 
+        // Paths and glob patterns ("poses/", "poses/style_*") are answered by the name index,
+        // without scanning every name.
+        var searchText = SearchText.Trim();
+        if (searchText.Contains('/') || searchText.Contains('*'))
+        {
+            var index = WildcardFileHandler.GetNameIndex();
+            var matches = searchText.Contains('*') ? index.FindByGlob(searchText) : index.FindByPrefix(searchText);
+            foreach (var item in matches) FilteredWildcards.Add(item);
+            UpdateLineCount();
+            return;
+        }
+
         // Split the search text into multiple terms
         var searchTerms = SearchText.Split(new[] { ' ' }, StringSplitOptions.RemoveEmptyEntries);
 
@@ -96,6 +119,54 @@ public class WildcardBrowserViewModel : INotifyPropertyChanged
         }
     }
     
+    /// <summary>
+    /// Counts the lines in the background, since it may read large files or every file of a folder.
+    /// A count that is still running when the selection changes is cancelled.
+    /// </summary>
+    private async void UpdateLineCount()
+    {
+        _lineCountCts?.Cancel();
+        _lineCountCts = null;
+
+        var selected = SelectedWildcard;
+        var folder = SearchText?.Trim();
+        if (string.IsNullOrEmpty(selected) && folder?.EndsWith("/") != true)
+        {
+            LineCountText = null;
+            return;
+        }
+
+        var cts = new CancellationTokenSource();
+        _lineCountCts = cts;
+        LineCountText = LocalizationService.Instance["WildcardBrowser_CountingLines"];
+        try
+        {
+            // Debounced, so that moving through the list does not count every wildcard passed on the way.
+            await Task.Delay(150, cts.Token);
+            long count = await Task.Run(() =>
+            {
+                var index = WildcardFileHandler.GetNameIndex();
+                return !string.IsNullOrEmpty(selected) ? index.GetLineCount(selected) : index.GetFolderLineCount(folder, cts.Token);
+            }, cts.Token);
+            if (cts.IsCancellationRequested) return;
+            LineCountText = string.Format(LocalizationService.Instance["WildcardBrowser_LineCount"], count);
+        }
+        catch (OperationCanceledException)
+        {
+            // Superseded by a newer selection
+        }
+        catch (Exception ex)
+        {
+            Logger.Log(ex, "Failed to count the lines of the selected wildcards");
+            if (!cts.IsCancellationRequested) LineCountText = null;
+        }
+        finally
+        {
+            if (_lineCountCts == cts) _lineCountCts = null;
+            cts.Dispose();
+        }
+    }
+
     // --- Methods for Commands ---
 
     public void InsertAndClose() 
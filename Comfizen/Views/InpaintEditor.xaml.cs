@@ -636,9 +636,9 @@ namespace Comfizen
         {
             if (!_imageEditingEnabled) return;
 
-            if (e.Data.GetData(typeof(ImageOutput)) is ImageOutput imageOutput && imageOutput.ImageBytes != null)
+            if (e.Data.GetData(typeof(ImageOutput)) is ImageOutput imageOutput && imageOutput.ReadContent() is { } content)
             {
-                SetSourceImage(imageOutput.ImageBytes);
+                SetSourceImage(content);
             }
             else if (e.Data.GetData(DataFormats.FileDrop) is string[] files && files.Length > 0)
             {
@@ -49,8 +49,7 @@ namespace Comfizen
             }
             
             // --- STAGE 2: Process all .yaml/.yml files and merge them ---
-            var yamlFiles = Directory.GetFiles(sourceDirectory, "*.yaml", SearchOption.AllDirectories)
-                                     .Concat(Directory.GetFiles(sourceDirectory, "*.yml", SearchOption.AllDirectories));
+            var yamlFiles = GetYamlFiles(sourceDirectory);
             var deserializer = new DeserializerBuilder()
                 .WithAttemptingUnquotedStringTypeDeserialization()
                 .Build();
@@ -80,6 +79,76 @@ namespace Comfizen
             File.WriteAllText(outputYamlFile, finalYaml);
         }
         
+        /// <summary>
+        /// The YAML wildcard files of a directory, in the order in which later files override earlier ones
+        /// (see <see cref="YamlFileOrder"/>).
+        /// </summary>
+        internal static IEnumerable<string> GetYamlFiles(string directory)
+        {
+            return Directory.GetFiles(directory, "*.yaml", SearchOption.AllDirectories)
+                .Concat(Directory.GetFiles(directory, "*.yml", SearchOption.AllDirectories))
+                .OrderBy(file => file, YamlFileOrder);
+        }
+
+        /// <summary>
+        /// The order in which YAML wildcard files override each other: .yaml files before .yml files, each by path.
+        /// </summary>
+        internal static readonly IComparer<string> YamlFileOrder = Comparer<string>.Create((a, b) =>
+        {
+            int byExtension = IsYml(a).CompareTo(IsYml(b));
+            return byExtension != 0 ? byExtension : StringComparer.OrdinalIgnoreCase.Compare(a, b);
+        });
+
+        private static bool IsYml(string file) => string.Equals(Path.GetExtension(file), ".yml", StringComparison.OrdinalIgnoreCase);
+
+        /// <summary>
+        /// Parses a YAML wildcard file into its wildcards: nested keys are joined with '/' into names,
+        /// and every list is the lines of one wildcard. If the file starts with the weights marker, the lines of its
+        /// wildcards may have weights (see <see cref="WeightedWildcardLines"/>). Throws if the file cannot be read or parsed.
+        /// </summary>
+        internal static List<KeyValuePair<string, IReadOnlyList<string>>> ReadYamlWildcards(string filePath)
+        {
+            var yamlContent = File.ReadAllText(filePath);
+            var firstLineEnd = yamlContent.IndexOf('\n');
+            var weighted = LineWeights.IsMarker(firstLineEnd < 0 ? yamlContent : yamlContent.Substring(0, firstLineEnd));
+            var deserializer = new DeserializerBuilder()
+                .WithAttemptingUnquotedStringTypeDeserialization() // Important for values that aren't quoted
+                .Build();
+
+            // Deserialize into a generic object structure
+            var root = deserializer.Deserialize<Dictionary<object, object>>(yamlContent);
+
+            var wildcards = new List<KeyValuePair<string, string[]>>();
+            if (root != null)
+            {
+                FlattenYamlNode(root, "", wildcards);
+            }
+            return wildcards
+                .Select(w => new KeyValuePair<string, IReadOnlyList<string>>(w.Key, weighted ? new WeightedWildcardLines(w.Value) : w.Value))
+                .ToList();
+        }
+
+        /// <summary>
+        /// Recursively traverses the deserialized YAML object and flattens it into name/lines pairs.
+        /// </summary>
+        private static void FlattenYamlNode(object node, string currentPath, List<KeyValuePair<string, string[]>> wildcards)
+        {
+            // Handle dictionary nodes (nested structures)
+            if (node is Dictionary<object, object> dict)
+            {
+                foreach (var kvp in dict)
+                {
+                    var newPath = string.IsNullOrEmpty(currentPath) ? kvp.Key.ToString() : $"{currentPath}/{kvp.Key}";
+                    FlattenYamlNode(kvp.Value, newPath, wildcards);
+                }
+            }
+            // Handle list nodes (the actual wildcard lines)
+            else if (node is List<object> list)
+            {
+                wildcards.Add(new KeyValuePair<string, string[]>(currentPath, list.Select(item => item.ToString()).ToArray()));
+            }
+        }
+
         /// <summary>
         /// Recursively merges a source dictionary into a target dictionary.
         /// </summary>
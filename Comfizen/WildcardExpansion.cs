@@ -0,0 +1,160 @@
+using System;
+using System.Collections.Generic;
+using System.Numerics;
+using System.Threading.Tasks;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// Expands a prompt template many times at once: for a list of seeds, in parallel, or exhaustively,
+    /// as every combination the template can produce.
+    /// </summary>
+    public static class WildcardExpansion
+    {
+        /// <summary>
+        /// Expands the template once per seed. The expansions run in parallel, but every result depends only on
+        /// its seed and the field path, so results[i] is what <see cref="WildcardProcessor"/> returns for seeds[i].
+        /// </summary>
+        public static string[] ExpandMany(string template, IReadOnlyList<long> seeds, string fieldPath = null)
+        {
+            var results = new string[seeds.Count];
+            if (string.IsNullOrEmpty(template) || WildcardTemplate.Parse(template).IsPlainText)
+            {
+                Array.Fill(results, template);
+                return results;
+            }
+
+            Parallel.For(0, seeds.Count, i => results[i] = new WildcardProcessor(seeds[i], fieldPath).Process(template));
+            return results;
+        }
+
+        /// <summary>
+        /// Expands the template for the seeds firstSeed, firstSeed + 1, ... (count seeds in total).
+        /// </summary>
+        public static string[] ExpandRange(string template, long firstSeed, int count, string fieldPath = null)
+        {
+            var seeds = new long[count];
+            for (int i = 0; i < count; i++)
+            {
+                seeds[i] = firstSeed + i;
+            }
+            return ExpandMany(template, seeds, fieldPath);
+        }
+
+        /// <summary>
+        /// The number of results <see cref="EnumerateCombinations"/> yields, without enumerating them.
+        /// </summary>
+        public static BigInteger CountCombinations(string template)
+        {
+            if (string.IsNullOrEmpty(template)) return BigInteger.One;
+            return WildcardTemplate.Parse(template).Root.CountCombinations(new WildcardCombinationCounter(), 0);
+        }
+
+        /// <summary>
+        /// Lazily yields every prompt the template can expand to: every line of each wildcard and every option of each
+        /// choice; {k$$...} yields every k-subset of its options in the order they are written.
+        /// Weights do not matter here, and wildcards nested deeper than the processor allows are left unexpanded.
+        /// </summary>
+        public static IEnumerable<string> EnumerateCombinations(string template)
+        {
+            if (string.IsNullOrEmpty(template)) return new[] { template };
+            return WildcardTemplate.Parse(template).Root.EnumerateCombinations(0);
+        }
+
+        /// <summary>
+        /// Every expansion of a wildcard line, mirroring <see cref="WildcardProcessor.ExpandLine"/>.
+        /// </summary>
+        internal static IEnumerable<string> EnumerateLine(string line, int depth)
+        {
+            var template = WildcardTemplate.Parse(line);
+            if (template.IsPlainText || depth >= WildcardProcessor.MaxDepth) return new[] { line };
+            return template.Root.EnumerateCombinations(depth + 1);
+        }
+
+        /// <summary>
+        /// Every way to pick one result of each part, joined with the separator. Parts are enumerated again for every
+        /// combination of the parts before them, so nothing but the current combination is kept.
+        /// </summary>
+        internal static IEnumerable<string> Concatenations(IReadOnlyList<Func<IEnumerable<string>>> parts, string separator)
+        {
+            foreach (var values in Products(parts))
+            {
+                yield return string.Join(separator, values);
+            }
+        }
+
+        /// <summary>
+        /// The cartesian product of the alternatives, as one array per combination (reused between combinations).
+        /// </summary>
+        internal static IEnumerable<string[]> Products(IReadOnlyList<Func<IEnumerable<string>>> alternatives)
+        {
+            var values = new string[alternatives.Count];
+            return Products(alternatives, 0, values);
+        }
+
+        private static IEnumerable<string[]> Products(IReadOnlyList<Func<IEnumerable<string>>> alternatives, int index, string[] values)
+        {
+            if (index == alternatives.Count)
+            {
+                yield return values;
+                yield break;
+            }
+            foreach (var value in alternatives[index]())
+            {
+                values[index] = value;
+                foreach (var product in Products(alternatives, index + 1, values))
+                {
+                    yield return product;
+                }
+            }
+        }
+
+        /// <summary>
+        /// The k-subsets of [0, n) in lexicographic order, as one array per subset (reused between subsets).
+        /// </summary>
+        internal static IEnumerable<int[]> Subsets(int n, int k)
+        {
+            var subset = new int[k];
+            for (int i = 0; i < k; i++)
+            {
+                subset[i] = i;
+            }
+            while (true)
+            {
+                yield return subset;
+
+                // Advance the last position that can still move right and reset the ones after it.
+                int position = k - 1;
+                while (position >= 0 && subset[position] == n - k + position) position--;
+                if (position < 0) yield break;
+                subset[position]++;
+                for (int i = position + 1; i < k; i++)
+                {
+                    subset[i] = subset[i - 1] + 1;
+                }
+            }
+        }
+    }
+
+    /// <summary>
+    /// Remembers the combination count of every wildcard line at every depth while counting a template, so that
+    /// lines that are reached again (e.g. wildcards that reference each other) are only counted once.
+    /// </summary>
+    internal sealed class WildcardCombinationCounter
+    {
+        private readonly Dictionary<(string Line, int Depth), BigInteger> _lineCounts = new Dictionary<(string Line, int Depth), BigInteger>();
+
+        public BigInteger CountLine(string line, int depth)
+        {
+            var template = WildcardTemplate.Parse(line);
+            if (template.IsPlainText || depth >= WildcardProcessor.MaxDepth) return BigInteger.One;
+
+            if (!_lineCounts.TryGetValue((line, depth), out var count))
+            {
+                count = template.Root.CountCombinations(this, depth + 1);
+                _lineCounts[(line, depth)] = count;
+            }
+            return count;
+        }
+    }
+}
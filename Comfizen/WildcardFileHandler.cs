@@ -3,8 +3,7 @@ using System.Collections.Concurrent;
 using System.Collections.Generic;
 using System.IO;
 using System.Linq;
-using System.Text.RegularExpressions;
-using YamlDotNet.Serialization;
+using System.Threading;
 
 namespace Comfizen;
 
@@ -18,17 +17,41 @@ public static class WildcardFileHandler
     // Change: WildcardsDirectory is now a property that checks if an override is set.
     private static string WildcardsDirectory => _testOverrideDirectory ?? _productionDirectory;
         
-    // Cache for file content (key: wildcard name, value: array of lines)
-    private static readonly ConcurrentDictionary<string, string[]> _contentCache = new ConcurrentDictionary<string, string[]>();
-    // Cache for the complete list of all wildcard names found on disk
+    // Files at least this large are not read into memory; their lines are read and decoded on demand (see IndexedWildcardFile).
+    private const long IndexedFileThreshold = 16 * 1024 * 1024;
+
+    // Cache for .txt file content (key: wildcard name, value: its lines), including empty results for missing names
+    private static readonly ConcurrentDictionary<string, IReadOnlyList<string>> _contentCache = new ConcurrentDictionary<string, IReadOnlyList<string>>(StringComparer.OrdinalIgnoreCase);
+    // Wildcards defined in YAML files; they override .txt files with the same name
+    private static readonly ConcurrentDictionary<string, IReadOnlyList<string>> _yamlContent = new ConcurrentDictionary<string, IReadOnlyList<string>>(StringComparer.OrdinalIgnoreCase);
+    // The YAML files compiled into one pack, so that they are not parsed on every start (see LoadYamlFiles).
+    // Owned by the handler: it is disposed when it is replaced or the caches are cleared.
+    private static WildcardPack _yamlPack;
+    // The wildcards each YAML file defines, so that a changed file can be re-flattened on its own
+    private static readonly Dictionary<string, Dictionary<string, IReadOnlyList<string>>> _yamlWildcardsByFile = new Dictionary<string, Dictionary<string, IReadOnlyList<string>>>(StringComparer.OrdinalIgnoreCase);
+    // The YAML files that define each name, in the order they override each other (the last one is in _yamlContent)
+    private static readonly Dictionary<string, List<string>> _yamlFilesByName = new Dictionary<string, List<string>>(StringComparer.OrdinalIgnoreCase);
+    // YAML files changed on disk since they were parsed; they are re-parsed on the next lookup
+    private static readonly HashSet<string> _dirtyYamlFiles = new HashSet<string>(StringComparer.OrdinalIgnoreCase);
+    private static volatile bool _hasDirtyYamlFiles;
+    // Cache for the line sets of single wildcards (views over the cached lines, nothing is copied)
+    private static readonly ConcurrentDictionary<string, WildcardLineSet> _lineSetCache = new ConcurrentDictionary<string, WildcardLineSet>(StringComparer.OrdinalIgnoreCase);
+    // Cache for glob patterns (key: pattern, value: the line set over all matching wildcards)
+    private static readonly ConcurrentDictionary<string, WildcardLineSet> _globCache = new ConcurrentDictionary<string, WildcardLineSet>(StringComparer.OrdinalIgnoreCase);
+    // Cache for the complete list of all wildcard names found on disk, and the same names as a trie for prefix and glob queries
     private static List<string> _allWildcardNamesCache;
+    private static WildcardNameIndex _nameIndex;
     private static readonly object _listCacheLock = new object();
     
     private static bool _yamlParsed = false;
     private static readonly object _yamlParseLock = new object();
 
-    // New methods for testing, will only be compiled in DEBUG mode.
-#if DEBUG
+    // Incremented on every invalidation, so that a read that raced with a file change is not cached.
+    private static int _version;
+    private static FileSystemWatcher _watcher;
+
+    // New methods for testing, will only be compiled in DEBUG mode (and for the benchmarks, see Comfizen.Benchmarks).
+#if DEBUG || BENCHMARK
     /// <summary>
     /// Overrides the wildcard directory for unit testing and clears all caches.
     /// This method is only available in DEBUG builds.
@@ -37,9 +60,8 @@ public static class WildcardFileHandler
     {
         _testOverrideDirectory = path;
         // CRITICAL FIX: Reset all caches and flags when the directory changes.
-        _contentCache.Clear();
-        _allWildcardNamesCache = null;
-        _yamlParsed = false;
+        ClearCaches();
+        StartWatching();
     }
 
     /// <summary>
@@ -50,9 +72,8 @@ public static class WildcardFileHandler
     {
         _testOverrideDirectory = null;
         // CRITICAL FIX: Reset all caches and flags when the directory changes.
-        _contentCache.Clear();
-        _allWildcardNamesCache = null;
-        _yamlParsed = false;
+        ClearCaches();
+        StartWatching();
     }
 #endif
 
@@ -61,109 +82,243 @@ public static class WildcardFileHandler
         // The static constructor now ensures the *production* directory exists,
         // which is fine even during tests.
         Directory.CreateDirectory(WildcardsDirectory);
+        StartWatching();
     }
 
     /// <summary>
-    /// Gets the lines from a wildcard file or a set of files matching a glob pattern.
+    /// Gets the lines from a wildcard file or a set of files matching a glob pattern, without their weights.
     /// Also handles wildcards defined in YAML files.
-    /// Results are cached.
+    /// The result is a random-access view: lines of large files are only read when they are accessed.
+    /// </summary>
+    public static IReadOnlyList<string> GetLines(string wildcardPattern)
+    {
+        return GetLineSet(wildcardPattern);
+    }
+
+    /// <summary>
+    /// Gets the lines of a wildcard or of all wildcards matching a glob pattern as a <see cref="WildcardLineSet"/>,
+    /// which picks lines by index and weight without copying the files' lines. Results are cached.
     /// </summary>
-    public static string[] GetLines(string wildcardPattern)
+    public static WildcardLineSet GetLineSet(string wildcardPattern)
     {
         // This ensures that YAML files are parsed before any wildcard is requested.
         EnsureYamlIsParsed();
 
-        if (_contentCache.TryGetValue(wildcardPattern, out var cachedLines))
-        {
-            return cachedLines;
-        }
-
-        string[] lines;
         if (wildcardPattern.Contains('*'))
         {
-            lines = GetLinesFromGlob(wildcardPattern);
+            return GetLineSetFromGlob(wildcardPattern);
         }
-        else
+        if (_lineSetCache.TryGetValue(wildcardPattern, out var lineSet))
         {
-            lines = GetLinesFromFile(wildcardPattern);
+            return lineSet;
         }
 
-        // Cache the final aggregated result for the pattern
-        // Note: Caching an empty result for a non-existent wildcard is important to avoid re-scans.
-        _contentCache.TryAdd(wildcardPattern, lines);
-        return lines;
+        var version = Volatile.Read(ref _version);
+        var lines = GetLinesFromFile(wildcardPattern);
+        lineSet = lines.Count == 0 ? WildcardLineSet.Empty : new WildcardLineSet(new[] { lines });
+        return CacheIfCurrent(_lineSetCache, wildcardPattern, lineSet, version);
     }
     
     private static void EnsureYamlIsParsed()
     {
-        if (_yamlParsed) return;
+        if (_yamlParsed && !_hasDirtyYamlFiles) return;
         lock (_yamlParseLock)
         {
-            if (_yamlParsed) return;
-                
-            if (!Directory.Exists(WildcardsDirectory))
+            if (!_yamlParsed)
             {
-                Directory.CreateDirectory(WildcardsDirectory);
+                if (!Directory.Exists(WildcardsDirectory))
+                {
+                    Directory.CreateDirectory(WildcardsDirectory);
+                    _yamlParsed = true;
+                    return;
+                }
+
+                LoadYamlFiles();
+                
+                _dirtyYamlFiles.Clear();
+                _hasDirtyYamlFiles = false;
                 _yamlParsed = true;
                 return;
             }
 
-            var yamlFiles = Directory.GetFiles(WildcardsDirectory, "*.yaml", SearchOption.AllDirectories)
-                .Concat(Directory.GetFiles(WildcardsDirectory, "*.yml", SearchOption.AllDirectories));
-
-            foreach (var file in yamlFiles)
+            // Only the YAML files that changed since the last lookup are re-flattened.
+            foreach (var file in _dirtyYamlFiles)
             {
-                ParseAndCacheYamlFile(file);
+                ReparseYamlFile(file);
             }
-                
-            _yamlParsed = true;
+            _dirtyYamlFiles.Clear();
+            _hasDirtyYamlFiles = false;
         }
     }
 
-    private static void ParseAndCacheYamlFile(string filePath)
+    /// <summary>
+    /// Loads the wildcards of all YAML files: from the compiled pack where it still matches the files, parsing only
+    /// the files that were added or changed since it was compiled, and recompiles the pack if there were any.
+    /// Must be called under <see cref="_yamlParseLock"/>.
+    /// </summary>
+    private static void LoadYamlFiles()
     {
-        try
+        var stopwatch = System.Diagnostics.Stopwatch.StartNew();
+        var pack = WildcardPack.TryOpen(WildcardPack.FindLatestPackPath(WildcardsDirectory));
+        var packedEntries = pack?.Entries.ToLookup(e => e.SourceIndex);
+
+        var files = WildcardConverter.GetYamlFiles(WildcardsDirectory).ToList();
+        var sources = new List<WildcardPack.Source>();
+        var entries = new List<WildcardPack.Entry>();
+        int parsedCount = 0;
+        foreach (var file in files)
         {
-            var yamlContent = File.ReadAllText(filePath);
-            var deserializer = new DeserializerBuilder()
-                .WithAttemptingUnquotedStringTypeDeserialization() // Important for values that aren't quoted
-                .Build();
+            // Stamped before reading, so that a change during the read makes the pack stale rather than wrong.
+            var source = WildcardPack.Source.FromFile(WildcardsDirectory, new FileInfo(file));
+            int sourceIndex = sources.Count;
+            sources.Add(source);
 
-            // Deserialize into a generic object structure
-            var root = deserializer.Deserialize<Dictionary<object, object>>(yamlContent);
+            int packed = pack?.FindSource(source) ?? -1;
+            if (packed >= 0)
+            {
+                entries.AddRange(packedEntries[packed].Select(e => e with { SourceIndex = sourceIndex }));
+                continue;
+            }
 
-            if (root != null)
+            parsedCount++;
+            try
             {
-                FlattenAndCacheYamlNode(root, "");
+                entries.AddRange(WildcardConverter.ReadYamlWildcards(file).Select(w => new WildcardPack.Entry(sourceIndex, w.Key, w.Value)));
+            }
+            catch (Exception ex)
+            {
+                // Stays in the pack without wildcards, so that it is not parsed again until it changes.
+                Logger.Log(ex, $"Failed to parse YAML wildcard file: {file}. It will be skipped.");
             }
         }
-        catch (Exception ex)
+
+        if (parsedCount > 0 || sources.Count != (pack?.Sources.Count ?? 0))
+        {
+            // Written to a new file: the old pack stays readable for the lines that are still in use.
+            var packPath = WildcardPack.CreatePackPath(WildcardsDirectory);
+            try
+            {
+                WildcardPack.Write(packPath, sources, entries);
+                var newPack = WildcardPack.TryOpen(packPath);
+                if (newPack != null)
+                {
+                    pack?.Dispose();
+                    pack = newPack;
+                    entries = pack.Entries.ToList();
+                }
+            }
+            catch (Exception ex)
+            {
+                // Only costs parsing the YAML files again on the next start.
+                Logger.Log(ex, $"Failed to compile the YAML wildcards into {packPath}.");
+            }
+        }
+        _yamlPack?.Dispose();
+        _yamlPack = pack;
+        WildcardPack.DeleteUnusedPacks(WildcardsDirectory, _yamlPack?.FilePath);
+
+        var wildcardsBySource = sources.Select(_ => new Dictionary<string, IReadOnlyList<string>>(StringComparer.OrdinalIgnoreCase)).ToList();
+        foreach (var entry in entries)
+        {
+            wildcardsBySource[entry.SourceIndex][entry.Name] = entry.Lines;
+        }
+        for (int i = 0; i < files.Count; i++)
         {
-            Logger.Log(ex, $"Failed to parse YAML wildcard file: {filePath}. It will be skipped.");
+            AddYamlWildcards(files[i], wildcardsBySource[i]);
+        }
+        foreach (var name in _yamlFilesByName.Keys.ToList())
+        {
+            ResolveYamlName(name);
+        }
+
+        if (files.Count > 0)
+        {
+            Logger.Log($"Loaded {entries.Count} YAML wildcards from {files.Count} files ({parsedCount} parsed, the rest from the compiled pack) in {stopwatch.ElapsedMilliseconds} ms.");
         }
     }
-    
+
+    /// <summary>
+    /// Replaces the wildcards defined by one YAML file with its current content. Must be called under <see cref="_yamlParseLock"/>.
+    /// </summary>
+    private static void ReparseYamlFile(string filePath)
+    {
+        var oldKeys = RemoveYamlWildcards(filePath);
+        IEnumerable<string> newKeys = Array.Empty<string>();
+
+        if (File.Exists(filePath))
+        {
+            try
+            {
+                var wildcards = new Dictionary<string, IReadOnlyList<string>>(StringComparer.OrdinalIgnoreCase);
+                foreach (var wildcard in WildcardConverter.ReadYamlWildcards(filePath))
+                {
+                    wildcards[wildcard.Key] = wildcard.Value;
+                }
+                AddYamlWildcards(filePath, wildcards);
+                newKeys = wildcards.Keys;
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, $"Failed to parse YAML wildcard file: {filePath}. It will be skipped.");
+            }
+        }
+
+        foreach (var key in oldKeys.Union(newKeys, StringComparer.OrdinalIgnoreCase).ToList())
+        {
+            ResolveYamlName(key);
+            InvalidateName(key);
+            UpdateNameList(key);
+        }
+    }
+
     /// <summary>
-    /// Recursively traverses the deserialized YAML object, flattens it into key/value pairs,
-    /// and adds them to the content cache.
+    /// Records the wildcards a YAML file defines. The names are resolved by <see cref="ResolveYamlName"/>.
     /// </summary>
-    private static void FlattenAndCacheYamlNode(object node, string currentPath)
+    private static void AddYamlWildcards(string filePath, Dictionary<string, IReadOnlyList<string>> wildcards)
     {
-        // Handle dictionary nodes (nested structures)
-        if (node is Dictionary<object, object> dict)
+        _yamlWildcardsByFile[filePath] = wildcards;
+        foreach (var name in wildcards.Keys)
         {
-            foreach (var kvp in dict)
+            if (!_yamlFilesByName.TryGetValue(name, out var files))
             {
-                var newPath = string.IsNullOrEmpty(currentPath) ? kvp.Key.ToString() : $"{currentPath}/{kvp.Key}";
-                FlattenAndCacheYamlNode(kvp.Value, newPath);
+                files = new List<string>();
+                _yamlFilesByName[name] = files;
             }
+            int index = files.BinarySearch(filePath, WildcardConverter.YamlFileOrder);
+            if (index < 0) files.Insert(~index, filePath);
         }
-        // Handle list nodes (the actual wildcard lines)
-        else if (node is List<object> list)
+    }
+
+    /// <summary>
+    /// Forgets the wildcards of a YAML file and returns their names, which still have to be resolved.
+    /// </summary>
+    private static IReadOnlyCollection<string> RemoveYamlWildcards(string filePath)
+    {
+        if (!_yamlWildcardsByFile.Remove(filePath, out var wildcards)) return Array.Empty<string>();
+        foreach (var name in wildcards.Keys)
         {
-            var lines = list.Select(item => item.ToString()).ToArray();
-            // Add the flattened path and its lines to the cache. This will override any .txt file with the same name.
-            _contentCache[currentPath] = lines;
+            if (_yamlFilesByName.TryGetValue(name, out var files))
+            {
+                files.Remove(filePath);
+            }
+        }
+        return wildcards.Keys;
+    }
+
+    /// <summary>
+    /// Sets a name to its definition in the last YAML file that defines it, as a full load in file order does,
+    /// or removes it if no YAML file does. A YAML definition overrides any .txt file with the same name.
+    /// </summary>
+    private static void ResolveYamlName(string name)
+    {
+        if (_yamlFilesByName.TryGetValue(name, out var files) && files.Count > 0)
+        {
+            _yamlContent[name] = _yamlWildcardsByFile[files[^1]][name];
+        }
+        else
+        {
+            _yamlFilesByName.Remove(name);
+            _yamlContent.TryRemove(name, out _);
         }
     }
 
@@ -178,7 +333,7 @@ public static class WildcardFileHandler
         {
             if (_allWildcardNamesCache != null) return _allWildcardNamesCache;
 
-            var names = new HashSet<string>(); // Use HashSet to handle duplicates gracefully
+            var names = new HashSet<string>(StringComparer.OrdinalIgnoreCase); // Use HashSet to handle duplicates gracefully
             try
             {
                 if (Directory.Exists(WildcardsDirectory))
@@ -193,8 +348,8 @@ public static class WildcardFileHandler
                     }
                 }
                     
-                // 2. Add names from the cache (which now includes YAML keys)
-                foreach (var key in _contentCache.Keys)
+                // 2. Add names defined in YAML files
+                foreach (var key in _yamlContent.Keys)
                 {
                     names.Add(key);
                 }
@@ -205,63 +360,320 @@ public static class WildcardFileHandler
                 return new List<string>(); 
             }
             _allWildcardNamesCache = names.ToList();
-            _allWildcardNamesCache.Sort(); // Keep it sorted
+            _allWildcardNamesCache.Sort(StringComparer.OrdinalIgnoreCase); // Keep it sorted
+            _nameIndex = new WildcardNameIndex(_allWildcardNamesCache, CountLines);
             return _allWildcardNamesCache;
         }
     }
 
-    private static string[] GetLinesFromFile(string wildcardName)
+    /// <summary>
+    /// Gets the index of all wildcard names, for prefix and glob queries and line counts that do not load the files.
+    /// It is kept up to date together with <see cref="GetAllWildcardNames"/>.
+    /// </summary>
+    public static WildcardNameIndex GetNameIndex()
+    {
+        var names = GetAllWildcardNames();
+        lock (_listCacheLock)
+        {
+            if (_nameIndex != null) return _nameIndex;
+        }
+        // The directory scan failed, or the caches were cleared in the meantime: answer from the names at hand.
+        return new WildcardNameIndex(names, CountLines);
+    }
+
+    private static int CountLines(string wildcardName)
     {
+        if (_yamlContent.TryGetValue(wildcardName, out var yamlLines)) return yamlLines.Count;
+        if (_contentCache.TryGetValue(wildcardName, out var cachedLines)) return cachedLines.Count;
+
+        var fullPath = Path.Combine(WildcardsDirectory, wildcardName.Replace('/', Path.DirectorySeparatorChar) + ".txt");
+        try
+        {
+            var fileInfo = new FileInfo(fullPath);
+            if (!fileInfo.Exists) return 0;
+            // A large file is opened through its index, which holds the count; a small one is only scanned.
+            return fileInfo.Length >= IndexedFileThreshold ? GetLinesFromFile(wildcardName).Count : IndexedWildcardFile.CountLines(fullPath);
+        }
+        catch (Exception ex)
+        {
+            Logger.Log(ex, $"Failed to count the lines of wildcard file: {fullPath}.");
+            return 0;
+        }
+    }
+
+    private static IReadOnlyList<string> GetLinesFromFile(string wildcardName)
+    {
+        if (_yamlContent.TryGetValue(wildcardName, out var yamlLines))
+        {
+            return yamlLines;
+        }
         if (_contentCache.TryGetValue(wildcardName, out var cachedLines))
         {
             return cachedLines;
         }
 
+        var version = Volatile.Read(ref _version);
         var relativePath = wildcardName.Replace('/', Path.DirectorySeparatorChar).Replace('\\', Path.DirectorySeparatorChar) + ".txt";
         var fullPath = Path.Combine(WildcardsDirectory, relativePath);
 
-        if (!File.Exists(fullPath))
+        IReadOnlyList<string> lines;
+        var fileInfo = new FileInfo(fullPath);
+        if (!fileInfo.Exists)
+        {
+            // Note: Caching an empty result for a non-existent wildcard is important to avoid re-scans.
+            lines = Array.Empty<string>();
+        }
+        else
         {
-            return Array.Empty<string>();
+            try
+            {
+                if (fileInfo.Length >= IndexedFileThreshold)
+                {
+                    lines = IndexedWildcardFile.Open(fullPath);
+                }
+                else
+                {
+                    var allLines = File.ReadAllLines(fullPath);
+                    var kept = allLines.Where(l => !string.IsNullOrWhiteSpace(l) && !l.StartsWith("#")).ToArray();
+                    lines = allLines.Length > 0 && LineWeights.IsMarker(allLines[0]) ? new WeightedWildcardLines(kept) : kept;
+                }
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, $"Failed to read wildcard file: {fullPath}. It will be treated as empty.");
+                // Cache the empty result to avoid re-reading a problematic file (until it changes)
+                lines = Array.Empty<string>();
+            }
         }
 
-        try
+        return CacheIfCurrent(_contentCache, wildcardName, lines, version);
+    }
+
+    private static WildcardLineSet GetLineSetFromGlob(string globPattern)
+    {
+        if (_globCache.TryGetValue(globPattern, out var cached))
         {
-            var lines = File.ReadAllLines(fullPath)
-                .Where(l => !string.IsNullOrWhiteSpace(l) && !l.StartsWith("#"))
-                .ToArray();
+            return cached;
+        }
+
+        var version = Volatile.Read(ref _version);
+
+        // The member files are referenced, not concatenated.
+        var segments = GetNameIndex().FindByGlob(globPattern)
+            .Select(GetLinesFromFile)
+            .Where(lines => lines.Count > 0)
+            .ToList();
             
-            _contentCache.TryAdd(wildcardName, lines);
-            return lines;
+        var lineSet = segments.Count == 0 ? WildcardLineSet.Empty : new WildcardLineSet(segments);
+        return CacheIfCurrent(_globCache, globPattern, lineSet, version);
+    }
+
+    /// <summary>
+    /// Caches a value unless the wildcard files changed while it was being read.
+    /// Returns the value to use: the one another thread cached first, if any.
+    /// </summary>
+    private static T CacheIfCurrent<T>(ConcurrentDictionary<string, T> cache, string key, T value, int version)
+    {
+        var cached = cache.GetOrAdd(key, value);
+        if (!EqualityComparer<T>.Default.Equals(cached, value))
+        {
+            return cached;
+        }
+        if (Volatile.Read(ref _version) != version)
+        {
+            cache.TryRemove(new KeyValuePair<string, T>(key, value));
+        }
+        return value;
+    }
+
+    #region File system watching
+
+    /// <summary>
+    /// Watches the wildcard directory and invalidates only what a change affects: the changed .txt file,
+    /// the wildcards of a changed YAML file, the glob results that include them and their entries in the name list.
+    /// </summary>
+    private static void StartWatching()
+    {
+        _watcher?.Dispose();
+        _watcher = null;
+        try
+        {
+            _watcher = new FileSystemWatcher(WildcardsDirectory)
+            {
+                IncludeSubdirectories = true,
+                NotifyFilter = NotifyFilters.FileName | NotifyFilters.DirectoryName | NotifyFilters.LastWrite | NotifyFilters.Size,
+                InternalBufferSize = 64 * 1024
+            };
+            _watcher.Changed += (_, e) => OnPathChanged(e.FullPath, e.ChangeType);
+            _watcher.Created += (_, e) => OnPathChanged(e.FullPath, e.ChangeType);
+            _watcher.Deleted += (_, e) => OnPathChanged(e.FullPath, e.ChangeType);
+            _watcher.Renamed += (_, e) =>
+            {
+                OnPathChanged(e.OldFullPath, WatcherChangeTypes.Deleted);
+                OnPathChanged(e.FullPath, WatcherChangeTypes.Created);
+            };
+            _watcher.Error += (_, e) =>
+            {
+                // Too many changes at once (buffer overflow): the individual events are lost, so start over.
+                Logger.Log($"Wildcard directory watcher error: {e.GetException()?.Message}. Reloading all wildcards.", LogLevel.Warning);
+                ClearCaches();
+            };
+            _watcher.EnableRaisingEvents = true;
+        }
+        catch (Exception ex)
+        {
+            Logger.Log(ex, "Failed to watch the wildcard directory. Changes to wildcard files will require a restart.");
+        }
+    }
+
+    private static void OnPathChanged(string fullPath, WatcherChangeTypes changeType)
+    {
+        try
+        {
+            var extension = Path.GetExtension(fullPath).ToLowerInvariant();
+            if (extension == ".txt")
+            {
+                var name = ToWildcardName(fullPath);
+                InvalidateName(name);
+                if (changeType != WatcherChangeTypes.Changed)
+                {
+                    UpdateNameList(name);
+                }
+            }
+            else if (extension == ".yaml" || extension == ".yml")
+            {
+                MarkYamlDirty(fullPath);
+            }
+            else if (changeType == WatcherChangeTypes.Deleted)
+            {
+                // A deleted (or moved away) directory reports no events for the files it contained.
+                OnDirectoryRemoved(fullPath);
+            }
+            else if (changeType == WatcherChangeTypes.Created && Directory.Exists(fullPath))
+            {
+                // A directory moved in: its files report no events of their own either.
+                foreach (var file in Directory.EnumerateFiles(fullPath, "*", SearchOption.AllDirectories))
+                {
+                    OnPathChanged(file, WatcherChangeTypes.Created);
+                }
+            }
         }
         catch (Exception ex)
         {
-            Logger.Log(ex, $"Failed to read wildcard file: {fullPath}. It will be treated as empty.");
-            // Cache the empty result to avoid re-reading a problematic file
-            _contentCache.TryAdd(wildcardName, Array.Empty<string>());
-            return Array.Empty<string>();
+            Logger.Log(ex, $"Failed to process a change of wildcard file: {fullPath}");
         }
     }
 
-    private static string[] GetLinesFromGlob(string globPattern)
+    private static void OnDirectoryRemoved(string fullPath)
     {
-        var allLines = new List<string>();
-        var allNames = GetAllWildcardNames();
-        var regex = new Regex(WildcardToRegex(globPattern), RegexOptions.IgnoreCase);
+        var prefix = ToWildcardName(fullPath) + "/";
+        List<string> names;
+        lock (_listCacheLock)
+        {
+            names = _nameIndex?.FindByPrefix(prefix) ?? new List<string>();
+        }
+        names.AddRange(_contentCache.Keys.Where(n => n.StartsWith(prefix, StringComparison.OrdinalIgnoreCase)));
+        foreach (var name in names.Distinct())
+        {
+            InvalidateName(name);
+            UpdateNameList(name);
+        }
 
-        var matchingNames = allNames.Where(name => regex.IsMatch(name));
+        var directoryPrefix = fullPath.TrimEnd(Path.DirectorySeparatorChar) + Path.DirectorySeparatorChar;
+        lock (_yamlParseLock)
+        {
+            foreach (var yamlFile in _yamlWildcardsByFile.Keys.Where(f => f.StartsWith(directoryPrefix, StringComparison.OrdinalIgnoreCase)))
+            {
+                _dirtyYamlFiles.Add(yamlFile);
+                _hasDirtyYamlFiles = true;
+            }
+        }
+    }
 
-        foreach (var name in matchingNames)
+    private static void MarkYamlDirty(string fullPath)
+    {
+        lock (_yamlParseLock)
         {
-            allLines.AddRange(GetLinesFromFile(name));
+            // Before the first full parse there is nothing to patch.
+            if (!_yamlParsed) return;
+            _dirtyYamlFiles.Add(fullPath);
+            _hasDirtyYamlFiles = true;
         }
-            
-        return allLines.ToArray();
     }
 
-    private static string WildcardToRegex(string pattern)
+    /// <summary>
+    /// Drops the cached content of a wildcard and every cached glob result that includes it.
+    /// </summary>
+    private static void InvalidateName(string name)
     {
-        // Convert glob pattern to a regex pattern that matches the whole string
-        return "^" + Regex.Escape(pattern).Replace("\\*", ".*") + "$";
+        Interlocked.Increment(ref _version);
+        _contentCache.TryRemove(name, out _);
+        _lineSetCache.TryRemove(name, out _);
+        _nameIndex?.InvalidateLineCount(name);
+        foreach (var pattern in _globCache.Keys)
+        {
+            if (WildcardNameIndex.IsGlobMatch(name, pattern))
+            {
+                _globCache.TryRemove(pattern, out _);
+            }
+        }
+    }
+
+    /// <summary>
+    /// Adds the name to, or removes it from, the cached name list depending on whether a .txt file or a YAML key still defines it.
+    /// The list is copied on write, so callers enumerating the previous list are not affected.
+    /// </summary>
+    private static void UpdateNameList(string name)
+    {
+        var relativePath = name.Replace('/', Path.DirectorySeparatorChar) + ".txt";
+        var exists = _yamlContent.ContainsKey(name) || File.Exists(Path.Combine(WildcardsDirectory, relativePath));
+        lock (_listCacheLock)
+        {
+            if (_allWildcardNamesCache == null) return; // Built on the next request
+
+            var index = _allWildcardNamesCache.BinarySearch(name, StringComparer.OrdinalIgnoreCase);
+            if (exists == index >= 0) return;
+
+            var names = new List<string>(_allWildcardNamesCache);
+            if (exists) names.Insert(~index, name);
+            else names.RemoveAt(index);
+            _allWildcardNamesCache = names;
+
+            if (exists) _nameIndex.Add(name);
+            else _nameIndex.Remove(name);
+        }
     }
+
+    private static string ToWildcardName(string fullPath)
+    {
+        var relativePath = Path.GetRelativePath(WildcardsDirectory, fullPath);
+        return Path.ChangeExtension(relativePath, null).Replace(Path.DirectorySeparatorChar, '/');
+    }
+
+    private static void ClearCaches()
+    {
+        Interlocked.Increment(ref _version);
+        lock (_yamlParseLock)
+        {
+            _contentCache.Clear();
+            _yamlContent.Clear();
+            // Closed once the reads in progress have finished.
+            _yamlPack?.Dispose();
+            _yamlPack = null;
+            _yamlWildcardsByFile.Clear();
+            _yamlFilesByName.Clear();
+            _dirtyYamlFiles.Clear();
+            _hasDirtyYamlFiles = false;
+            _lineSetCache.Clear();
+            _globCache.Clear();
+            _yamlParsed = false;
+        }
+        lock (_listCacheLock)
+        {
+            _allWildcardNamesCache = null;
+            _nameIndex = null;
+        }
+    }
+
+    #endregion
 }
\ No newline at end of file
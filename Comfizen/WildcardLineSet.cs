@@ -0,0 +1,381 @@
+using System;
+using System.Collections;
+using System.Collections.Generic;
+using System.Globalization;
+using System.IO;
+using System.Runtime.CompilerServices;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// The lines of a wildcard or of all wildcards matching a glob pattern, as a virtual concatenation of the
+    /// cached lines of its member files: nothing is copied, and a line is located by its index.
+    /// Lines of files that opt in to weights (see <see cref="WeightedWildcardLines"/>) may start with a weight,
+    /// e.g. "5::red" is picked five times as often as an unweighted line.
+    /// </summary>
+    public sealed class WildcardLineSet : IReadOnlyList<string>
+    {
+        public static readonly WildcardLineSet Empty = new WildcardLineSet(Array.Empty<IReadOnlyList<string>>());
+
+        // Alias tables are built once per cached file, however many line sets include it.
+        private static readonly ConditionalWeakTable<IReadOnlyList<string>, LineWeights> _weightsCache = new ConditionalWeakTable<IReadOnlyList<string>, LineWeights>();
+
+        private readonly IReadOnlyList<string>[] _segments;
+        private readonly int[] _offsets;
+        private readonly LineWeights[] _weights;
+        // Running total of the segment weights, only for weighted sets
+        private readonly double[] _cumulativeWeights;
+
+        public int Count { get; }
+
+        /// <summary>
+        /// True if any line has a weight; otherwise all lines are equally likely.
+        /// </summary>
+        public bool IsWeighted { get; }
+
+        public double TotalWeight { get; }
+
+        /// <summary>
+        /// The lines of the member files, as written (weights included).
+        /// </summary>
+        public IReadOnlyList<IReadOnlyList<string>> Segments => _segments;
+
+        internal WildcardLineSet(IReadOnlyList<IReadOnlyList<string>> segments)
+        {
+            _segments = new IReadOnlyList<string>[segments.Count];
+            _offsets = new int[segments.Count];
+            _weights = new LineWeights[segments.Count];
+            double totalWeight = 0;
+            for (int i = 0; i < segments.Count; i++)
+            {
+                _segments[i] = segments[i];
+                _offsets[i] = Count;
+                _weights[i] = _weightsCache.GetValue(segments[i], LineWeights.Create);
+                Count += segments[i].Count;
+                totalWeight += _weights[i]?.Total ?? segments[i].Count;
+                IsWeighted |= _weights[i] != null;
+            }
+            TotalWeight = totalWeight;
+
+            if (IsWeighted)
+            {
+                _cumulativeWeights = new double[_segments.Length];
+                double sum = 0;
+                for (int i = 0; i < _segments.Length; i++)
+                {
+                    sum += _weights[i]?.Total ?? _segments[i].Count;
+                    _cumulativeWeights[i] = sum;
+                }
+            }
+        }
+
+        /// <summary>
+        /// The text of a line, without its weight.
+        /// </summary>
+        public string this[int index]
+        {
+            get
+            {
+                int segment = FindSegment(_offsets, index);
+                var line = _segments[segment][index - _offsets[segment]];
+                return _weights[segment] == null ? line : LineWeights.StripWeight(line);
+            }
+        }
+
+        public IEnumerator<string> GetEnumerator()
+        {
+            for (int i = 0; i < Count; i++)
+            {
+                yield return this[i];
+            }
+        }
+
+        IEnumerator IEnumerable.GetEnumerator() => GetEnumerator();
+
+        public double GetWeight(int index)
+        {
+            int segment = FindSegment(_offsets, index);
+            return _weights[segment]?.GetWeight(index - _offsets[segment]) ?? 1;
+        }
+
+        /// <summary>
+        /// Picks the index of a line in O(1) (O(log segments) for weighted sets), with every line as likely as its weight.
+        /// </summary>
+        internal int Sample(WildcardRandom random)
+        {
+            if (!IsWeighted) return random.Next(Count);
+
+            int segment = 0;
+            if (_segments.Length > 1)
+            {
+                segment = FindCumulative(_cumulativeWeights, random.NextDouble() * TotalWeight);
+            }
+            var weights = _weights[segment];
+            return _offsets[segment] + (weights?.Sample(random) ?? random.Next(_segments[segment].Count));
+        }
+
+        /// <summary>
+        /// Finds the segment that contains the index, given the start index of every segment. Empty segments are skipped.
+        /// </summary>
+        internal static int FindSegment(int[] offsets, int index)
+        {
+            // The last segment that starts at or before the index.
+            int low = 0, high = offsets.Length - 1;
+            while (low < high)
+            {
+                int mid = (low + high + 1) >> 1;
+                if (offsets[mid] <= index) low = mid;
+                else high = mid - 1;
+            }
+            return low;
+        }
+
+        /// <summary>
+        /// Finds the first entry of a running total that exceeds the value. Entries without weight are skipped.
+        /// </summary>
+        internal static int FindCumulative(double[] cumulative, double value)
+        {
+            int low = 0, high = cumulative.Length - 1;
+            while (low < high)
+            {
+                int mid = (low + high) >> 1;
+                if (cumulative[mid] > value) high = mid;
+                else low = mid + 1;
+            }
+            // Rounding can put the value at the very end; never land on a trailing entry without weight.
+            while (low > 0 && cumulative[low] == cumulative[low - 1]) low--;
+            return low;
+        }
+    }
+
+    /// <summary>
+    /// The lines of a wildcard file whose first line is <see cref="LineWeights.Marker"/>. Only in such files is a
+    /// "weight::text" prefix read as a weight; everywhere else it is part of the text (e.g. "1.5::tag::").
+    /// </summary>
+    public sealed class WeightedWildcardLines : IReadOnlyList<string>
+    {
+        private readonly string[] _lines;
+
+        public WeightedWildcardLines(string[] lines)
+        {
+            _lines = lines;
+        }
+
+        public int Count => _lines.Length;
+
+        public string this[int index] => _lines[index];
+
+        public IEnumerator<string> GetEnumerator() => ((IEnumerable<string>)_lines).GetEnumerator();
+
+        IEnumerator IEnumerable.GetEnumerator() => GetEnumerator();
+    }
+
+    /// <summary>
+    /// The weights of the lines of one wildcard file and a Walker/Vose alias table over them, for O(1) weighted picks.
+    /// </summary>
+    internal sealed class LineWeights
+    {
+        /// <summary>
+        /// The first line of a .txt or YAML wildcard file that turns on weights for its lines. It is a comment in both.
+        /// </summary>
+        public const string Marker = "#!weights";
+
+        private readonly double[] _weights;
+        private readonly double[] _probability;
+        private readonly int[] _alias;
+
+        public double Total { get; }
+
+        private LineWeights(double[] weights)
+        {
+            _weights = weights;
+            int n = weights.Length;
+            _probability = new double[n];
+            _alias = new int[n];
+            foreach (var weight in weights) Total += weight;
+
+            var small = new Stack<int>();
+            var large = new Stack<int>();
+            var scaled = new double[n];
+            for (int i = 0; i < n; i++)
+            {
+                scaled[i] = weights[i] * n / Total;
+                (scaled[i] < 1 ? small : large).Push(i);
+            }
+            while (small.Count > 0 && large.Count > 0)
+            {
+                int less = small.Pop(), more = large.Pop();
+                _probability[less] = scaled[less];
+                _alias[less] = more;
+                scaled[more] = scaled[more] + scaled[less] - 1;
+                (scaled[more] < 1 ? small : large).Push(more);
+            }
+            // Whatever is left is 1 up to rounding.
+            while (large.Count > 0) _probability[large.Pop()] = 1;
+            while (small.Count > 0) _probability[small.Pop()] = 1;
+        }
+
+        /// <summary>
+        /// Returns the weights of the lines, or null if no line has a weight.
+        /// </summary>
+        public static LineWeights Create(IReadOnlyList<string> lines)
+        {
+            switch (lines)
+            {
+                // Large indexed files hold the weights taken while they were indexed; their lines are not read.
+                case IndexedWildcardFile file:
+                    return file.Weights == null ? null : new LineWeights(file.Weights);
+                // Compiled packs know exactly.
+                case WildcardPack.PackedLines { HasWeights: false }:
+                    return null;
+                case WildcardPack.PackedLines:
+                case WeightedWildcardLines:
+                    break;
+                // Files without the marker have no weights.
+                default:
+                    return null;
+            }
+
+            double[] weights = null;
+            for (int i = 0; i < lines.Count; i++)
+            {
+                bool hasWeight = TryParseWeight(lines[i], out var weight, out _);
+                if (!hasWeight && weights == null) continue;
+                if (weights == null)
+                {
+                    weights = new double[lines.Count];
+                    Array.Fill(weights, 1.0, 0, i);
+                }
+                weights[i] = hasWeight ? weight : 1;
+            }
+            return weights == null ? null : new LineWeights(weights);
+        }
+
+        public double GetWeight(int index) => _weights[index];
+
+        public int Sample(WildcardRandom random)
+        {
+            int i = random.Next(_weights.Length);
+            return random.NextDouble() < _probability[i] ? i : _alias[i];
+        }
+
+        public static bool HasWeight(string line) => TryParseWeight(line, out _, out _);
+
+        /// <summary>
+        /// True if the first line of a wildcard file turns on weights.
+        /// </summary>
+        public static bool IsMarker(string firstLine) => firstLine != null && firstLine.Trim() == Marker;
+
+        /// <summary>
+        /// True if the file starts with <see cref="Marker"/>.
+        /// </summary>
+        public static bool FileHasMarker(string path)
+        {
+            using var reader = new StreamReader(path, detectEncodingFromByteOrderMarks: true);
+            return IsMarker(reader.ReadLine());
+        }
+
+        public static string StripWeight(string line)
+        {
+            return TryParseWeight(line, out _, out var textStart) ? line.Substring(textStart) : line;
+        }
+
+        /// <summary>
+        /// Parses a "weight::text" line. The weight is a positive decimal number.
+        /// </summary>
+        private static bool TryParseWeight(string line, out double weight, out int textStart)
+        {
+            weight = 0;
+            textStart = 0;
+            int i = 0;
+            while (i < line.Length && line[i] == ' ') i++;
+            int numberStart = i;
+            while (i < line.Length && (char.IsAsciiDigit(line[i]) || line[i] == '.')) i++;
+            if (i == numberStart || i + 1 >= line.Length || line[i] != ':' || line[i + 1] != ':') return false;
+            if (!double.TryParse(line.AsSpan(numberStart, i - numberStart), NumberStyles.AllowDecimalPoint, CultureInfo.InvariantCulture, out weight) || weight <= 0) return false;
+
+            textStart = i + 2;
+            while (textStart < line.Length && line[textStart] == ' ') textStart++;
+            return true;
+        }
+    }
+
+    /// <summary>
+    /// Picks distinct indices from [0, count) one at a time, in O(1) expected time per pick and without materialising the range.
+    /// Unweighted picks are a sparse Fisher-Yates shuffle; weighted picks draw from the weights and reject repeats.
+    /// </summary>
+    internal sealed class DistinctSampler
+    {
+        // After this many repeats in a row most of the weight has been picked; the next pick scans what is left instead.
+        private const int MaxRejections = 32;
+
+        private readonly WildcardRandom _random;
+        private readonly int _count;
+        private readonly Func<int> _drawWeighted;
+        private readonly Func<int, double> _weightOf;
+        private int _picked;
+        // Sparse Fisher-Yates: only the positions that were swapped are stored.
+        private Dictionary<int, int> _swaps;
+        private HashSet<int> _seen;
+
+        /// <param name="drawWeighted">Draws an index (with replacement) by weight; null for uniform picks.</param>
+        /// <param name="weightOf">The weight of an index; required with <paramref name="drawWeighted"/>.</param>
+        public DistinctSampler(WildcardRandom random, int count, Func<int> drawWeighted = null, Func<int, double> weightOf = null)
+        {
+            _random = random;
+            _count = count;
+            _drawWeighted = drawWeighted;
+            _weightOf = weightOf;
+        }
+
+        public int Next()
+        {
+            if (_picked >= _count) throw new InvalidOperationException("All indices have been picked.");
+            return _drawWeighted == null ? NextUniform() : NextWeighted();
+        }
+
+        private int NextUniform()
+        {
+            int i = _picked++;
+            int j = _random.Next(i, _count);
+            int picked = Get(j);
+            if (j != i)
+            {
+                // Position i is never read again, so only j needs the value that was at i.
+                _swaps ??= new Dictionary<int, int>();
+                _swaps[j] = Get(i);
+            }
+            return picked;
+        }
+
+        private int Get(int position) => _swaps != null && _swaps.TryGetValue(position, out var value) ? value : position;
+
+        private int NextWeighted()
+        {
+            _picked++;
+            _seen ??= new HashSet<int>();
+            for (int attempt = 0; attempt < MaxRejections; attempt++)
+            {
+                int index = _drawWeighted();
+                if (_seen.Add(index)) return index;
+            }
+
+            double remaining = 0;
+            for (int i = 0; i < _count; i++)
+            {
+                if (!_seen.Contains(i)) remaining += _weightOf(i);
+            }
+            double target = _random.NextDouble() * remaining;
+            int last = -1;
+            for (int i = 0; i < _count; i++)
+            {
+                if (_seen.Contains(i)) continue;
+                last = i;
+                target -= _weightOf(i);
+                if (target < 0) break;
+            }
+            _seen.Add(last);
+            return last;
+        }
+    }
+}
@@ -0,0 +1,309 @@
+using System;
+using System.Collections.Generic;
+using System.Threading;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// All wildcard names as a trie of their path segments ("poses/style_action" is "poses" -> "style_action"),
+    /// with the line count of every wildcard and the aggregated count of every folder.
+    /// Prefix and glob queries descend to the folder the query's literal prefix names and only visit what is below it.
+    /// Line counts are taken on first request and kept until the wildcard changes.
+    /// </summary>
+    public sealed class WildcardNameIndex
+    {
+        private sealed class Node
+        {
+            public readonly Node Parent;
+            public readonly string Segment;
+            // Names are matched case-insensitively, like the wildcard files on disk.
+            public readonly Dictionary<string, Node> Children = new Dictionary<string, Node>(StringComparer.OrdinalIgnoreCase);
+            // The full name if a wildcard ends at this node
+            public string Name;
+            public int LineCount = -1;
+            public long SubtreeLineCount = -1;
+
+            public Node(Node parent, string segment)
+            {
+                Parent = parent;
+                Segment = segment;
+            }
+        }
+
+        private readonly Node _root = new Node(null, string.Empty);
+        private readonly Func<string, int> _countLines;
+        private readonly object _sync = new object();
+
+        /// <param name="countLines">Counts the lines of a wildcard, e.g. without reading the file into memory.</param>
+        public WildcardNameIndex(IEnumerable<string> names, Func<string, int> countLines)
+        {
+            _countLines = countLines;
+            foreach (var name in names)
+            {
+                Add(name);
+            }
+        }
+
+        public void Add(string name)
+        {
+            lock (_sync)
+            {
+                var node = _root;
+                foreach (var segment in name.Split('/'))
+                {
+                    if (!node.Children.TryGetValue(segment, out var child))
+                    {
+                        child = new Node(node, segment);
+                        node.Children.Add(segment, child);
+                    }
+                    node = child;
+                }
+                node.Name = name;
+                node.LineCount = -1;
+                InvalidateAncestors(node);
+            }
+        }
+
+        public void Remove(string name)
+        {
+            lock (_sync)
+            {
+                var node = FindNode(name);
+                if (node?.Name == null) return;
+
+                node.Name = null;
+                node.LineCount = -1;
+                InvalidateAncestors(node);
+                // Drop folders that no longer contain anything.
+                while (node.Parent != null && node.Name == null && node.Children.Count == 0)
+                {
+                    node.Parent.Children.Remove(node.Segment);
+                    node = node.Parent;
+                }
+            }
+        }
+
+        /// <summary>
+        /// Forgets the line count of a wildcard whose content changed.
+        /// </summary>
+        public void InvalidateLineCount(string name)
+        {
+            lock (_sync)
+            {
+                var node = FindNode(name);
+                if (node == null) return;
+                node.LineCount = -1;
+                InvalidateAncestors(node);
+            }
+        }
+
+        /// <summary>
+        /// Returns the names that start with the prefix, sorted like <see cref="WildcardFileHandler.GetAllWildcardNames"/>.
+        /// </summary>
+        public List<string> FindByPrefix(string prefix)
+        {
+            var result = new List<string>();
+            lock (_sync)
+            {
+                foreach (var node in FindPrefixNodes(prefix))
+                {
+                    CollectNames(node, null, result);
+                }
+            }
+            result.Sort();
+            return result;
+        }
+
+        /// <summary>
+        /// Returns the names that match a glob pattern, in which '*' stands for any text (including '/'),
+        /// sorted like <see cref="WildcardFileHandler.GetAllWildcardNames"/>.
+        /// </summary>
+        public List<string> FindByGlob(string pattern)
+        {
+            int star = pattern.IndexOf('*');
+            if (star < 0)
+            {
+                lock (_sync)
+                {
+                    var node = FindNode(pattern);
+                    return node?.Name != null ? new List<string> { node.Name } : new List<string>();
+                }
+            }
+
+            // Every match starts with the text before the first '*'.
+            var result = new List<string>();
+            lock (_sync)
+            {
+                foreach (var node in FindPrefixNodes(pattern.Substring(0, star)))
+                {
+                    CollectNames(node, pattern, result);
+                }
+            }
+            result.Sort();
+            return result;
+        }
+
+        /// <summary>
+        /// The number of lines of a wildcard, or 0 if there is no such wildcard.
+        /// </summary>
+        public int GetLineCount(string name)
+        {
+            lock (_sync)
+            {
+                var node = FindNode(name);
+                if (node?.Name == null) return 0;
+                if (node.LineCount >= 0) return node.LineCount;
+            }
+
+            // Counted outside of the lock: it may read the file.
+            int count = _countLines(name);
+            lock (_sync)
+            {
+                var node = FindNode(name);
+                if (node?.Name != null) node.LineCount = count;
+            }
+            return count;
+        }
+
+        /// <summary>
+        /// The total number of lines of all wildcards in a folder and its subfolders ("" for all wildcards).
+        /// </summary>
+        public long GetFolderLineCount(string folder, CancellationToken cancellationToken = default)
+        {
+            List<string> uncounted;
+            lock (_sync)
+            {
+                var node = string.IsNullOrEmpty(folder) ? _root : FindNode(folder.TrimEnd('/'));
+                if (node == null) return 0;
+
+                uncounted = new List<string>();
+                foreach (var child in node.Children.Values)
+                {
+                    CollectUncounted(child, uncounted);
+                }
+            }
+
+            foreach (var name in uncounted)
+            {
+                cancellationToken.ThrowIfCancellationRequested();
+                GetLineCount(name);
+            }
+
+            lock (_sync)
+            {
+                // A folder can also be a wildcard ("poses.txt" next to "poses/"); only its content is counted.
+                var node = string.IsNullOrEmpty(folder) ? _root : FindNode(folder.TrimEnd('/'));
+                long total = 0;
+                foreach (var child in node?.Children.Values ?? (IEnumerable<Node>)Array.Empty<Node>())
+                {
+                    total += Aggregate(child);
+                }
+                return total;
+            }
+        }
+
+        /// <summary>
+        /// Matches a name against a glob pattern in which '*' stands for any text, ignoring case.
+        /// </summary>
+        public static bool IsGlobMatch(string name, string pattern)
+        {
+            int n = 0, p = 0;
+            int starPattern = -1, starName = 0;
+            while (n < name.Length)
+            {
+                if (p < pattern.Length && pattern[p] == '*')
+                {
+                    starPattern = p++;
+                    starName = n;
+                }
+                else if (p < pattern.Length && char.ToUpperInvariant(pattern[p]) == char.ToUpperInvariant(name[n]))
+                {
+                    p++;
+                    n++;
+                }
+                else if (starPattern >= 0)
+                {
+                    // Let the last '*' take one more character.
+                    p = starPattern + 1;
+                    n = ++starName;
+                }
+                else
+                {
+                    return false;
+                }
+            }
+            while (p < pattern.Length && pattern[p] == '*') p++;
+            return p == pattern.Length;
+        }
+
+        private Node FindNode(string name)
+        {
+            var node = _root;
+            foreach (var segment in name.Split('/'))
+            {
+                if (!node.Children.TryGetValue(segment, out node)) return null;
+            }
+            return node;
+        }
+
+        /// <summary>
+        /// The nodes whose names start with the prefix: complete segments are looked up, a partial last segment
+        /// selects the children of its folder that start with it.
+        /// </summary>
+        private IEnumerable<Node> FindPrefixNodes(string prefix)
+        {
+            int lastSlash = prefix.LastIndexOf('/');
+            var folder = lastSlash < 0 ? _root : FindNode(prefix.Substring(0, lastSlash));
+            if (folder == null) yield break;
+
+            var partial = prefix.Substring(lastSlash + 1);
+            foreach (var child in folder.Children.Values)
+            {
+                if (child.Segment.StartsWith(partial, StringComparison.OrdinalIgnoreCase)) yield return child;
+            }
+        }
+
+        private static void CollectNames(Node node, string pattern, List<string> result)
+        {
+            if (node.Name != null && (pattern == null || IsGlobMatch(node.Name, pattern))) result.Add(node.Name);
+            foreach (var child in node.Children.Values)
+            {
+                CollectNames(child, pattern, result);
+            }
+        }
+
+        private static void CollectUncounted(Node node, List<string> result)
+        {
+            if (node.SubtreeLineCount >= 0) return;
+            if (node.Name != null && node.LineCount < 0) result.Add(node.Name);
+            foreach (var child in node.Children.Values)
+            {
+                CollectUncounted(child, result);
+            }
+        }
+
+        private static long Aggregate(Node node)
+        {
+            if (node.SubtreeLineCount >= 0) return node.SubtreeLineCount;
+
+            long total = node.Name != null ? Math.Max(node.LineCount, 0) : 0;
+            bool complete = node.Name == null || node.LineCount >= 0;
+            foreach (var child in node.Children.Values)
+            {
+                total += Aggregate(child);
+                complete &= child.SubtreeLineCount >= 0;
+            }
+            // A wildcard that changed while counting stays uncounted, and so does its folder.
+            if (complete) node.SubtreeLineCount = total;
+            return total;
+        }
+
+        private static void InvalidateAncestors(Node node)
+        {
+            for (; node != null; node = node.Parent)
+            {
+                node.SubtreeLineCount = -1;
+            }
+        }
+    }
+}
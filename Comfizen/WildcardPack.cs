@@ -0,0 +1,457 @@
+using System;
+using System.Buffers;
+using System.Buffers.Binary;
+using System.Collections;
+using System.Collections.Generic;
+using System.IO;
+using System.Linq;
+using System.Runtime.InteropServices;
+using System.Security.Cryptography;
+using System.Text;
+using System.Threading;
+using Microsoft.Win32.SafeHandles;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// Wildcards compiled from YAML files into one file: the source files they were compiled from (with size and
+    /// modification time, to tell when the pack is stale), a name table, the offset of every line and the UTF-8 text
+    /// of all lines. Opening a pack reads everything but the text; lines are read when they are accessed.
+    /// Every compile writes a new file and a pack file is never rewritten, so a pack that is still in use keeps
+    /// reading the content it was opened with; old packs are deleted once they are closed.
+    /// The file stays open until its owner disposes the pack and the reads in progress have finished. Lines read
+    /// after that are empty, as for a wildcard file that can no longer be read.
+    /// </summary>
+    public sealed class WildcardPack : IDisposable
+    {
+        private const int PackMagic = 0x50575A43; // "CZWP"
+        private const int PackVersion = 2;
+        // Enumerating a wildcard reads its text in chunks of about this size, one read each.
+        private const int ReadChunkBytes = 64 * 1024;
+
+        private static readonly string _packDirectory = Path.Combine(Directory.GetCurrentDirectory(), "wildcard_index");
+
+        /// <summary>
+        /// A YAML file as it was when the pack was compiled.
+        /// </summary>
+        public readonly record struct Source(string RelativePath, long Length, long LastWriteTicks)
+        {
+            public static Source FromFile(string sourceDirectory, FileInfo file) =>
+                new Source(Path.GetRelativePath(sourceDirectory, file.FullName), file.Length, file.LastWriteTimeUtc.Ticks);
+        }
+
+        /// <summary>
+        /// A wildcard to compile: its name, its lines and the index of the source that defines it.
+        /// </summary>
+        public readonly record struct Entry(int SourceIndex, string Name, IReadOnlyList<string> Lines);
+
+        private readonly string _path;
+        private readonly Source[] _sources;
+        private readonly Entry[] _entries;
+        // The offset of every line in the text, its length in bytes, and the file offset of the text
+        private readonly long[] _starts;
+        private readonly int[] _lengths;
+        private readonly long _textOffset;
+        // Held while the pack is in use; it is not shared for deletion, so the file cannot be deleted under it.
+        private readonly SafeFileHandle _handle;
+        // The owner's reference plus one per read in progress; the handle is closed when the count drops to zero.
+        private int _references = 1;
+        private int _disposed;
+        // Set once a read failed, so that it is reported once.
+        private int _readFailed;
+
+        public string FilePath => _path;
+
+        public IReadOnlyList<Source> Sources => _sources;
+
+        /// <summary>
+        /// The compiled wildcards in the order they were written; their lines are views into the pack.
+        /// </summary>
+        public IReadOnlyList<Entry> Entries => _entries;
+
+        private WildcardPack(string path, SafeFileHandle handle, Source[] sources, Entry[] entries, long[] starts, int[] lengths, long textOffset)
+        {
+            _path = path;
+            _handle = handle;
+            _sources = sources;
+            _entries = entries;
+            _starts = starts;
+            _lengths = lengths;
+            _textOffset = textOffset;
+        }
+
+        /// <summary>
+        /// Releases the owner's reference. The file is closed as soon as no read is in progress.
+        /// </summary>
+        public void Dispose()
+        {
+            if (Interlocked.Exchange(ref _disposed, 1) == 0)
+            {
+                RemoveReference();
+            }
+        }
+
+        private bool TryAddReference()
+        {
+            while (true)
+            {
+                int references = Volatile.Read(ref _references);
+                if (references == 0) return false;
+                if (Interlocked.CompareExchange(ref _references, references + 1, references) == references) return true;
+            }
+        }
+
+        private void RemoveReference()
+        {
+            if (Interlocked.Decrement(ref _references) == 0)
+            {
+                _handle.Dispose();
+            }
+        }
+
+        /// <summary>
+        /// The most recently compiled pack of the YAML files of a wildcard directory, or null if there is none.
+        /// </summary>
+        public static string FindLatestPackPath(string sourceDirectory)
+        {
+            if (!Directory.Exists(_packDirectory)) return null;
+            // The names sort by the time they were created.
+            return Directory.GetFiles(_packDirectory, GetPackPrefix(sourceDirectory) + "*.pack")
+                .OrderByDescending(Path.GetFileName, StringComparer.Ordinal)
+                .FirstOrDefault();
+        }
+
+        /// <summary>
+        /// A new file name for a pack of the YAML files of a wildcard directory.
+        /// </summary>
+        public static string CreatePackPath(string sourceDirectory)
+        {
+            return Path.Combine(_packDirectory, $"{GetPackPrefix(sourceDirectory)}{DateTime.UtcNow.Ticks:x16}-{Guid.NewGuid():N}.pack");
+        }
+
+        /// <summary>
+        /// Deletes the packs of a wildcard directory other than the given one. Packs that are still open, in this or
+        /// another instance of the application, cannot be deleted and are tried again on the next call.
+        /// </summary>
+        public static void DeleteUnusedPacks(string sourceDirectory, string currentPath)
+        {
+            if (!Directory.Exists(_packDirectory)) return;
+            foreach (var path in Directory.GetFiles(_packDirectory, GetPackPrefix(sourceDirectory) + "*.pack"))
+            {
+                if (currentPath != null && string.Equals(Path.GetFullPath(path), Path.GetFullPath(currentPath), StringComparison.OrdinalIgnoreCase)) continue;
+                try
+                {
+                    File.Delete(path);
+                }
+                catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+                {
+                    // Still in use
+                }
+            }
+        }
+
+        private static string GetPackPrefix(string sourceDirectory)
+        {
+            var key = SHA256.HashData(Encoding.UTF8.GetBytes(Path.GetFullPath(sourceDirectory).ToLowerInvariant()));
+            return "yaml-" + Convert.ToHexString(key, 0, 16).ToLowerInvariant() + "-";
+        }
+
+        /// <summary>
+        /// Opens a pack, or returns null if there is none or it cannot be read.
+        /// </summary>
+        public static WildcardPack TryOpen(string path)
+        {
+            if (path == null || !File.Exists(path)) return null;
+
+            SafeFileHandle handle = null;
+            WildcardPack pack = null;
+
+            try
+            {
+                handle = File.OpenHandle(path, FileMode.Open, FileAccess.Read, FileShare.Read);
+                using (var reader = new BinaryReader(new FileStream(handle, FileAccess.Read, 4096), Encoding.UTF8, true))
+                {
+                    if (reader.ReadInt32() != PackMagic || reader.ReadInt32() != PackVersion) return null;
+
+                    var sources = new Source[reader.ReadInt32()];
+                    for (int i = 0; i < sources.Length; i++)
+                    {
+                        sources[i] = new Source(reader.ReadString(), reader.ReadInt64(), reader.ReadInt64());
+                    }
+
+                    // The lines are attached once the pack exists to read them from.
+                    var rawEntries = new (int Source, string Name, int FirstLine, int LineCount, bool HasWeights)[reader.ReadInt32()];
+                    for (int i = 0; i < rawEntries.Length; i++)
+                    {
+                        rawEntries[i] = (reader.ReadInt32(), reader.ReadString(), reader.ReadInt32(), reader.ReadInt32(), reader.ReadBoolean());
+                    }
+
+                    int lineCount = reader.ReadInt32();
+                    long startsOffset = reader.BaseStream.Position;
+                    long lengthsOffset = startsOffset + (long)lineCount * sizeof(long);
+                    long textOffset = lengthsOffset + (long)lineCount * sizeof(int);
+                    long fileLength = reader.BaseStream.Length;
+                    if (textOffset > fileLength) return null;
+
+                    // The line tables are kept in memory, so that a line costs one read.
+                    var starts = new long[lineCount];
+                    var lengths = new int[lineCount];
+                    ReadExactly(handle, MemoryMarshal.AsBytes(starts.AsSpan()), startsOffset, path);
+                    ReadExactly(handle, MemoryMarshal.AsBytes(lengths.AsSpan()), lengthsOffset, path);
+                    if (!BitConverter.IsLittleEndian)
+                    {
+                        BinaryPrimitives.ReverseEndianness(starts, starts);
+                        BinaryPrimitives.ReverseEndianness(lengths, lengths);
+                    }
+                    for (int i = 0; i < lineCount; i++)
+                    {
+                        if (starts[i] < 0 || lengths[i] < 0 || textOffset + starts[i] + lengths[i] > fileLength) return null;
+                    }
+
+                    var entries = new Entry[rawEntries.Length];
+                    var opened = new WildcardPack(path, handle, sources, entries, starts, lengths, textOffset);
+                    for (int i = 0; i < rawEntries.Length; i++)
+                    {
+                        var raw = rawEntries[i];
+                        if (raw.FirstLine < 0 || raw.LineCount < 0 || (long)raw.FirstLine + raw.LineCount > lineCount) return null;
+                        entries[i] = new Entry(raw.Source, raw.Name, new PackedLines(opened, raw.FirstLine, raw.LineCount, raw.HasWeights));
+                    }
+                    pack = opened;
+                    return pack;
+                }
+            }
+            catch (Exception ex)
+            {
+                Logger.Log(ex, $"Failed to read the wildcard pack {path}. It will be rebuilt.");
+                return null;
+            }
+            finally
+            {
+                if (pack == null) handle?.Dispose();
+            }
+        }
+
+        /// <summary>
+        /// Returns the index of the source if the pack holds it as it is now, otherwise -1.
+        /// </summary>
+        public int FindSource(Source current)
+        {
+            for (int i = 0; i < _sources.Length; i++)
+            {
+                if (string.Equals(_sources[i].RelativePath, current.RelativePath, StringComparison.OrdinalIgnoreCase))
+                {
+                    return _sources[i].Length == current.Length && _sources[i].LastWriteTicks == current.LastWriteTicks ? i : -1;
+                }
+            }
+            return -1;
+        }
+
+        /// <summary>
+        /// Writes a pack to a new file (see <see cref="CreatePackPath"/>). It is written under a temporary name and moved
+        /// into place, so a reader never sees a partial pack.
+        /// </summary>
+        public static void Write(string path, IReadOnlyList<Source> sources, IReadOnlyList<Entry> entries)
+        {
+            Directory.CreateDirectory(Path.GetDirectoryName(Path.GetFullPath(path)));
+            var tempPath = $"{path}.{Guid.NewGuid():N}.tmp";
+            try
+            {
+                using (var stream = new FileStream(tempPath, FileMode.Create, FileAccess.ReadWrite, FileShare.None))
+                using (var writer = new BinaryWriter(stream, Encoding.UTF8))
+                {
+                    writer.Write(PackMagic);
+                    writer.Write(PackVersion);
+                    writer.Write(sources.Count);
+                    foreach (var source in sources)
+                    {
+                        writer.Write(source.RelativePath);
+                        writer.Write(source.Length);
+                        writer.Write(source.LastWriteTicks);
+                    }
+
+                    int lineCount = 0;
+                    writer.Write(entries.Count);
+                    foreach (var entry in entries)
+                    {
+                        // Only the lines of files that opt in to weights can have them.
+                        bool hasWeights = entry.Lines switch
+                        {
+                            PackedLines packed => packed.HasWeights,
+                            WeightedWildcardLines weighted => weighted.Any(LineWeights.HasWeight),
+                            _ => false
+                        };
+                        writer.Write(entry.SourceIndex);
+                        writer.Write(entry.Name);
+                        writer.Write(lineCount);
+                        writer.Write(entry.Lines.Count);
+                        writer.Write(hasWeights);
+                        lineCount += entry.Lines.Count;
+                    }
+                    writer.Write(lineCount);
+
+                    // The line tables are filled in behind the text, once the offsets are known.
+                    long startsOffset = stream.Position;
+                    long lengthsOffset = startsOffset + (long)lineCount * sizeof(long);
+                    long textOffset = lengthsOffset + (long)lineCount * sizeof(int);
+                    var starts = new long[lineCount];
+                    var lengths = new int[lineCount];
+
+                    stream.Position = textOffset;
+                    long textPosition = 0;
+                    int index = 0;
+                    foreach (var entry in entries)
+                    {
+                        foreach (var line in entry.Lines)
+                        {
+                            var bytes = Encoding.UTF8.GetBytes(line);
+                            writer.Write(bytes);
+                            starts[index] = textPosition;
+                            lengths[index] = bytes.Length;
+                            textPosition += bytes.Length;
+                            index++;
+                        }
+                    }
+
+                    stream.Position = startsOffset;
+                    foreach (var start in starts) writer.Write(start);
+                    foreach (var length in lengths) writer.Write(length);
+                }
+                File.Move(tempPath, path);
+            }
+            finally
+            {
+                if (File.Exists(tempPath)) File.Delete(tempPath);
+            }
+        }
+
+        /// <summary>
+        /// Decodes the consecutive lines starting at <paramref name="first"/> into <paramref name="lines"/> with one read.
+        /// Returns false, after reporting it, if the pack can no longer be read.
+        /// </summary>
+        private bool TryReadLines(int first, string[] lines)
+        {
+            if (!TryAddReference())
+            {
+                ReportReadFailure(null);
+                return false;
+            }
+            try
+            {
+                int last = first + lines.Length - 1;
+                long start = _starts[first];
+                int length = checked((int)(_starts[last] + _lengths[last] - start));
+                var buffer = ArrayPool<byte>.Shared.Rent(length);
+                try
+                {
+                    ReadExactly(_handle, buffer.AsSpan(0, length), _textOffset + start, _path);
+                    for (int i = 0; i < lines.Length; i++)
+                    {
+                        lines[i] = Encoding.UTF8.GetString(buffer, (int)(_starts[first + i] - start), _lengths[first + i]);
+                    }
+                    return true;
+                }
+                finally
+                {
+                    ArrayPool<byte>.Shared.Return(buffer);
+                }
+            }
+            catch (Exception ex) when (ex is IOException or UnauthorizedAccessException)
+            {
+                ReportReadFailure(ex);
+                return false;
+            }
+            finally
+            {
+                RemoveReference();
+            }
+        }
+
+        /// <summary>
+        /// The number of lines from <paramref name="first"/> on, at most <paramref name="max"/>, to read at once when enumerating.
+        /// </summary>
+        private int CountLinesInChunk(int first, int max)
+        {
+            long end = _starts[first] + ReadChunkBytes;
+            int count = 1;
+            while (count < max && _starts[first + count] + _lengths[first + count] <= end)
+            {
+                count++;
+            }
+            return count;
+        }
+
+        private void ReportReadFailure(Exception ex)
+        {
+            if (Interlocked.Exchange(ref _readFailed, 1) != 0) return;
+            if (ex == null)
+            {
+                Logger.Log($"The wildcard pack {_path} was read after it was closed. Its lines are empty until the wildcards are reloaded.", LogLevel.Warning);
+            }
+            else
+            {
+                Logger.Log(ex, $"Failed to read the wildcard pack {_path}. Its lines are empty until the wildcards are reloaded.");
+            }
+        }
+
+        private static void ReadExactly(SafeFileHandle handle, Span<byte> buffer, long offset, string path)
+        {
+            while (buffer.Length > 0)
+            {
+                int read = RandomAccess.Read(handle, buffer, offset);
+                if (read == 0) throw new EndOfStreamException($"The wildcard pack {path} is truncated.");
+                buffer = buffer.Slice(read);
+                offset += read;
+            }
+        }
+
+        /// <summary>
+        /// The lines of one compiled wildcard, decoded on access. They are empty once the pack is closed.
+        /// </summary>
+        public sealed class PackedLines : IReadOnlyList<string>
+        {
+            private readonly WildcardPack _pack;
+            private readonly int _firstLine;
+
+            public int Count { get; }
+
+            /// <summary>
+            /// True if the source file opts in to weights and any line starts with a "weight::" prefix.
+            /// </summary>
+            public bool HasWeights { get; }
+
+            internal PackedLines(WildcardPack pack, int firstLine, int count, bool hasWeights)
+            {
+                _pack = pack;
+                _firstLine = firstLine;
+                Count = count;
+                HasWeights = hasWeights;
+            }
+
+            public string this[int index]
+            {
+                get
+                {
+                    if ((uint)index >= (uint)Count) throw new ArgumentOutOfRangeException(nameof(index));
+                    var line = new string[1];
+                    return _pack.TryReadLines(_firstLine + index, line) ? line[0] : string.Empty;
+                }
+            }
+
+            public IEnumerator<string> GetEnumerator()
+            {
+                for (int i = 0; i < Count;)
+                {
+                    var lines = new string[_pack.CountLinesInChunk(_firstLine + i, Count - i)];
+                    if (!_pack.TryReadLines(_firstLine + i, lines)) yield break;
+                    foreach (var line in lines)
+                    {
+                        yield return line;
+                    }
+                    i += lines.Length;
+                }
+            }
+
+            IEnumerator IEnumerable.GetEnumerator() => GetEnumerator();
+        }
+    }
+}
@@ -1,7 +1,6 @@
 ﻿using System;
 using System.Collections.Generic;
-using System.Linq;
-using System.Text.RegularExpressions;
+using System.Text;
 
 namespace Comfizen
 {
@@ -11,18 +10,31 @@ namespace Comfizen
     /// </summary>
     public class WildcardProcessor
     {
-        private readonly Random _random;
-        private const int MaxIterations = 100;
+        private WildcardRandom _random;
+        // Wildcard lines can reference other wildcards; this bounds the nesting, e.g. for wildcards that reference each other.
+        internal const int MaxDepth = 100;
+        private int _depth;
+        private bool _depthLimitReached;
 
-        public WildcardProcessor(long seed)
+        public WildcardProcessor(long seed) : this(seed, null)
         {
-            // Seed the random number generator for deterministic results for a given prompt + seed
-            _random = new Random((int)(seed & 0xFFFFFFFF));
         }
 
         /// <summary>
-        /// Processes the input string iteratively, replacing all supported wildcard and dynamic syntaxes, including nested ones.
-        /// The processing continues until no more replacements can be made or a maximum iteration limit is reached.
+        /// A processor for one prompt field: the result depends on the seed and the field path, so the fields of a task
+        /// are expanded independently of each other and of the order they are expanded in.
+        /// </summary>
+        public WildcardProcessor(long seed, string fieldPath)
+        {
+            _random = WildcardRandom.ForField(seed, fieldPath);
+        }
+
+        internal WildcardRandom Random => _random;
+
+        /// <summary>
+        /// Expands all supported wildcard and dynamic syntaxes in the input, including nested ones and the syntax
+        /// inside the wildcard lines that are picked. The template is parsed once and cached (see <see cref="WildcardTemplate"/>);
+        /// the result depends only on the template, the wildcard files, the seed and the field path.
         /// </summary>
         /// <param name="input">The prompt string to process.</param>
         /// <returns>The processed string with all syntaxes resolved.</returns>
@@ -33,120 +45,56 @@ namespace Comfizen
                 return input;
             }
 
-            string currentResult = input;
-            int iterations = 0;
-
-            while (iterations < MaxIterations)
+            var template = WildcardTemplate.Parse(input);
+            if (template.IsPlainText)
             {
-                string previousResult = currentResult;
-
-                // --- STAGE 1: Process brace constructs {...} ---
-                // This handles quantifiers and lists, e.g., {2$$a|__b__}.
-                currentResult = Regex.Replace(currentResult, @"\{([^{}]+)\}", m => ProcessBraceContent(m.Groups[1].Value));
-
-                // --- STAGE 2: Process simple __...__ wildcards ---
-                // This resolves all __...__ patterns, including those generated from the previous stage or from other wildcards.
-                currentResult = Regex.Replace(currentResult, @"__([\s\S]+?)__", m => ProcessSimpleWildcard(m.Groups[1].Value.Trim()));
-
-                // If no changes were made in this iteration, the string is fully processed.
-                if (currentResult == previousResult)
-                {
-                    break;
-                }
-                
-                iterations++;
+                return input;
             }
 
-            if (iterations >= MaxIterations)
+            var output = new StringBuilder(input.Length);
+            _depthLimitReached = false;
+            template.Root.Evaluate(this, output);
+            var result = output.ToString();
+
+            if (_depthLimitReached)
             {
-                Logger.Log($"[WildcardProcessor] Max processing iterations ({MaxIterations}) reached. Possible infinite loop in prompt: '{input}'. Final result: '{currentResult}'", LogLevel.Warning);
+                Logger.Log($"[WildcardProcessor] Max wildcard nesting depth ({MaxDepth}) reached. Possible infinite loop in prompt: '{input}'. Final result: '{result}'", LogLevel.Warning);
             }
             
-            return currentResult;
+            return result;
         }
 
         /// <summary>
-        /// Processes the content within {..} braces.
-        /// Handles quantifiers (e.g., {2$$..}) and list expansion with custom separators.
-        /// This method is now safer against malformed input.
+        /// Appends a picked wildcard line, expanding the syntax it contains.
         /// </summary>
-        private string ProcessBraceContent(string content)
+        internal void ExpandLine(string line, StringBuilder output)
         {
-            int minChoices = 1, maxChoices = 1;
-            string separator = ", "; // Default separator
-
-            var quantifierMatch = Regex.Match(content, @"^(.+?)\$\$(.+)");
-            if (quantifierMatch.Success)
+            var template = WildcardTemplate.Parse(line);
+            if (template.IsPlainText)
             {
-                string quantifierPart = quantifierMatch.Groups[1].Value;
-                string restOfContent = quantifierMatch.Groups[2].Value;
-
-                var rangeMatch = Regex.Match(quantifierPart, @"^(\d+)(?:-(\d+))?$");
-                if (rangeMatch.Success)
-                {
-                    // Safely parse numbers
-                    int.TryParse(rangeMatch.Groups[1].Value, out minChoices);
-                    maxChoices = minChoices;
-                    if (rangeMatch.Groups[2].Success)
-                    {
-                        int.TryParse(rangeMatch.Groups[2].Value, out maxChoices);
-                    }
-
-                    // Check for a custom separator
-                    var separatorParts = restOfContent.Split(new[] { "$$" }, 2, StringSplitOptions.None);
-                    if (separatorParts.Length == 2)
-                    {
-                        separator = separatorParts[0];
-                        content = separatorParts[1];
-                    }
-                    else
-                    {
-                        content = restOfContent;
-                    }
-                }
+                output.Append(line);
+                return;
             }
-            
-            var items = content.Split('|')
-                .Select(item => item.Trim())
-                .ToList();
-
-            var finalChoices = new List<string>();
-            foreach (var item in items)
+            if (_depth >= MaxDepth)
             {
-                var wildcardMatch = Regex.Match(item, @"^__([\s\S]+?)__$");
-                if (wildcardMatch.Success)
-                {
-                    var wildcardName = wildcardMatch.Groups[1].Value;
-                    finalChoices.AddRange(WildcardFileHandler.GetLines(wildcardName));
-                }
-                else
-                {
-                    finalChoices.Add(item);
-                }
+                _depthLimitReached = true;
+                output.Append(line);
+                return;
             }
-            
-            if (finalChoices.Count == 0) return "";
-
-            if (minChoices > maxChoices) (minChoices, maxChoices) = (maxChoices, minChoices);
-            
-            int numToTake = _random.Next(Math.Min(minChoices, finalChoices.Count), Math.Min(maxChoices, finalChoices.Count) + 1);
-            
-            var shuffled = finalChoices.OrderBy(x => _random.Next()).ToList();
-            
-            return string.Join(separator, shuffled.Take(numToTake));
-        }
 
-        /// <summary>
-        /// Processes a simple, standalone wildcard like __creature__.
-        /// </summary>
-        private string ProcessSimpleWildcard(string wildcardName)
-        {
-            var lines = WildcardFileHandler.GetLines(wildcardName);
-            if (lines.Length == 0)
+            // The line draws from its own stream, so what it picks does not shift the choices that follow it.
+            var parent = _random;
+            _random = parent.Split();
+            _depth++;
+            try
+            {
+                template.Root.Evaluate(this, output);
+            }
+            finally
             {
-                return $"__{wildcardName}__"; 
+                _depth--;
+                _random = parent;
             }
-            return lines[_random.Next(lines.Length)];
         }
     }
 }
\ No newline at end of file
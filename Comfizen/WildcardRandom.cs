@@ -0,0 +1,130 @@
+using System;
+using System.Numerics;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// The random number stream that drives wildcard expansion (xoshiro256**, seeded with SplitMix64).
+    /// A stream is identified by a 64-bit key: <see cref="ForField"/> derives it from the task seed and the field path,
+    /// and <see cref="Split"/> derives the streams of nested expansions from their position, so every result depends only
+    /// on (seed, field, nesting position) and not on the order in which tasks or fields are expanded.
+    /// </summary>
+    internal sealed class WildcardRandom
+    {
+        private const ulong GoldenGamma = 0x9E3779B97F4A7C15UL;
+
+        private readonly ulong _key;
+        private ulong _s0, _s1, _s2, _s3;
+        // How many streams have been split off; the next split gets this position.
+        private ulong _splits;
+
+        public WildcardRandom(ulong key)
+        {
+            _key = key;
+            ulong state = key;
+            _s0 = SplitMix64(ref state);
+            _s1 = SplitMix64(ref state);
+            _s2 = SplitMix64(ref state);
+            _s3 = SplitMix64(ref state);
+        }
+
+        /// <summary>
+        /// The stream of one prompt field of one task. All 64 bits of the seed are used; a null path is the same as "".
+        /// </summary>
+        public static WildcardRandom ForField(long seed, string fieldPath)
+        {
+            return new WildcardRandom(Mix((ulong)seed + GoldenGamma) ^ HashPath(fieldPath));
+        }
+
+        /// <summary>
+        /// An independent stream for the next nested expansion. It depends only on this stream's key and on how many
+        /// streams were split off before it, not on how many numbers either stream has drawn.
+        /// </summary>
+        public WildcardRandom Split()
+        {
+            _splits++;
+            return new WildcardRandom(Mix(_key ^ Mix(_splits * GoldenGamma)));
+        }
+
+        /// <summary>
+        /// A uniformly distributed integer in [0, maxValue).
+        /// </summary>
+        public int Next(int maxValue)
+        {
+            if (maxValue < 0) throw new ArgumentOutOfRangeException(nameof(maxValue));
+            return maxValue <= 1 ? 0 : (int)NextBounded((uint)maxValue);
+        }
+
+        /// <summary>
+        /// A uniformly distributed integer in [minValue, maxValue).
+        /// </summary>
+        public int Next(int minValue, int maxValue)
+        {
+            if (minValue > maxValue) throw new ArgumentOutOfRangeException(nameof(minValue));
+            ulong range = (ulong)((long)maxValue - minValue);
+            return range <= 1 ? minValue : (int)(minValue + (long)NextBounded((uint)range));
+        }
+
+        /// <summary>
+        /// A uniformly distributed double in [0, 1) with 53 random bits.
+        /// </summary>
+        public double NextDouble() => (NextUInt64() >> 11) * (1.0 / (1UL << 53));
+
+        public ulong NextUInt64()
+        {
+            ulong result = BitOperations.RotateLeft(_s1 * 5, 7) * 9;
+            ulong t = _s1 << 17;
+            _s2 ^= _s0;
+            _s3 ^= _s1;
+            _s1 ^= _s2;
+            _s0 ^= _s3;
+            _s2 ^= t;
+            _s3 = BitOperations.RotateLeft(_s3, 45);
+            return result;
+        }
+
+        // Lemire's multiply-shift with rejection: unbiased for every range.
+        private uint NextBounded(uint range)
+        {
+            ulong product = (NextUInt64() >> 32) * range;
+            uint low = (uint)product;
+            if (low < range)
+            {
+                uint threshold = (uint)-range % range;
+                while (low < threshold)
+                {
+                    product = (NextUInt64() >> 32) * range;
+                    low = (uint)product;
+                }
+            }
+            return (uint)(product >> 32);
+        }
+
+        private static ulong SplitMix64(ref ulong state)
+        {
+            state += GoldenGamma;
+            return Mix(state);
+        }
+
+        private static ulong Mix(ulong z)
+        {
+            z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9UL;
+            z = (z ^ (z >> 27)) * 0x94D049BB133111EBUL;
+            return z ^ (z >> 31);
+        }
+
+        // FNV-1a over the UTF-16 code units: stable across processes and runtimes, unlike string.GetHashCode.
+        private static ulong HashPath(string path)
+        {
+            ulong hash = 0xCBF29CE484222325UL;
+            if (path != null)
+            {
+                foreach (char c in path)
+                {
+                    hash = (hash ^ c) * 0x100000001B3UL;
+                }
+            }
+            return Mix(hash);
+        }
+    }
+}
@@ -34,7 +34,7 @@ public class WildcardSystemTester
             
             // Clear caches before running tests
             var contentCacheField = typeof(WildcardFileHandler).GetField("_contentCache", System.Reflection.BindingFlags.NonPublic | System.Reflection.BindingFlags.Static);
-            ((System.Collections.Concurrent.ConcurrentDictionary<string, string[]>)contentCacheField.GetValue(null)).Clear();
+            ((System.Collections.Concurrent.ConcurrentDictionary<string, System.Collections.Generic.IReadOnlyList<string>>)contentCacheField.GetValue(null)).Clear();
             var listCacheField = typeof(WildcardFileHandler).GetField("_allWildcardNamesCache", System.Reflection.BindingFlags.NonPublic | System.Reflection.BindingFlags.Static);
             listCacheField.SetValue(null, null);
 
@@ -0,0 +1,561 @@
+using System;
+using System.Collections.Concurrent;
+using System.Collections.Generic;
+using System.Linq;
+using System.Numerics;
+using System.Text;
+using System.Text.RegularExpressions;
+
+namespace Comfizen
+{
+    /// <summary>
+    /// A prompt template parsed once into a syntax tree of text, {..} choices and __name__ wildcard references.
+    /// Parsed templates are cached by their text; expanding one is a tree walk driven by a <see cref="WildcardProcessor"/>.
+    /// </summary>
+    public sealed class WildcardTemplate
+    {
+        // Templates are parsed from prompts and from the wildcard lines they pick, so the cache is bounded.
+        private const int MaxCachedTemplates = 10000;
+        private static readonly ConcurrentDictionary<string, WildcardTemplate> _cache = new ConcurrentDictionary<string, WildcardTemplate>();
+        private static readonly Regex _quantifierRegex = new Regex(@"^(\d+)(?:-(\d+))?$", RegexOptions.Compiled);
+
+        internal WildcardNode Root { get; }
+
+        /// <summary>
+        /// True if the template contains no wildcard syntax and expands to itself.
+        /// </summary>
+        public bool IsPlainText => Root is TextNode;
+
+        private WildcardTemplate(WildcardNode root)
+        {
+            Root = root;
+        }
+
+        /// <summary>
+        /// Returns the parsed template for the text, parsing it on first use.
+        /// </summary>
+        public static WildcardTemplate Parse(string text)
+        {
+            if (!ContainsSyntax(text))
+            {
+                return new WildcardTemplate(new TextNode(text));
+            }
+            if (_cache.TryGetValue(text, out var template))
+            {
+                return template;
+            }
+
+            template = new WildcardTemplate(ParseSequence(text, 0, text.Length));
+            if (_cache.Count >= MaxCachedTemplates)
+            {
+                _cache.Clear();
+            }
+            _cache.TryAdd(text, template);
+            return template;
+        }
+
+        private static bool ContainsSyntax(string text)
+        {
+            return text.IndexOf('{') >= 0 || text.Contains("__", StringComparison.Ordinal);
+        }
+
+        /// <summary>
+        /// Parses text[start..end) into a sequence of literal text, brace choices and wildcard references.
+        /// Unbalanced braces and unclosed "__" are kept as literal text.
+        /// </summary>
+        private static WildcardNode ParseSequence(string text, int start, int end)
+        {
+            var parts = new List<WildcardNode>();
+            var literal = new StringBuilder();
+            int i = start;
+            while (i < end)
+            {
+                if (text[i] == '{')
+                {
+                    int close = FindClosingBrace(text, i, end);
+                    // "{}" has no options and stays literal, like any unbalanced brace.
+                    if (close > i + 1)
+                    {
+                        FlushLiteral(parts, literal);
+                        parts.Add(ParseChoice(text, i + 1, close));
+                        i = close + 1;
+                        continue;
+                    }
+                }
+                else if (text[i] == '_' && i + 1 < end && text[i + 1] == '_')
+                {
+                    int close = FindClosingUnderscores(text, i + 3, end);
+                    if (close >= 0)
+                    {
+                        FlushLiteral(parts, literal);
+                        parts.Add(new WildcardRefNode(ParseName(text, i + 2, close, trim: true)));
+                        i = close + 2;
+                        continue;
+                    }
+                }
+                literal.Append(text[i]);
+                i++;
+            }
+            FlushLiteral(parts, literal);
+
+            if (parts.Count == 0) return new TextNode(string.Empty);
+            return parts.Count == 1 ? parts[0] : new SequenceNode(parts.ToArray());
+        }
+
+        /// <summary>
+        /// Parses the content of a {..} construct: [min[-max]$$[separator$$]]option|option|...
+        /// An option that is exactly __name__ contributes every line of that wildcard as a separate choice.
+        /// </summary>
+        private static WildcardNode ParseChoice(string text, int start, int end)
+        {
+            int min = 1, max = 1;
+            WildcardNode separator = new TextNode(", ");
+            int optionsStart = start;
+
+            int quantifierEnd = FindTopLevel(text, "$$", start, end);
+            if (quantifierEnd > start && quantifierEnd + 2 < end)
+            {
+                var rangeMatch = _quantifierRegex.Match(text.Substring(start, quantifierEnd - start));
+                if (rangeMatch.Success)
+                {
+                    int.TryParse(rangeMatch.Groups[1].Value, out min);
+                    max = min;
+                    if (rangeMatch.Groups[2].Success)
+                    {
+                        int.TryParse(rangeMatch.Groups[2].Value, out max);
+                    }
+
+                    optionsStart = quantifierEnd + 2;
+                    int separatorEnd = FindTopLevel(text, "$$", optionsStart, end);
+                    if (separatorEnd >= 0)
+                    {
+                        separator = ParseSequence(text, optionsStart, separatorEnd);
+                        optionsStart = separatorEnd + 2;
+                    }
+                }
+            }
+            if (min > max) (min, max) = (max, min);
+
+            var options = new List<ChoiceOption>();
+            int optionStart = optionsStart;
+            while (true)
+            {
+                int optionEnd = FindTopLevel(text, "|", optionStart, end);
+                if (optionEnd < 0) optionEnd = end;
+                options.Add(ParseOption(text, optionStart, optionEnd));
+                if (optionEnd == end) break;
+                optionStart = optionEnd + 1;
+            }
+            return new ChoiceNode(options.ToArray(), min, max, separator);
+        }
+
+        private static ChoiceOption ParseOption(string text, int start, int end)
+        {
+            while (start < end && char.IsWhiteSpace(text[start])) start++;
+            while (end > start && char.IsWhiteSpace(text[end - 1])) end--;
+
+            // Exactly __name__ (the name may itself contain choices, e.g. __hair/{short|long}__).
+            if (end - start >= 5 && text[start] == '_' && text[start + 1] == '_' && text[end - 1] == '_' && text[end - 2] == '_')
+            {
+                return new ChoiceOption(null, ParseName(text, start + 2, end - 2, trim: false));
+            }
+            return new ChoiceOption(ParseSequence(text, start, end), null);
+        }
+
+        private static WildcardNode ParseName(string text, int start, int end, bool trim)
+        {
+            var name = text.Substring(start, end - start);
+            if (trim) name = name.Trim();
+            return ContainsSyntax(name) ? ParseSequence(name, 0, name.Length) : new TextNode(name);
+        }
+
+        private static int FindClosingBrace(string text, int open, int end)
+        {
+            int depth = 0;
+            for (int i = open; i < end; i++)
+            {
+                if (text[i] == '{') depth++;
+                else if (text[i] == '}' && --depth == 0) return i;
+            }
+            return -1;
+        }
+
+        /// <summary>
+        /// Finds the "__" that closes a wildcard name, skipping balanced braces inside the name.
+        /// </summary>
+        private static int FindClosingUnderscores(string text, int from, int end)
+        {
+            for (int i = from; i + 1 < end; i++)
+            {
+                if (text[i] == '{')
+                {
+                    int close = FindClosingBrace(text, i, end);
+                    if (close > 0)
+                    {
+                        i = close;
+                        continue;
+                    }
+                }
+                if (text[i] == '_' && text[i + 1] == '_') return i;
+            }
+            return -1;
+        }
+
+        /// <summary>
+        /// Finds a token outside of nested braces.
+        /// </summary>
+        private static int FindTopLevel(string text, string token, int start, int end)
+        {
+            int depth = 0;
+            for (int i = start; i < end; i++)
+            {
+                var c = text[i];
+                if (c == '{') depth++;
+                else if (c == '}') depth--;
+                else if (depth == 0 && i + token.Length <= end && string.CompareOrdinal(text, i, token, 0, token.Length) == 0) return i;
+            }
+            return -1;
+        }
+
+        private static void FlushLiteral(List<WildcardNode> parts, StringBuilder literal)
+        {
+            if (literal.Length == 0) return;
+            parts.Add(new TextNode(literal.ToString()));
+            literal.Clear();
+        }
+    }
+
+    internal abstract class WildcardNode
+    {
+        public abstract void Evaluate(WildcardProcessor processor, StringBuilder output);
+
+        /// <summary>
+        /// The number of results <see cref="EnumerateCombinations"/> yields.
+        /// </summary>
+        public abstract BigInteger CountCombinations(WildcardCombinationCounter counter, int depth);
+
+        /// <summary>
+        /// Lazily yields every result the node can expand to: all lines of a wildcard, all options of a choice
+        /// and, for {k$$...}, every k-subset of the options in their written order.
+        /// </summary>
+        public abstract IEnumerable<string> EnumerateCombinations(int depth);
+
+        public string EvaluateToString(WildcardProcessor processor)
+        {
+            if (this is TextNode text) return text.Text;
+            var sb = new StringBuilder();
+            Evaluate(processor, sb);
+            return sb.ToString();
+        }
+    }
+
+    internal sealed class TextNode : WildcardNode
+    {
+        public string Text { get; }
+
+        public TextNode(string text)
+        {
+            Text = text;
+        }
+
+        public override void Evaluate(WildcardProcessor processor, StringBuilder output) => output.Append(Text);
+
+        public override BigInteger CountCombinations(WildcardCombinationCounter counter, int depth) => BigInteger.One;
+
+        public override IEnumerable<string> EnumerateCombinations(int depth)
+        {
+            yield return Text;
+        }
+    }
+
+    internal sealed class SequenceNode : WildcardNode
+    {
+        private readonly WildcardNode[] _parts;
+
+        public SequenceNode(WildcardNode[] parts)
+        {
+            _parts = parts;
+        }
+
+        public override void Evaluate(WildcardProcessor processor, StringBuilder output)
+        {
+            foreach (var part in _parts)
+            {
+                part.Evaluate(processor, output);
+            }
+        }
+
+        public override BigInteger CountCombinations(WildcardCombinationCounter counter, int depth)
+        {
+            var count = BigInteger.One;
+            foreach (var part in _parts)
+            {
+                count *= part.CountCombinations(counter, depth);
+            }
+            return count;
+        }
+
+        public override IEnumerable<string> EnumerateCombinations(int depth)
+        {
+            return WildcardExpansion.Concatenations(_parts.Select(part => (Func<IEnumerable<string>>)(() => part.EnumerateCombinations(depth))).ToList(), string.Empty);
+        }
+    }
+
+    /// <summary>
+    /// __name__ outside of braces: one random line of the wildcard, or the reference itself if the wildcard does not exist.
+    /// </summary>
+    internal sealed class WildcardRefNode : WildcardNode
+    {
+        private readonly WildcardNode _name;
+
+        public WildcardRefNode(WildcardNode name)
+        {
+            _name = name;
+        }
+
+        public override void Evaluate(WildcardProcessor processor, StringBuilder output)
+        {
+            var name = _name.EvaluateToString(processor).Trim();
+            var lines = WildcardFileHandler.GetLineSet(name);
+            if (lines.Count == 0)
+            {
+                output.Append("__").Append(name).Append("__");
+                return;
+            }
+            processor.ExpandLine(lines[lines.Sample(processor.Random)], output);
+        }
+
+        public override BigInteger CountCombinations(WildcardCombinationCounter counter, int depth)
+        {
+            var count = BigInteger.Zero;
+            foreach (var name in _name.EnumerateCombinations(depth))
+            {
+                var lines = WildcardFileHandler.GetLineSet(name.Trim());
+                if (lines.Count == 0)
+                {
+                    count++;
+                    continue;
+                }
+                foreach (var line in lines)
+                {
+                    count += counter.CountLine(line, depth);
+                }
+            }
+            return count;
+        }
+
+        public override IEnumerable<string> EnumerateCombinations(int depth)
+        {
+            foreach (var untrimmedName in _name.EnumerateCombinations(depth))
+            {
+                var name = untrimmedName.Trim();
+                var lines = WildcardFileHandler.GetLineSet(name);
+                if (lines.Count == 0)
+                {
+                    yield return $"__{name}__";
+                    continue;
+                }
+                foreach (var line in lines)
+                {
+                    foreach (var expanded in WildcardExpansion.EnumerateLine(line, depth))
+                    {
+                        yield return expanded;
+                    }
+                }
+            }
+        }
+    }
+
+    /// <summary>
+    /// An option of a {..} construct: either parsed text, or a wildcard whose lines are all separate choices.
+    /// </summary>
+    internal readonly struct ChoiceOption
+    {
+        public readonly WildcardNode Node;
+        public readonly WildcardNode WildcardName;
+
+        public ChoiceOption(WildcardNode node, WildcardNode wildcardName)
+        {
+            Node = node;
+            WildcardName = wildcardName;
+        }
+    }
+
+    internal sealed class ChoiceNode : WildcardNode
+    {
+        private readonly ChoiceOption[] _options;
+        private readonly int _min;
+        private readonly int _max;
+        private readonly WildcardNode _separator;
+
+        public ChoiceNode(ChoiceOption[] options, int min, int max, WildcardNode separator)
+        {
+            _options = options;
+            _min = min;
+            _max = max;
+            _separator = separator;
+        }
+
+        public override void Evaluate(WildcardProcessor processor, StringBuilder output)
+        {
+            // The choices are a virtual concatenation of the options: a wildcard option contributes its lines in place,
+            // as a line set over the cached files, so nothing is copied however many lines it has.
+            var lineSets = new WildcardLineSet[_options.Length];
+            var offsets = new int[_options.Length];
+            int total = 0;
+            bool isWeighted = false;
+            for (int i = 0; i < _options.Length; i++)
+            {
+                offsets[i] = total;
+                if (_options[i].WildcardName != null)
+                {
+                    lineSets[i] = WildcardFileHandler.GetLineSet(_options[i].WildcardName.EvaluateToString(processor));
+                    total += lineSets[i].Count;
+                    isWeighted |= lineSets[i].IsWeighted;
+                }
+                else
+                {
+                    total++;
+                }
+            }
+            if (total == 0) return;
+
+            var random = processor.Random;
+            int count = random.Next(Math.Min(_min, total), Math.Min(_max, total) + 1);
+            var separator = count > 1 ? _separator.EvaluateToString(processor) : null;
+
+            var sampler = isWeighted ? CreateWeightedSampler(random, lineSets, offsets, total) : new DistinctSampler(random, total);
+            for (int i = 0; i < count; i++)
+            {
+                int index = sampler.Next();
+                int option = WildcardLineSet.FindSegment(offsets, index);
+
+                if (i > 0) output.Append(separator);
+                if (lineSets[option] == null) _options[option].Node.Evaluate(processor, output);
+                else processor.ExpandLine(lineSets[option][index - offsets[option]], output);
+            }
+        }
+
+        public override BigInteger CountCombinations(WildcardCombinationCounter counter, int depth)
+        {
+            var count = BigInteger.Zero;
+            foreach (var choices in EnumerateChoiceLists(depth))
+            {
+                if (choices.Count == 0)
+                {
+                    count++;
+                    continue;
+                }
+                int min = Math.Min(_min, choices.Count), max = Math.Min(_max, choices.Count);
+
+                // e[j]: the number of results of all j-subsets, i.e. the elementary symmetric polynomials of the choice counts.
+                var e = new BigInteger[max + 1];
+                e[0] = BigInteger.One;
+                foreach (var choice in choices)
+                {
+                    var choiceCount = choice.Node?.CountCombinations(counter, depth) ?? counter.CountLine(choice.Line, depth);
+                    for (int j = max; j >= 1; j--)
+                    {
+                        e[j] += e[j - 1] * choiceCount;
+                    }
+                }
+
+                var separatorCount = max > 1 ? _separator.CountCombinations(counter, depth) : BigInteger.One;
+                for (int k = min; k <= max; k++)
+                {
+                    count += k > 1 ? e[k] * separatorCount : e[k];
+                }
+            }
+            return count;
+        }
+
+        public override IEnumerable<string> EnumerateCombinations(int depth)
+        {
+            foreach (var choices in EnumerateChoiceLists(depth))
+            {
+                if (choices.Count == 0)
+                {
+                    yield return string.Empty;
+                    continue;
+                }
+                int min = Math.Min(_min, choices.Count), max = Math.Min(_max, choices.Count);
+
+                for (int k = min; k <= max; k++)
+                {
+                    if (k == 0)
+                    {
+                        yield return string.Empty;
+                        continue;
+                    }
+                    var separators = k > 1 ? _separator.EnumerateCombinations(depth) : new[] { string.Empty };
+                    foreach (var separator in separators)
+                    {
+                        foreach (var subset in WildcardExpansion.Subsets(choices.Count, k))
+                        {
+                            var parts = subset.Select(i => choices[i]).Select(choice => (Func<IEnumerable<string>>)(() =>
+                                choice.Node?.EnumerateCombinations(depth) ?? WildcardExpansion.EnumerateLine(choice.Line, depth))).ToList();
+                            foreach (var result in WildcardExpansion.Concatenations(parts, separator))
+                            {
+                                yield return result;
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        /// <summary>
+        /// The flat choice lists of this construct: one per combination of the names of its wildcard options,
+        /// so just one unless a name itself contains choices.
+        /// </summary>
+        private IEnumerable<List<(WildcardNode Node, string Line)>> EnumerateChoiceLists(int depth)
+        {
+            var alternatives = _options.Select(option => option.WildcardName == null
+                ? (Func<IEnumerable<string>>)(() => new string[] { null })
+                : () => option.WildcardName.EnumerateCombinations(depth)).ToList();
+
+            foreach (var names in WildcardExpansion.Products(alternatives))
+            {
+                var choices = new List<(WildcardNode Node, string Line)>();
+                for (int i = 0; i < _options.Length; i++)
+                {
+                    if (_options[i].WildcardName == null)
+                    {
+                        choices.Add((_options[i].Node, null));
+                    }
+                    else
+                    {
+                        choices.AddRange(WildcardFileHandler.GetLineSet(names[i]).Select(line => ((WildcardNode)null, line)));
+                    }
+                }
+                yield return choices;
+            }
+        }
+
+        /// <summary>
+        /// Plain options weigh 1; a wildcard option weighs as much as all of its lines together.
+        /// </summary>
+        private static DistinctSampler CreateWeightedSampler(WildcardRandom random, WildcardLineSet[] lineSets, int[] offsets, int total)
+        {
+            var cumulativeWeights = new double[lineSets.Length];
+            double sum = 0;
+            for (int i = 0; i < lineSets.Length; i++)
+            {
+                sum += lineSets[i]?.TotalWeight ?? 1;
+                cumulativeWeights[i] = sum;
+            }
+
+            return new DistinctSampler(random, total,
+                () =>
+                {
+                    int option = WildcardLineSet.FindCumulative(cumulativeWeights, random.NextDouble() * sum);
+                    return offsets[option] + (lineSets[option]?.Sample(random) ?? 0);
+                },
+                index =>
+                {
+                    int option = WildcardLineSet.FindSegment(offsets, index);
+                    return lineSets[option]?.GetWeight(index - offsets[option]) ?? 1;
+                });
+        }
+    }
+}
@@ -91,6 +91,10 @@ public class WorkflowInputsController : INotifyPropertyChanged
 
     private readonly List<string> _wildcardPropertyPaths = new();
     public IReadOnlyList<string> WildcardPropertyPaths => _wildcardPropertyPaths;
+    // Wildcard fields of the next tasks, expanded ahead in parallel by PrepareWildcardBatchAsync: (field path, field text, seed) -> result
+    private readonly Dictionary<(string Path, string Text, long Seed), string> _preparedWildcards = new();
+    // Wildcard seeds drawn ahead for SeedControl.Randomize, taken in order by ApplySeedControl
+    private readonly Queue<long> _preparedWildcardSeeds = new();
     
     public ICommand ExecuteActionCommand { get; }
     private bool _isUpdatingFromGlobalPreset = false; // Flag to prevent recursion
@@ -499,6 +503,63 @@ public class WorkflowInputsController : INotifyPropertyChanged
         ApplySeedControl(prompt, pathsToIgnore);
     }
     
+    /// <summary>
+    /// Expands the wildcard fields of the next <paramref name="taskCount"/> tasks in parallel, with the seeds that
+    /// the seed control will give them, so that ProcessSpecialFieldsAsync only looks the results up.
+    /// Fields whose text or seed turns out different (e.g. changed by a grid axis) are still expanded when the task is created.
+    /// </summary>
+    public async Task PrepareWildcardBatchAsync(int taskCount)
+    {
+        ClearPreparedWildcards();
+        if (!_hasWildcardFields || taskCount < 2) return;
+
+        // The seeds ApplySeedControl will move through, one per task.
+        var seeds = new List<long> { GlobalControls.WildcardSeed };
+        var seedAdvances = SelectedSeedControl != SeedControl.Fixed && !GlobalControls.IsSeedLocked;
+        for (int i = 1; i < taskCount; i++)
+        {
+            var seed = seeds[^1];
+            if (seedAdvances)
+            {
+                seed = NextWildcardSeed(seed);
+                // Random seeds are handed to ApplySeedControl, so that the tasks get the seeds prepared for them.
+                if (SelectedSeedControl == SeedControl.Randomize) _preparedWildcardSeeds.Enqueue(seed);
+            }
+            seeds.Add(seed);
+        }
+        var distinctSeeds = seeds.Distinct().ToList();
+
+        // The field texts as ApplyWildcards will see them.
+        var prompt = _workflow.JsonClone();
+        if (prompt == null) return;
+        ApplyPromptTokenFiltering(prompt);
+        var fields = _wildcardPropertyPaths
+            .Select(path => (Path: path, Property: Utils.GetJsonPropertyByPath((JObject)prompt, path)))
+            .Where(field => field.Property != null && field.Property.Value.Type == JTokenType.String)
+            .Select(field => (field.Path, Text: field.Property.Value.ToObject<string>()))
+            .ToList();
+
+        var stopwatch = System.Diagnostics.Stopwatch.StartNew();
+        var expanded = await Task.Run(() => fields.Select(field => WildcardExpansion.ExpandMany(field.Text, distinctSeeds, field.Path)).ToList());
+        for (int f = 0; f < fields.Count; f++)
+        {
+            for (int i = 0; i < distinctSeeds.Count; i++)
+            {
+                _preparedWildcards[(fields[f].Path, fields[f].Text, distinctSeeds[i])] = expanded[f][i];
+            }
+        }
+        Logger.LogToConsole($"[Wildcard] Expanded {fields.Count} prompt field(s) for {distinctSeeds.Count} seed(s) in {stopwatch.ElapsedMilliseconds} ms");
+    }
+
+    /// <summary>
+    /// Drops the results of PrepareWildcardBatchAsync once the batch is created; they would be stale if a wildcard file changes.
+    /// </summary>
+    public void ClearPreparedWildcards()
+    {
+        _preparedWildcards.Clear();
+        _preparedWildcardSeeds.Clear();
+    }
+
     private void ApplyPromptTokenFiltering(JToken prompt)
     {
         // Reuse the existing flag that checks if any WildcardSupportPrompt fields exist.
@@ -513,11 +574,7 @@ public class WorkflowInputsController : INotifyPropertyChanged
             if (string.IsNullOrWhiteSpace(originalText)) continue;
 
             // Tokenize, filter out disabled tokens, and join the remaining ones back into a string.
-            var allTokens = PromptUtils.Tokenize(originalText);
-            var enabledTokens = allTokens.Where(t => !t.StartsWith(PromptUtils.DISABLED_TOKEN_PREFIX));
-            var filteredText = string.Join(", ", enabledTokens);
-
-            prop.Value = new JValue(filteredText);
+            prop.Value = new JValue(PromptUtils.RemoveDisabledTokens(originalText));
         }
     }
 
@@ -552,13 +609,18 @@ public class WorkflowInputsController : INotifyPropertyChanged
             {
                 var text = prop.Value.ToObject<string>();
                 // Используем значение из ViewModel
-                prop.Value = new JValue(Utils.ReplaceWildcards(text, GlobalControls.WildcardSeed));
+                var seed = GlobalControls.WildcardSeed;
+                var result = text != null && _preparedWildcards.TryGetValue((wildcardProperty, text, seed), out var prepared)
+                    ? prepared
+                    : Utils.ReplaceWildcards(text, seed, wildcardProperty);
+                prop.Value = new JValue(result);
             }
         }
     }
 
     private async Task ApplyInpaintDataAsync(JToken prompt)
     {
+        var upload = SettingsService.Instance.Settings.UploadInpaintImages;
         foreach (var vm in _inpaintViewModels)
         {
             // english: If an image field exists, process it
@@ -569,7 +631,7 @@ public class WorkflowInputsController : INotifyPropertyChanged
                 {
                     // english: Await the asynchronous method to get the Base64 image
                     var base64Image = await vm.Editor.GetImageAsBase64Async();
-                    if (base64Image != null) prop.Value = new JValue(base64Image);
+                    if (base64Image != null) prop.Value = new JValue(upload ? StoreForUpload(base64Image) : base64Image);
                 }
             }
 
@@ -581,12 +643,37 @@ public class WorkflowInputsController : INotifyPropertyChanged
                 {
                     // english: Await the asynchronous method to get the Base64 mask
                     var base64Mask = await vm.Editor.GetMaskAsBase64Async();
-                    if (base64Mask != null) prop.Value = new JValue(base64Mask);
+                    if (base64Mask != null) prop.Value = new JValue(upload ? StoreForUpload(base64Mask) : base64Mask);
                 }
             }
         }
     }
 
+    /// <summary>
+    /// Puts the image into the content-addressed upload store; the prompt then carries only a short reference
+    /// that is uploaded and resolved per server when the task is submitted.
+    /// </summary>
+    private static string StoreForUpload(string base64)
+    {
+        return ImageUploadService.Instance.Store(Convert.FromBase64String(base64));
+    }
+
+    /// <summary>
+    /// Turns an upload reference (in a workflow restored from a task or an output) back into base64 for the inpaint editor.
+    /// </summary>
+    private static string ResolveUploadReference(string value)
+    {
+        if (!ImageUploadService.IsReference(value)) return value;
+
+        var data = ImageUploadService.Instance.Load(value);
+        if (data == null)
+        {
+            Logger.Log($"The inpaint image '{value}' is missing from the local upload store.", LogLevel.Warning);
+            return null;
+        }
+        return Convert.ToBase64String(data);
+    }
+
     private void ApplySeedControl(JToken prompt, HashSet<string> pathsToIgnore = null)
     {
         if (SelectedSeedControl == SeedControl.Fixed) return;
@@ -618,18 +705,28 @@ public class WorkflowInputsController : INotifyPropertyChanged
 
         if (_hasWildcardFields && !GlobalControls.IsSeedLocked)
         {
-            var newSeed = GlobalControls.WildcardSeed;
-            switch (SelectedSeedControl)
-            {
-                case SeedControl.Increment: newSeed++; break;
-                case SeedControl.Decrement: newSeed--; break;
-                case SeedControl.Randomize: newSeed = Utils.GenerateSeed(0, 4294967295L); break;
-            }
+            var newSeed = SelectedSeedControl == SeedControl.Randomize && _preparedWildcardSeeds.Count > 0
+                ? _preparedWildcardSeeds.Dequeue()
+                : NextWildcardSeed(GlobalControls.WildcardSeed);
             // Обновляем UI через свойство ViewModel
             GlobalControls.WildcardSeed = newSeed;
         }
     }
     
+    /// <summary>
+    /// The wildcard seed the seed control gives the task after one that used <paramref name="seed"/>.
+    /// </summary>
+    private long NextWildcardSeed(long seed)
+    {
+        switch (SelectedSeedControl)
+        {
+            case SeedControl.Increment: return seed + 1;
+            case SeedControl.Decrement: return seed - 1;
+            case SeedControl.Randomize: return Utils.GenerateSeed(0, 4294967295L);
+            default: return seed;
+        }
+    }
+    
     /// <summary>
     /// Updates the underlying workflow's JObject with the current state from complex controls
     /// like the InpaintEditor before the session is saved.
@@ -868,7 +965,7 @@ public class WorkflowInputsController : INotifyPropertyChanged
                                 // Check if it's a non-empty string, which is likely our base64 data
                                 if (imageProp?.Value.Type == JTokenType.String && !string.IsNullOrEmpty(imageProp.Value.ToString()))
                                 {
-                                    imageBase64 = imageProp.Value.ToString();
+                                    imageBase64 = ResolveUploadReference(imageProp.Value.ToString());
                                 }
                             }
 
@@ -878,7 +975,7 @@ public class WorkflowInputsController : INotifyPropertyChanged
                                 var maskProp = _workflow.GetPropertyByPath(inpaintVm.MaskField.Path);
                                 if (maskProp?.Value.Type == JTokenType.String && !string.IsNullOrEmpty(maskProp.Value.ToString()))
                                 {
-                                    maskBase64 = maskProp.Value.ToString();
+                                    maskBase64 = ResolveUploadReference(maskProp.Value.ToString());
                                 }
                             }
                             